@@ -0,0 +1,91 @@
+import argparse
+import time
+import mysql.connector
+import metadata_extractor
+
+# --- Benchmark Configuration ---
+BENCHMARK_DATABASE = 'aura_extraction_benchmark' # Scratch schema; created and filled by this script
+TABLE_COUNTS = [100, 1000, 10000]
+COLUMNS_PER_TABLE = 8
+
+def get_benchmark_db_config():
+    db_config = dict(metadata_extractor.DB_CONFIG)
+    db_config['database'] = BENCHMARK_DATABASE
+    return db_config
+
+def create_benchmark_tables(table_count):
+    """Creates synthetic tables bench_00000 .. bench_N, each with an FK to the previous table."""
+    server_config = {k: v for k, v in metadata_extractor.DB_CONFIG.items() if k != 'database'}
+    conn = mysql.connector.connect(**server_config)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {BENCHMARK_DATABASE}")
+        cursor.execute(f"USE {BENCHMARK_DATABASE}")
+        cursor.execute("SHOW TABLES")
+        existing = len(cursor.fetchall())
+        if existing > table_count:
+            # Start over so each run measures exactly `table_count` tables
+            cursor.execute(f"DROP DATABASE {BENCHMARK_DATABASE}")
+            cursor.execute(f"CREATE DATABASE {BENCHMARK_DATABASE}")
+            cursor.execute(f"USE {BENCHMARK_DATABASE}")
+            existing = 0
+        print(f"Creating {table_count - existing} benchmark tables ({existing} already exist)...")
+        extra_columns = ", ".join(f"attr_{i} VARCHAR(64)" for i in range(COLUMNS_PER_TABLE - 2))
+        for i in range(existing, table_count):
+            fk_clause = ""
+            if i > 0:
+                fk_clause = f", FOREIGN KEY (parent_id) REFERENCES bench_{i - 1:05d}(id)"
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS bench_{i:05d} (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    parent_id INT,
+                    {extra_columns}
+                    {fk_clause}
+                )
+            """)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+def time_extraction(mode, include_sample_data):
+    start = time.perf_counter()
+    metadata = metadata_extractor.extract_metadata(
+        db_config=get_benchmark_db_config(), mode=mode, include_sample_data=include_sample_data
+    )
+    elapsed = time.perf_counter() - start
+    if not metadata:
+        raise RuntimeError(f"Extraction in {mode} mode failed.")
+    return elapsed, len(metadata['tables'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-table and bulk information_schema extraction.")
+    parser.add_argument("--tables", type=int, nargs="+", default=TABLE_COUNTS, help="Table counts to benchmark")
+    parser.add_argument("--with-samples", action="store_true", help="Also fetch sample rows (same cost in both modes)")
+    parser.add_argument("--drop", action="store_true", help="Drop the benchmark schema afterwards")
+    args = parser.parse_args()
+
+    results = []
+    for table_count in sorted(args.tables):
+        create_benchmark_tables(table_count)
+        per_table_time, extracted = time_extraction('per_table', args.with_samples)
+        bulk_time, _ = time_extraction('bulk', args.with_samples)
+        results.append((table_count, extracted, per_table_time, bulk_time))
+
+    print("\n--- Extraction Benchmark ---")
+    print(f"{'tables':>8} {'per_table (s)':>14} {'bulk (s)':>10} {'speedup':>8}")
+    for table_count, extracted, per_table_time, bulk_time in results:
+        speedup = per_table_time / bulk_time if bulk_time > 0 else float('inf')
+        print(f"{extracted:>8} {per_table_time:>14.2f} {bulk_time:>10.2f} {speedup:>7.1f}x")
+
+    if args.drop:
+        server_config = {k: v for k, v in metadata_extractor.DB_CONFIG.items() if k != 'database'}
+        conn = mysql.connector.connect(**server_config)
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {BENCHMARK_DATABASE}")
+        cursor.close()
+        conn.close()
+        print(f"Dropped benchmark schema {BENCHMARK_DATABASE}.")
+
+if __name__ == "__main__":
+    main()
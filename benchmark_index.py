@@ -0,0 +1,132 @@
+import argparse
+import time
+import numpy as np
+import faiss
+import mysql.connector
+import vector_index
+
+# --- Benchmark Configuration ---
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',      # Your MySQL username
+    'password': '', # Your MySQL password
+    'database': 'semantic_catalog_db'
+}
+MODEL_NAME = 'all-MiniLM-L6-v2' # Embeddings of this model are read from enriched_metadata
+EMBEDDING_DIM = 384
+QUERY_COUNT = 1000 # Queries per configuration (latency is measured one query at a time, like /search)
+K = 10
+NPROBE_VALUES = [1, 4, 16, 64]
+EF_SEARCH_VALUES = [16, 32, 64, 128]
+
+def load_db_embeddings():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        embeddings, _ = vector_index.load_catalog_items_from_db(cursor, MODEL_NAME, EMBEDDING_DIM)
+    finally:
+        cursor.close()
+        conn.close()
+    if embeddings is None:
+        raise RuntimeError("No embeddings found in enriched_metadata; run precompute_embeddings.py or use --synthetic.")
+    return embeddings
+
+def make_synthetic_embeddings(n_items, dimension, seed=42):
+    """Clustered, unit-length vectors, which behave more like sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n_items // 100), dimension)).astype(np.float32)
+    embeddings = centers[rng.integers(0, len(centers), n_items)]
+    embeddings += 0.5 * rng.standard_normal((n_items, dimension)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings
+
+def make_queries(embeddings, query_count, seed=7):
+    """Perturbed copies of random catalog vectors, so queries land near real items without being exact hits."""
+    rng = np.random.default_rng(seed)
+    queries = embeddings[rng.integers(0, len(embeddings), query_count)].copy()
+    queries += 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.ascontiguousarray(queries, dtype=np.float32)
+
+def time_queries(index, queries, search_params):
+    """Returns (result ids, per-query latencies in ms) for single-query searches."""
+    all_ids = np.empty((len(queries), K), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        if search_params is not None:
+            _, ids = index.search(queries[i:i + 1], K, params=search_params)
+        else:
+            _, ids = index.search(queries[i:i + 1], K)
+        latencies[i] = (time.perf_counter() - start) * 1000
+        all_ids[i] = ids[0]
+    return all_ids, latencies
+
+def recall_at_k(ids, ground_truth):
+    hits = sum(len(set(row[row >= 0]) & set(truth)) for row, truth in zip(ids, ground_truth))
+    return hits / ground_truth.size
+
+def compare_embedding_formats(embeddings, queries, ground_truth, formats):
+    """Prints stored bytes, index memory and exact-search recall@10 for each storage format.
+
+    Each format's vectors go through the same encode/decode round trip as the
+    database BLOBs, and are then indexed with the matching Flat / scalar-quantized index.
+    """
+    n_items, dimension = embeddings.shape
+    print(f"\n{'format':>8} {'blob bytes':>11} {'stored (MB)':>12} {'index (MB)':>11} {'recall@10':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for embedding_format in formats:
+        blob_size = vector_index.embedding_blob_size(dimension, embedding_format)
+        stored = vector_index.decode_embeddings(
+            [vector_index.encode_embedding(vector, embedding_format) for vector in embeddings], embedding_format, dimension
+        )
+        index = vector_index.build_faiss_index(stored, 'flat', embedding_format)
+        index_mb = len(faiss.serialize_index(index)) / 1e6
+        ids, latencies = time_queries(index, queries, None)
+        print(f"{embedding_format:>8} {blob_size:>11} {blob_size * n_items / 1e6:>12.1f} {index_mb:>11.1f} "
+              f"{recall_at_k(ids, ground_truth):>10.3f} {np.percentile(latencies, 50):>9.3f} {np.percentile(latencies, 99):>9.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall@10 and query latency of the FAISS index types against exact Flat search.")
+    parser.add_argument("--synthetic", type=int, nargs="+", metavar="N",
+                        help="Benchmark synthetic catalogs of these sizes instead of the embeddings in the database")
+    parser.add_argument("--types", nargs="+", default=list(vector_index.INDEX_TYPES), choices=vector_index.INDEX_TYPES)
+    parser.add_argument("--queries", type=int, default=QUERY_COUNT)
+    parser.add_argument("--formats", nargs="*", choices=vector_index.EMBEDDING_FORMATS,
+                        help="Also compare memory and recall of these embedding storage formats (all if none given)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        datasets = [(f"synthetic-{n}", make_synthetic_embeddings(n, EMBEDDING_DIM)) for n in args.synthetic]
+    else:
+        datasets = [("enriched_metadata", load_db_embeddings())]
+
+    for label, embeddings in datasets:
+        n_items = len(embeddings)
+        queries = make_queries(embeddings, args.queries)
+        print(f"\n--- {label}: {n_items} items, {len(queries)} queries, auto selects '{vector_index.resolve_index_type(n_items, 'auto')}' ---")
+
+        baseline = vector_index.build_faiss_index(embeddings, 'flat', 'float32')
+        ground_truth, _ = time_queries(baseline, queries, None)
+
+        print(f"{'index':>10} {'param':>14} {'build (s)':>10} {'recall@10':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+        for index_type in args.types:
+            start = time.perf_counter()
+            index = baseline if index_type == 'flat' else vector_index.build_faiss_index(embeddings, index_type, 'float32')
+            build_time = time.perf_counter() - start
+            built_type = vector_index.get_index_type(index)
+            if built_type in ('ivf_flat', 'ivf_pq'):
+                settings = [(f"nprobe={n}", vector_index.make_search_params(index, nprobe=n)) for n in NPROBE_VALUES]
+            elif built_type == 'hnsw':
+                settings = [(f"efSearch={ef}", vector_index.make_search_params(index, ef_search=ef)) for ef in EF_SEARCH_VALUES]
+            else:
+                settings = [("exact", None)]
+            for setting_label, search_params in settings:
+                ids, latencies = time_queries(index, queries, search_params)
+                print(f"{built_type:>10} {setting_label:>14} {build_time:>10.2f} {recall_at_k(ids, ground_truth):>10.3f} "
+                      f"{np.percentile(latencies, 50):>9.3f} {np.percentile(latencies, 99):>9.3f}")
+
+        if args.formats is not None:
+            compare_embedding_formats(embeddings, queries, ground_truth, args.formats or vector_index.EMBEDDING_FORMATS)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import time
+import numpy as np
+import search_api
+
+# --- Benchmark Configuration ---
+EVAL_QUERIES_FILE_PATH = "rerank_eval_queries.json" # Labeled queries with graded relevance (0-3) per catalog item
+CANDIDATE_COUNT = 10
+NDCG_K = 10
+
+def load_eval_queries(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def relevance_lookup(labeled_query):
+    """{(object_type, object_name, parent_table_name): relevance} for one labeled query."""
+    return {
+        (item['object_type'], item['object_name'], item.get('parent_table_name')): item['relevance']
+        for item in labeled_query['relevant']
+    }
+
+def ndcg_at_k(results, relevance, k=NDCG_K):
+    gains = [relevance.get((item['object_type'], item['object_name'], item.get('parent_table_name')), 0) for item in results[:k]]
+    dcg = sum((2 ** gain - 1) / np.log2(rank + 2) for rank, gain in enumerate(gains))
+    ideal = sorted(relevance.values(), reverse=True)[:k]
+    idcg = sum((2 ** gain - 1) / np.log2(rank + 2) for rank, gain in enumerate(ideal))
+    return dcg / idcg if idcg > 0 else 0.0
+
+def rerank_with(mode, query, candidates):
+    """Returns (ordered results, elapsed ms) for one re-rank mode, bypassing the cache and the latency budget."""
+    start = time.perf_counter()
+    if mode == 'none':
+        ordered = candidates
+    elif mode == 'cross_encoder':
+        encoder = search_api.get_cross_encoder()
+        if encoder is None:
+            raise RuntimeError("Cross-encoder could not be loaded.")
+        ordered = search_api.order_by_ids(candidates, search_api.cross_encoder_rerank_ids(query, candidates, encoder))
+    else:
+        if not search_api.get_llm_reranker():
+            raise RuntimeError("LLM re-ranker is not available.")
+        cache_key = search_api.RerankCache.make_key(query, [item['id'] for item in candidates], search_api.LLM_RERANK_MODEL_NAME)
+        ordered_ids = search_api.llm_rerank_ids(query, candidates, cache_key)
+        ordered = search_api.order_by_ids(candidates, ordered_ids) if ordered_ids else candidates
+    return ordered, (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare latency and NDCG@10 of the re-rank modes on a labeled query set.")
+    parser.add_argument("--queries", default=EVAL_QUERIES_FILE_PATH, help="Labeled query set (JSON)")
+    parser.add_argument("--modes", nargs="+", default=list(search_api.RERANK_MODES), choices=search_api.RERANK_MODES)
+    args = parser.parse_args()
+
+    labeled_queries = load_eval_queries(args.queries)
+    search_api.load_and_index_data()
+    state = search_api.INDEX_STATE
+    if state.index is None:
+        raise RuntimeError("Search index is empty; run the pipeline up to precompute_embeddings.py first.")
+    search_api.get_cross_encoder() # Load outside the timed loop
+
+    ndcg_scores = {mode: [] for mode in args.modes}
+    latencies = {mode: [] for mode in args.modes}
+    failures = {mode: 0 for mode in args.modes}
+    for labeled_query in labeled_queries:
+        query = labeled_query['query']
+        candidates = search_api.retrieve_candidates(state, search_api.QUERY_ENCODER.encode(query), k=CANDIDATE_COUNT)
+        relevance = relevance_lookup(labeled_query)
+        for mode in args.modes:
+            try:
+                ordered, elapsed_ms = rerank_with(mode, query, candidates)
+            except Exception as e:
+                print(f"{mode} failed for '{query}': {e}")
+                failures[mode] += 1
+                continue
+            ndcg_scores[mode].append(ndcg_at_k(ordered, relevance))
+            latencies[mode].append(elapsed_ms)
+
+    print(f"\n--- Re-rank Benchmark ({len(labeled_queries)} queries, {CANDIDATE_COUNT} candidates each) ---")
+    print(f"{'mode':>14} {'NDCG@10':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'failed':>7}")
+    for mode in args.modes:
+        if not latencies[mode]:
+            print(f"{mode:>14} {'-':>8} {'-':>9} {'-':>9} {failures[mode]:>7}")
+            continue
+        print(f"{mode:>14} {np.mean(ndcg_scores[mode]):>8.3f} {np.percentile(latencies[mode], 50):>9.1f} "
+              f"{np.percentile(latencies[mode], 95):>9.1f} {failures[mode]:>7}")
+
+if __name__ == "__main__":
+    main()
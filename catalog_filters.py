@@ -0,0 +1,100 @@
+import threading
+import faiss
+import numpy as np
+from catalog_store import TOMBSTONE_ID
+
+# --- Search Filter Configuration (used by search_api.py) ---
+FILTER_FIELDS = ('object_type', 'parent_table_name', 'tag', 'schema') # /search query parameters
+SELECTOR_CACHE_MAX_ENTRIES = 1024 # FAISS ID selectors kept per index state (one per filter value used)
+
+def table_schema(table_name, default_schema=None):
+    """Schema part of a catalog table name.
+
+    With several extraction targets table names are namespaced as
+    "host/schema.table"; otherwise they are plain and belong to `default_schema`.
+    """
+    if not table_name or '/' not in table_name or '.' not in table_name:
+        return default_schema
+    return table_name.split('/', 1)[1].rsplit('.', 1)[0]
+
+class CatalogFilterIndex:
+    """Precomputed item subsets of a CatalogStore per filter value.
+
+    Every (field, value) pair maps to the sorted rows of the live items that
+    match it, so a filtered search only intersects a few small arrays and
+    hands FAISS a cached ID selector instead of scanning the catalog per
+    request. Values are matched case-insensitively. A column's `schema` is
+    the schema of its parent table.
+    """
+
+    def __init__(self, catalog, default_schema=None):
+        self.row_count = len(catalog)
+        self.item_ids = np.array(catalog.ids, dtype=np.int64) # row -> DB id, the labels of the FAISS index
+        subsets = {field: {} for field in FILTER_FIELDS}
+        for row in range(self.row_count):
+            if catalog.ids[row] == TOMBSTONE_ID:
+                continue
+            object_type = catalog.object_types[row]
+            parent_table_name = catalog.parent_table_names[row]
+            table_name = catalog.object_names[row] if object_type == 'table' else parent_table_name
+            values = [('object_type', object_type), ('parent_table_name', parent_table_name),
+                      ('schema', table_schema(table_name, default_schema))]
+            values.extend(('tag', tag) for tag in catalog.tags[row])
+            for field, value in values:
+                if value:
+                    subsets[field].setdefault(value.lower(), []).append(row)
+        # Rows were appended in order, so every subset is already sorted and unique
+        self.subsets = {field: {value: np.asarray(rows, dtype=np.int64) for value, rows in by_value.items()}
+                        for field, by_value in subsets.items()}
+        self._selectors = {} # (field, value) -> faiss.IDSelectorBatch over that subset's ids
+        self._selectors_lock = threading.Lock()
+
+    def values(self, field):
+        return sorted(self.subsets[field])
+
+    def matching_rows(self, filters):
+        """Sorted rows matching every {field: value} in `filters`, or None when there are no filters."""
+        filters = {field: value for field, value in filters.items() if value}
+        if not filters:
+            return None
+        rows = None
+        for field, value in sorted(filters.items(), key=lambda entry: len(self._subset(*entry))):
+            subset = self._subset(field, value)
+            rows = subset if rows is None else np.intersect1d(rows, subset, assume_unique=True)
+            if not len(rows):
+                break
+        return rows
+
+    def id_selector(self, filters):
+        """FAISS ID selector accepting exactly the items matching `filters`, or None when there are no filters.
+
+        Single-value selectors are built once per index state and reused;
+        several filters are combined with IDSelectorAnd, which costs nothing
+        to construct per request.
+        """
+        filters = {field: value for field, value in filters.items() if value}
+        selectors = [self._selector(field, value) for field, value in sorted(filters.items())]
+        if not selectors:
+            return None
+        selector = selectors[0]
+        for other in selectors[1:]:
+            combined = faiss.IDSelectorAnd(selector, other)
+            combined.referenced_selectors = (selector, other) # Keep the parts alive as long as the combination
+            selector = combined
+        return selector
+
+    def _subset(self, field, value):
+        if field not in self.subsets:
+            raise ValueError(f"Unknown filter '{field}'; expected one of {', '.join(FILTER_FIELDS)}")
+        return self.subsets[field].get(str(value).lower(), np.empty(0, dtype=np.int64))
+
+    def _selector(self, field, value):
+        key = (field, str(value).lower())
+        with self._selectors_lock:
+            selector = self._selectors.get(key)
+            if selector is None:
+                if len(self._selectors) >= SELECTOR_CACHE_MAX_ENTRIES:
+                    self._selectors.pop(next(iter(self._selectors)))
+                selector = faiss.IDSelectorBatch(self.item_ids[self._subset(field, value)])
+                self._selectors[key] = selector
+            return selector
@@ -0,0 +1,147 @@
+import gzip
+import json
+import os
+import threading
+
+# --- Catalog File Format ---
+# JSON Lines, one record per line:
+#   {"record_type": "header", "format_version": 1, ...}            first line
+#   {"record_type": "table", "name": ..., "fingerprint": ..., "data": {...}}   one per table
+#   {"record_type": "footer", "table_count": ..., ...}              last line
+# A path ending in ".gz" is transparently gzip-compressed. Legacy single-document
+# ".json" files written by older versions of metadata_extractor.py can still be read.
+CATALOG_FORMAT_VERSION = 1
+CATALOG_FILE_PATH = "extracted_metadata.jsonl" # Use "extracted_metadata.jsonl.gz" for the compressed variant
+LEGACY_CATALOG_FILE_PATH = "extracted_metadata.json"
+
+def open_catalog_file(path, mode='r', compressed=None):
+    """Opens a catalog file in text mode, gzip-compressed if the path ends with .gz (or `compressed` says so)."""
+    if compressed is None:
+        compressed = path.endswith('.gz')
+    if compressed:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def is_legacy_catalog(path):
+    return path.endswith('.json') or path.endswith('.json.gz')
+
+class CatalogWriter:
+    """Writes a catalog file one table record at a time.
+
+    Records go to a temporary file that replaces `path` on close(), so the
+    previous catalog stays readable (e.g. as the incremental snapshot) until
+    the new one is complete. write_table() may be called from several threads.
+    """
+
+    def __init__(self, path, header=None, default=None):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.default = default # Fallback JSON serializer for values like Decimal or datetime
+        self.table_count = 0
+        self.table_names = set() # Tables already written; copy_tables_from() skips them
+        self._lock = threading.Lock()
+        self._file = open_catalog_file(self.tmp_path, 'w', compressed=path.endswith('.gz'))
+        header_record = {"record_type": "header", "format_version": CATALOG_FORMAT_VERSION}
+        header_record.update(header or {})
+        self._write_record(header_record)
+
+    def _write_record(self, record):
+        self._file.write(json.dumps(record, default=self.default))
+        self._file.write("\n")
+
+    def write_table(self, table_name, table_info, fingerprint=None):
+        record = {"record_type": "table", "name": table_name, "fingerprint": fingerprint, "data": table_info}
+        with self._lock:
+            self._write_record(record)
+            self.table_count += 1
+            self.table_names.add(table_name)
+
+    def copy_tables_from(self, path, table_names):
+        """Streams the records of `table_names` from an existing catalog file into this one.
+
+        Tables that were already written (e.g. streamed by an extraction target
+        that failed afterwards) are skipped, so each table has one record.
+        """
+        with self._lock:
+            wanted = set(table_names) - self.table_names
+        if not wanted or not path or not os.path.exists(path):
+            return 0
+        copied = 0
+        for table_name, table_info, fingerprint in iter_catalog_table_records(path):
+            if table_name in wanted:
+                wanted.discard(table_name) # The first record of a table wins, as in files written before this check
+                self.write_table(table_name, table_info, fingerprint)
+                copied += 1
+        return copied
+
+    def close(self, footer=None):
+        footer_record = {"record_type": "footer", "table_count": self.table_count}
+        footer_record.update(footer or {})
+        with self._lock:
+            self._write_record(footer_record)
+            self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Discards the partially written file and leaves any existing catalog untouched."""
+        with self._lock:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+def iter_catalog_records(path):
+    """Yields the records of a catalog file lazily, one line at a time."""
+    if is_legacy_catalog(path):
+        # Old single-document format: has to be loaded whole, then replayed as records
+        with open_catalog_file(path) as f:
+            document = json.load(f)
+        fingerprints = document.get('fingerprints', {})
+        header = {k: v for k, v in document.items() if k not in ('tables', 'fingerprints')}
+        header.update(record_type="header", format_version=0)
+        yield header
+        for table_name, table_info in document.get('tables', {}).items():
+            yield {"record_type": "table", "name": table_name, "fingerprint": fingerprints.get(table_name), "data": table_info}
+        yield {"record_type": "footer", "table_count": len(document.get('tables', {}))}
+        return
+    with open_catalog_file(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def iter_catalog_table_records(path):
+    """Yields (table_name, table_info, fingerprint) for every table record."""
+    for record in iter_catalog_records(path):
+        if record.get('record_type') == 'table':
+            yield record['name'], record['data'], record.get('fingerprint')
+
+def iter_catalog_tables(path):
+    """Yields (table_name, table_info) for every table in the catalog."""
+    for table_name, table_info, _ in iter_catalog_table_records(path):
+        yield table_name, table_info
+
+def read_catalog_fingerprints(path):
+    """Returns {table_name: fingerprint} without keeping any table data in memory."""
+    return {
+        table_name: fingerprint
+        for table_name, _, fingerprint in iter_catalog_table_records(path)
+        if fingerprint
+    }
+
+def catalog_path_variants(path):
+    """`path` and its gzip-compressed (or uncompressed) counterpart."""
+    return (path, path[:-len('.gz')]) if path.endswith('.gz') else (path, path + '.gz')
+
+def find_existing_catalog(path=CATALOG_FILE_PATH):
+    """Returns the catalog file to read for `path`, or None.
+
+    That is the newer of `path` and its .gz / uncompressed variant (so readers
+    find the catalog whichever way metadata_extractor.py writes it), else the
+    legacy extracted_metadata.json if that exists.
+    """
+    existing = [candidate for candidate in catalog_path_variants(path) if os.path.exists(candidate)] if path else []
+    if existing:
+        return max(existing, key=os.path.getmtime)
+    if os.path.exists(LEGACY_CATALOG_FILE_PATH):
+        return LEGACY_CATALOG_FILE_PATH
+    return None
@@ -0,0 +1,161 @@
+import json
+import sys
+from array import array
+import numpy as np
+
+TOMBSTONE_ID = -1 # Id of a row whose item was removed by a live index update
+
+class CatalogStore:
+    """Compact, column-oriented store of the searchable catalog items.
+
+    Each row describes one vector of the FAISS index. Each field lives in its own
+    parallel array: ids in a typed int64 array, repeated strings (object
+    types, names, parent tables, tags) interned so equal values share one
+    object, and tags as tuples. No embedding bytes are kept.
+
+    The FAISS index labels vectors with the item ids; rows_for_ids() maps
+    search results back to rows through a sorted id array. Live updates
+    tombstone removed rows and append new ones.
+    """
+
+    __slots__ = ('ids', 'object_types', 'object_names', 'parent_table_names', 'descriptions', 'tags',
+                 'tombstones', '_id_lookup')
+
+    FIELDS = ('id', 'object_type', 'object_name', 'parent_table_name', 'semantic_description', 'tags')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.object_types = []
+        self.object_names = []
+        self.parent_table_names = []
+        self.descriptions = []
+        self.tags = []
+        self.tombstones = 0
+        self._id_lookup = None # (sorted ids, their rows), built on first lookup
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def live_count(self):
+        return len(self.ids) - self.tombstones
+
+    def append(self, item_id, object_type, object_name, parent_table_name, description, tags):
+        self._id_lookup = None
+        self.ids.append(int(item_id))
+        self.object_types.append(intern_or_none(object_type))
+        self.object_names.append(intern_or_none(object_name))
+        self.parent_table_names.append(intern_or_none(parent_table_name))
+        self.descriptions.append(description)
+        self.tags.append(normalize_tags(tags))
+
+    def append_item(self, item):
+        """Appends one row from a dict with the FIELDS keys (e.g. a cursor row)."""
+        self.append(item['id'], item.get('object_type'), item.get('object_name'), item.get('parent_table_name'),
+                    item.get('semantic_description'), item.get('tags'))
+
+    @classmethod
+    def from_items(cls, items):
+        store = cls()
+        for item in items:
+            store.append_item(item)
+        return store
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Builds a store from {field: [values...]}, as written by to_columns()."""
+        store = cls()
+        for row in zip(*(columns[field] for field in cls.FIELDS)):
+            store.append(*row)
+        return store
+
+    def copy(self):
+        """A shallow copy that can be modified without affecting this store (copy-on-write updates)."""
+        store = CatalogStore()
+        store.ids = array('q', self.ids)
+        store.object_types = list(self.object_types)
+        store.object_names = list(self.object_names)
+        store.parent_table_names = list(self.parent_table_names)
+        store.descriptions = list(self.descriptions)
+        store.tags = list(self.tags)
+        store.tombstones = self.tombstones
+        return store
+
+    def extend(self, other):
+        self._id_lookup = None
+        self.ids.extend(other.ids)
+        self.object_types.extend(other.object_types)
+        self.object_names.extend(other.object_names)
+        self.parent_table_names.extend(other.parent_table_names)
+        self.descriptions.extend(other.descriptions)
+        self.tags.extend(other.tags)
+        self.tombstones += other.tombstones
+
+    def remove_ids(self, item_ids):
+        """Tombstones the rows of `item_ids`; their slots are reclaimed on the next full rebuild."""
+        for row in self.rows_for_ids(item_ids):
+            if row >= 0:
+                self.ids[row] = TOMBSTONE_ID
+                self.descriptions[row] = None
+                self.tombstones += 1
+        self._id_lookup = None
+
+    def live_ids(self):
+        ids = np.array(self.ids, dtype=np.int64)
+        return ids[ids != TOMBSTONE_ID]
+
+    def build_id_lookup(self):
+        ids = np.array(self.ids, dtype=np.int64)
+        rows = np.flatnonzero(ids != TOMBSTONE_ID)
+        order = np.argsort(ids[rows], kind='stable')
+        self._id_lookup = (ids[rows][order], rows[order])
+        return self._id_lookup
+
+    def rows_for_ids(self, item_ids):
+        """Rows of `item_ids` (e.g. FAISS result labels); -1 where an id is not in the store."""
+        sorted_ids, rows = self._id_lookup or self.build_id_lookup()
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        if not len(sorted_ids):
+            return np.full(item_ids.shape, -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(sorted_ids, item_ids), len(sorted_ids) - 1)
+        return np.where(sorted_ids[positions] == item_ids, rows[positions], -1)
+
+    def to_columns(self):
+        """{field: [values...]} of the live rows, for the index sidecar."""
+        rows = [row for row, item_id in enumerate(self.ids) if item_id != TOMBSTONE_ID]
+        return {
+            'id': [self.ids[row] for row in rows],
+            'object_type': [self.object_types[row] for row in rows],
+            'object_name': [self.object_names[row] for row in rows],
+            'parent_table_name': [self.parent_table_names[row] for row in rows],
+            'semantic_description': [self.descriptions[row] for row in rows],
+            'tags': [list(self.tags[row]) for row in rows]
+        }
+
+    def result_row(self, row, similarity_score=None):
+        """The JSON-ready search result for `row`, built directly from the columns."""
+        result = {
+            'id': self.ids[row],
+            'object_type': self.object_types[row],
+            'object_name': self.object_names[row],
+            'parent_table_name': self.parent_table_names[row],
+            'semantic_description': self.descriptions[row],
+            'tags': self.tags[row]
+        }
+        if similarity_score is not None:
+            result['similarity_score'] = similarity_score
+        return result
+
+def intern_or_none(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def normalize_tags(tags):
+    """Returns tags as a tuple of interned strings, accepting a list or a JSON-encoded list."""
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags)
+        except (json.JSONDecodeError, TypeError):
+            tags = []
+    if not isinstance(tags, (list, tuple)):
+        return ()
+    return tuple(intern_or_none(tag) for tag in tags)
@@ -0,0 +1,17 @@
+import os
+
+# Gunicorn settings for search_api (start with: gunicorn -c gunicorn.conf.py wsgi:app)
+
+# --- Server Configuration ---
+bind = os.environ.get("SEARCH_API_BIND", "127.0.0.1:5001") # Same port as the development server, so search_ui.py works unchanged
+workers = int(os.environ.get("SEARCH_API_WORKERS", 4)) # Each worker loads its own Sentence Transformer (~100 MB)
+worker_class = "gthread"
+threads = int(os.environ.get("SEARCH_API_THREADS", 8)) # Requests in flight per worker; concurrent query misses are batched together
+timeout = 60
+graceful_timeout = 30
+preload_app = True # Load the index once in the master (wsgi.py) and fork workers that share it
+
+def post_fork(server, worker):
+    """Starts the per-worker background threads and models; nothing started in the master survives fork."""
+    import search_api
+    search_api.init_worker()
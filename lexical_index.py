@@ -0,0 +1,219 @@
+import re
+from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
+import numpy as np
+from catalog_store import TOMBSTONE_ID
+
+# --- BM25 Configuration (used by search_api.py) ---
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Term-frequency weight of each field; a hit on the item's own name counts most
+FIELD_WEIGHTS = {'object_name': 3.0, 'parent_table_name': 1.0, 'tags': 2.0, 'semantic_description': 1.0}
+# Query terms in more than this fraction of items are skipped when rarer terms also match: their
+# idf is near zero, so they barely change the ranking but their postings dominate query time
+COMMON_TERM_DOC_FRACTION = 0.5
+INDEXED_FIELDS = tuple(FIELD_WEIGHTS)
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+# Splits identifier words into camelCase / PascalCase / ACRONYMWords / digit parts
+IDENTIFIER_PART_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# Descriptions are tokenized in one split() over their lowercased, joined text. The separator between
+# them is uppercase, so it can never be a word of a lowercased description
+DESCRIPTION_SEPARATOR = "X"
+# Keeps lowercase ASCII letters, digits and the separator; every other byte becomes a space
+DESCRIPTION_BYTE_MAP = bytes.maketrans(bytes(range(256)), bytes(
+    byte if chr(byte) in "abcdefghijklmnopqrstuvwxyz0123456789" + DESCRIPTION_SEPARATOR else ord(" ")
+    for byte in range(256)))
+
+@lru_cache(maxsize=200000)
+def tokenize_identifier(text):
+    """Tokens of an identifier-like string: the whole lowercased identifier plus its parts.
+
+    `order_item_id` -> order_item_id, order, item, id; `OrderItems` -> orderitems, order, items.
+    Cached, since table names and tags repeat across many catalog rows.
+    """
+    if not text:
+        return ()
+    tokens = []
+    for identifier in re.split(r"[^A-Za-z0-9_]+", text):
+        if not identifier:
+            continue
+        parts = [part.lower() for word in identifier.split('_') for part in IDENTIFIER_PART_PATTERN.findall(word)]
+        whole = identifier.lower()
+        if len(parts) != 1 or parts[0] != whole:
+            tokens.append(whole)
+        tokens.extend(parts)
+    return tuple(tokens)
+
+def tokenize_text(text):
+    """Lowercased word tokens of free text (descriptions). LexicalIndex tokenizes descriptions the same way, in bulk."""
+    if not text:
+        return []
+    return WORD_PATTERN.findall(text.lower())
+
+def tokenize_query(query):
+    """Query tokens: identifiers are split like catalog names, so `orderItemId` matches `order_item_id`."""
+    return tokenize_identifier(query)
+
+class LexicalIndex:
+    """In-memory BM25 index over the rows of a CatalogStore.
+
+    Indexes object_name, parent_table_name, tags and semantic_description
+    (weighted per FIELD_WEIGHTS) with identifier-aware tokenization. Postings
+    are stored CSR-style: one array of rows and one of precomputed BM25 term
+    scores, sliced per term, so a query only touches its own terms' postings.
+    Row numbers match the CatalogStore the index was built from.
+
+    The build is vectorized: identifier fields are tokenized once per distinct
+    value, descriptions in one pass over their joined text, and postings are
+    aggregated with numpy. Given the `previous` index of a catalog that live
+    updates have since changed (tombstoned rows, appended rows; see
+    CatalogStore.copy), only the appended rows are tokenized and the previous
+    postings are reused.
+    """
+
+    def __init__(self, catalog, previous=None):
+        self.row_count = len(catalog)
+        self.doc_count = catalog.live_count
+        if previous is not None and previous.row_count > self.row_count:
+            raise ValueError("The previous lexical index has more rows than the catalog.")
+        first_row = previous.row_count if previous is not None else 0
+        self.vocabulary = dict(previous.vocabulary) if previous is not None else {} # term -> term id
+        ids = np.array(catalog.ids, dtype=np.int64)
+        live = ids != TOMBSTONE_ID
+        term_ids, rows, fields = self._tokenize(catalog, np.flatnonzero(live[first_row:]) + first_row)
+        field_weights = np.array([FIELD_WEIGHTS[field] for field in INDEXED_FIELDS], dtype=np.float32)
+        self.doc_lengths = np.bincount(rows, weights=field_weights[fields], minlength=self.row_count).astype(np.float32)
+
+        # Aggregate weighted term frequencies per (term, row); sorting by term gives the CSR layout.
+        # The field is packed into the low digits of the sort key: np.sort is much faster than argsort
+        row_count = max(self.row_count, 1)
+        keys = np.sort((term_ids * row_count + rows) * len(INDEXED_FIELDS) + fields)
+        weights = field_weights[keys % len(INDEXED_FIELDS)]
+        keys //= len(INDEXED_FIELDS)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+        keys = keys[starts]
+        freqs = np.add.reduceat(weights, starts) if len(starts) else np.empty(0, dtype=np.float32)
+        if previous is not None:
+            kept = live[previous.posting_rows]
+            previous_terms = np.repeat(np.arange(len(previous.term_offsets) - 1), np.diff(previous.term_offsets))
+            # Both runs are sorted by (term, row), so the stable sort just merges them
+            keys = np.concatenate((previous_terms[kept] * row_count + previous.posting_rows[kept], keys))
+            order = np.argsort(keys, kind='stable')
+            keys, freqs = keys[order], np.concatenate((previous.posting_freqs[kept], freqs))[order]
+            self.doc_lengths[:first_row] = np.where(live[:first_row], previous.doc_lengths, 0)
+        posting_terms = keys // row_count
+        self.posting_rows = keys % row_count
+        self.posting_freqs = freqs
+        self.term_offsets = np.searchsorted(posting_terms, np.arange(len(self.vocabulary) + 1))
+
+        average_length = float(self.doc_lengths.sum() / self.doc_count) if self.doc_count else 1.0
+        doc_freqs = np.diff(self.term_offsets)
+        idf = np.log(1 + (self.doc_count - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / max(average_length, 1e-9))
+        # Full BM25 contribution of each posting, so queries only add precomputed scores
+        self.posting_scores = (idf[posting_terms] * freqs * (BM25_K1 + 1) / (freqs + length_norm[self.posting_rows])).astype(np.float32)
+
+    def _tokenize(self, catalog, rows):
+        """(term ids, rows, INDEXED_FIELDS positions) of every token of `rows`, adding new terms to the vocabulary."""
+        row_list = rows.tolist()
+        tags = [catalog.tags[row] for row in row_list]
+        tag_rows = np.repeat(rows, np.fromiter(map(len, tags), dtype=np.int64, count=len(tags)))
+        fields = [
+            self._identifier_tokens(rows, [catalog.object_names[row] for row in row_list], INDEXED_FIELDS.index('object_name')),
+            self._identifier_tokens(rows, [catalog.parent_table_names[row] for row in row_list], INDEXED_FIELDS.index('parent_table_name')),
+            self._identifier_tokens(tag_rows, list(chain.from_iterable(tags)), INDEXED_FIELDS.index('tags')),
+            self._description_tokens(rows, [catalog.descriptions[row] for row in row_list], INDEXED_FIELDS.index('semantic_description'))
+        ]
+        return tuple(np.concatenate(column) for column in zip(*fields))
+
+    def _identifier_tokens(self, rows, values, field):
+        """Tokens of one identifier value per row; each distinct value is tokenized once."""
+        distinct = {value: position for position, value in enumerate(dict.fromkeys(values))}
+        value_positions = np.fromiter(map(distinct.__getitem__, values), dtype=np.int64, count=len(values))
+        value_tokens = [tokenize_identifier(value) for value in distinct]
+        value_lengths = np.fromiter(map(len, value_tokens), dtype=np.int64, count=len(value_tokens))
+        value_term_ids = self._term_ids(list(chain.from_iterable(value_tokens)))
+        # Each row's tokens are its value's slice of value_term_ids
+        row_lengths = value_lengths[value_positions]
+        token_rows = np.repeat(rows, row_lengths)
+        slice_shifts = (np.cumsum(value_lengths) - value_lengths)[value_positions] - (np.cumsum(row_lengths) - row_lengths)
+        term_ids = value_term_ids[np.arange(len(token_rows)) + np.repeat(slice_shifts, row_lengths)]
+        return term_ids, token_rows, np.full(len(term_ids), field, dtype=np.int64)
+
+    def _description_tokens(self, rows, descriptions, field):
+        """tokenize_text() tokens of one description per row, split in a single pass over their joined text."""
+        if not descriptions:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        text = f" {DESCRIPTION_SEPARATOR} ".join(map(str.lower, (description or "" for description in descriptions)))
+        # Non-ASCII characters become '?' and then spaces, so words split exactly as with WORD_PATTERN
+        tokens = text.encode('ascii', 'replace').translate(DESCRIPTION_BYTE_MAP).decode('ascii').split()
+        term_ids = self._term_ids(tokens)
+        separators = np.flatnonzero(term_ids < 0)
+        row_lengths = np.diff(np.concatenate(([-1], separators, [len(term_ids)]))) - 1
+        term_ids = term_ids[term_ids >= 0]
+        return term_ids, np.repeat(rows, row_lengths), np.full(len(term_ids), field, dtype=np.int64)
+
+    def _term_ids(self, tokens):
+        """Term ids of `tokens`, adding new terms to the vocabulary; -1 for DESCRIPTION_SEPARATOR."""
+        # dict.fromkeys / map keep the per-token work in C, which dominates the build time
+        distinct = {term: position for position, term in enumerate(dict.fromkeys(tokens))}
+        vocabulary = self.vocabulary
+        distinct_ids = np.array([-1 if term == DESCRIPTION_SEPARATOR else vocabulary.setdefault(term, len(vocabulary))
+                                 for term in distinct], dtype=np.int64)
+        return distinct_ids[np.fromiter(map(distinct.__getitem__, tokens), dtype=np.int64, count=len(tokens))]
+
+    def search(self, query, k=10, allowed_rows=None):
+        """Returns (rows, scores) of the top-k rows for `query`, best first.
+
+        `allowed_rows` (sorted, e.g. from CatalogFilterIndex.matching_rows) restricts the result to those rows.
+        """
+        term_ids = {self.vocabulary[term] for term in tokenize_query(query) if term in self.vocabulary}
+        slices = [(self.term_offsets[term_id], self.term_offsets[term_id + 1]) for term_id in term_ids]
+        rare_slices = [(start, end) for start, end in slices if end - start <= COMMON_TERM_DOC_FRACTION * self.doc_count]
+        if rare_slices:
+            slices = rare_slices
+        posting_count = sum(end - start for start, end in slices)
+        if posting_count == 0 or (allowed_rows is not None and not len(allowed_rows)):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if len(slices) > 1 and posting_count * 8 > self.row_count:
+            # Long posting lists: accumulate into a dense score array (rows are unique within a term)
+            dense = np.zeros(self.row_count, dtype=np.float32)
+            for start, end in slices:
+                dense[self.posting_rows[start:end]] += self.posting_scores[start:end]
+            if allowed_rows is not None:
+                allowed_scores = dense[allowed_rows]
+                dense = np.zeros(self.row_count, dtype=np.float32)
+                dense[allowed_rows] = allowed_scores
+            rows = np.argpartition(-dense, k)[:k] if k < self.row_count else np.arange(self.row_count)
+            rows = rows[dense[rows] > 0]
+            scores = dense[rows]
+        else:
+            if len(slices) == 1:
+                start, end = slices[0]
+                rows, scores = self.posting_rows[start:end], self.posting_scores[start:end]
+            else:
+                all_rows = np.concatenate([self.posting_rows[start:end] for start, end in slices])
+                all_scores = np.concatenate([self.posting_scores[start:end] for start, end in slices])
+                order = np.argsort(all_rows, kind='stable')
+                all_rows, all_scores = all_rows[order], all_scores[order]
+                starts = np.flatnonzero(np.r_[True, all_rows[1:] != all_rows[:-1]])
+                rows, scores = all_rows[starts], np.add.reduceat(all_scores, starts)
+            if allowed_rows is not None:
+                positions = np.minimum(np.searchsorted(allowed_rows, rows), len(allowed_rows) - 1)
+                keep = allowed_rows[positions] == rows
+                rows, scores = rows[keep], scores[keep]
+            if len(rows) > k:
+                top = np.argpartition(-scores, k)[:k]
+                rows, scores = rows[top], scores[top]
+        best_first = np.argsort(-scores, kind='stable')
+        return rows[best_first], scores[best_first]
+
+def reciprocal_rank_fusion(ranked_lists, k=60):
+    """Fuses several ranked lists of keys with RRF; returns [(key, score)], best first."""
+    fused = defaultdict(float)
+    for ranked in ranked_lists:
+        for rank, key in enumerate(ranked):
+            fused[key] += 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda entry: entry[1], reverse=True)
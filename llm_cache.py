@@ -0,0 +1,115 @@
+import sqlite3
+import hashlib
+import json
+import threading
+import time
+
+# --- Cache Configuration (shared by llm_enrichment.py and relationship_inferer.py) ---
+LLM_CACHE_PATH = "llm_response_cache.sqlite" # On-disk SQLite file holding cached LLM responses
+LLM_CACHE_MAX_ENTRIES = 100000 # Least recently used responses are evicted beyond this many entries
+
+class LLMResponseCache:
+    """Persistent, content-addressed cache of raw LLM responses.
+
+    Entries are keyed by a SHA-256 of (model name, prompt template, rendered
+    prompt inputs), so a prompt is only sent to the model again when one of
+    those changes. The cache is bounded to `max_entries` rows and evicts the
+    least recently used ones. Safe to share between worker threads.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                cache_key TEXT PRIMARY KEY,
+                model_name TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_accessed ON llm_responses (last_accessed)")
+        self._conn.commit()
+        self._entry_count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        print(f"LLM response cache opened at {path} ({self._entry_count} entries).")
+
+    @staticmethod
+    def make_key(model_name, prompt_template, prompt_input):
+        """Builds the content address for one prompt."""
+        payload = json.dumps([model_name, prompt_template, prompt_input], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, cache_key):
+        """Returns the cached response for `cache_key`, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM llm_responses WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE llm_responses SET last_accessed = ? WHERE cache_key = ?", (time.time(), cache_key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, cache_key, model_name, response):
+        """Stores a response and evicts the least recently used entries if the cache is full."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO llm_responses (cache_key, model_name, response, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                (cache_key, model_name, response, now, now)
+            )
+            if cursor.rowcount:
+                self._entry_count += 1
+            else:
+                self._conn.execute(
+                    "UPDATE llm_responses SET response = ?, last_accessed = ? WHERE cache_key = ?",
+                    (response, now, cache_key)
+                )
+            overflow = self._entry_count - self.max_entries
+            if overflow > 0:
+                self._conn.execute("""
+                    DELETE FROM llm_responses WHERE cache_key IN (
+                        SELECT cache_key FROM llm_responses ORDER BY last_accessed ASC LIMIT ?
+                    )
+                """, (overflow,))
+                self._entry_count -= overflow
+                self.evictions += overflow
+            self._conn.commit()
+
+    def invalidate(self, cache_key):
+        """Drops one entry, e.g. when its response turned out to be unparsable."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (cache_key,))
+            self._entry_count -= cursor.rowcount
+            self._conn.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self._entry_count,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate), "
+              f"{stats['evictions']} evictions, {stats['entries']} entries.")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,9 +1,14 @@
 import mysql.connector
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import openai
 from langchain_openai import ChatOpenAI # Changed from ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from llm_cache import LLMResponseCache
+from catalog_io import iter_catalog_tables, find_existing_catalog, CATALOG_FILE_PATH
 
 # --- Database Connection Details (same as other scripts) ---
 DB_CONFIG = {
@@ -19,7 +24,24 @@ DB_CONFIG = {
 LLM_MODEL_NAME = 'gemma-3-4b-it-qat' # Or your specific model in LM Studio
 LLM_BASE_URL = 'http://127.0.0.1:1234/v1' # LM Studio OpenAI-compatible endpoint
 
-METADATA_FILE_PATH = "extracted_metadata.json"
+METADATA_FILE_PATH = CATALOG_FILE_PATH # Catalog written by metadata_extractor.py; its .gz variant is found too
+CHANGES_FILE_PATH = "metadata_changes.json" # Written by metadata_extractor.py
+INCREMENTAL_ENRICHMENT = True # Only enrich tables added/changed since the last extraction (if a change set exists)
+
+# --- Concurrency / Rate Limiting ---
+ENRICHMENT_CONCURRENCY = 8 # Number of LLM requests in flight at once (1 = sequential)
+MAX_PENDING_TASKS_PER_WORKER = 4 # Tables are read from the catalog lazily; this bounds how far ahead we read
+LLM_REQUEST_TIMEOUT = 120 # Seconds before a single LLM request is treated as timed out
+LLM_MAX_RETRIES = 5 # Retries per prompt after a 429 / timeout before giving up
+RATE_LIMIT_MIN_INTERVAL = 0.0 # Seconds between request starts when the server is healthy
+RATE_LIMIT_MAX_INTERVAL = 30.0 # Upper bound for the back-off interval
+
+# --- Response Cache ---
+USE_LLM_CACHE = True # Reuse cached responses for prompts whose inputs haven't changed (see llm_cache.py)
+
+# --- Column Batching ---
+COLUMN_ENRICHMENT_MODE = 'batch' # 'batch' (one prompt per chunk of columns) or 'per_column'
+COLUMN_BATCH_SIZE = 25 # Max columns per batched prompt; wide tables are split into chunks of this size
 
 # --- Prompt Templates ---
 TABLE_PROMPT_TEMPLATE = """
@@ -49,6 +71,7 @@ Column Type: {column_type_full}
 Column is Nullable: {is_nullable}
 Column is Primary Key: {is_primary_key}
 Context (other columns in table): {other_column_names}
+Column Profile: {column_profile}
 Sample Data from this column (first few values):
 {sample_column_values}
 
@@ -57,13 +80,32 @@ Description: [Your generated description here]
 Tags: [tag1, tag2, tag3]
 """
 
+BATCH_COLUMN_PROMPT_TEMPLATE = """
+You are a helpful data catalog assistant. For EACH database column listed below, generate a concise,
+human-readable semantic description and relevant tags (as a comma-separated list of single words or short phrases).
+Explain what specific information each column holds within its table.
+
+Table Name: {table_name}
+All columns in table: {all_column_names}
+
+Columns to describe:
+{columns_block}
+
+Respond with one block per column, in the same order, in the following format, and nothing else:
+Column: [column name exactly as given]
+Description: [Your generated description here]
+Tags: [tag1, tag2, tag3]
+"""
+
 def get_llm_instance():
     """Initializes and returns the LangChain LLM instance for LM Studio."""
     try:
         llm = ChatOpenAI(
             model=LLM_MODEL_NAME,
             base_url=LLM_BASE_URL,
-            api_key="not-needed"  # LM Studio typically doesn't require an API key
+            api_key="not-needed",  # LM Studio typically doesn't require an API key
+            timeout=LLM_REQUEST_TIMEOUT,
+            max_retries=0 # Retries are handled by AdaptiveRateLimiter so it can see 429s and timeouts
         )
         # Perform a simple test invocation
         print(f"Attempting to connect to LLM: {LLM_MODEL_NAME} at {LLM_BASE_URL}...")
@@ -76,6 +118,89 @@ def get_llm_instance():
         print("Also, verify the Base URL and Model Name in this script.")
         return None
 
+class AdaptiveRateLimiter:
+    """Paces LLM requests shared by all worker threads.
+
+    Requests start at most once per `interval` seconds. The interval grows
+    multiplicatively whenever the server answers with a 429 or times out, and
+    shrinks again on every successful call, so a healthy server is never
+    slowed down by a fixed sleep.
+    """
+
+    def __init__(self, min_interval=RATE_LIMIT_MIN_INTERVAL, max_interval=RATE_LIMIT_MAX_INTERVAL,
+                 initial_backoff=1.0, backoff_factor=2.0, recovery_factor=0.8):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_backoff = initial_backoff
+        self.backoff_factor = backoff_factor
+        self.recovery_factor = recovery_factor
+        self.interval = min_interval
+        self.throttle_events = 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until the caller is allowed to start its next request."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_success(self):
+        with self._lock:
+            self.interval *= self.recovery_factor
+            if self.interval < max(self.min_interval, 0.01):
+                self.interval = self.min_interval
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttle_events += 1
+            self.interval = min(self.max_interval, max(self.interval * self.backoff_factor, self.initial_backoff))
+            # Push back every waiting worker, not just the one that was throttled
+            self._next_slot = max(self._next_slot, time.monotonic() + self.interval)
+
+
+def is_throttling_error(error):
+    """Returns True for errors that mean the LLM server is overloaded rather than the prompt being bad."""
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, TimeoutError)):
+        return True
+    return getattr(error, 'status_code', None) in (429, 503)
+
+
+def invoke_with_backoff(chain, prompt_input, rate_limiter, label, cache=None, prompt_template=None):
+    """Invokes a LangChain chain, backing off and retrying on 429s and timeouts.
+
+    When a cache is given, the response is looked up by (model, template, inputs)
+    first and the LLM is only called on a miss.
+    """
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(LLM_MODEL_NAME, prompt_template, prompt_input)
+        cached_output = cache.get(cache_key)
+        if cached_output is not None:
+            return cached_output
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            result = chain.invoke(prompt_input)
+        except Exception as e:
+            if rate_limiter and is_throttling_error(e) and attempt < LLM_MAX_RETRIES:
+                rate_limiter.on_throttle()
+                print(f"LLM throttled for {label} ({e.__class__.__name__}). Backing off to {rate_limiter.interval:.1f}s (retry {attempt + 1}/{LLM_MAX_RETRIES}).")
+                continue
+            raise
+        if rate_limiter:
+            rate_limiter.on_success()
+        if cache is not None:
+            cache.put(cache_key, LLM_MODEL_NAME, result)
+        return result
+
+
 def parse_llm_output(text_output):
     """Parses the LLM's text output to extract description and tags."""
     description = ""
@@ -102,7 +227,7 @@ def parse_llm_output(text_output):
 
 
 def store_enriched_metadata(object_type, object_name, parent_table_name, tech_metadata, semantic_desc, tags_list):
-    """Stores the enriched metadata into the database."""
+    """Stores the enriched metadata into the database. Returns True if the row was stored."""
     conn = None
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
@@ -129,6 +254,7 @@ def store_enriched_metadata(object_type, object_name, parent_table_name, tech_me
         ))
         conn.commit()
         print(f"Stored/Updated enriched metadata for: {object_type} - {object_name}")
+        return True
 
     except mysql.connector.Error as err:
         print(f"Database error while storing enriched metadata for {object_name}: {err}")
@@ -140,12 +266,183 @@ def store_enriched_metadata(object_type, object_name, parent_table_name, tech_me
         if conn and conn.is_connected():
             cursor.close()
             conn.close()
+    return False
+
+def format_column_profile(profile):
+    """Summarizes the statistics from metadata_extractor's profiling pass in one line."""
+    if not profile:
+        return "Not profiled"
+    parts = []
+    if profile.get('null_fraction') is not None:
+        parts.append(f"{profile['null_fraction']:.1%} nulls")
+    if profile.get('approx_distinct') is not None:
+        parts.append(f"~{profile['approx_distinct']} distinct values")
+    if profile.get('min') is not None or profile.get('max') is not None:
+        parts.append(f"range {profile.get('min')} .. {profile.get('max')}")
+    if profile.get('avg_length') is not None:
+        parts.append(f"length {profile.get('min_length')}-{profile.get('max_length')} (avg {profile['avg_length']})")
+    if profile.get('top_values'):
+        top = ", ".join(f"{item['value']} ({item['count']})" for item in profile['top_values'])
+        parts.append(f"most common: {top}")
+    if profile.get('is_sampled'):
+        parts.append(f"based on a sample of {profile.get('profiled_rows')} rows")
+    return "; ".join(parts) or "Not profiled"
+
+def get_sample_column_values(column_name, all_column_names, table_sample_data):
+    """Collects the sample values of one column from the table's sample rows."""
+    sample_column_values = []
+    if table_sample_data:
+        for row in table_sample_data:
+            if isinstance(row, dict) and column_name in row:
+                sample_column_values.append(row[column_name])
+            elif isinstance(row, list) and column_name in all_column_names and len(row) > all_column_names.index(column_name):
+                 # Fallback if sample_data isn't dicts (should be from extractor)
+                sample_column_values.append(row[all_column_names.index(column_name)])
+    return sample_column_values
+
+def parse_batch_llm_output(text_output, expected_column_names):
+    """Parses a batched column response into {column_name: (description, tags)}.
+
+    Only columns that were asked for and that came back with a description are
+    returned; anything else is left for the per-column fallback.
+    """
+    parsed = {}
+    current_column = None
+    current_desc = ""
+    current_tags = []
+
+    def flush():
+        if current_column in expected_column_names and current_desc and current_column not in parsed:
+            parsed[current_column] = (current_desc, current_tags)
+
+    for raw_line in (text_output or "").split('\n'):
+        # Models often decorate the field labels with markdown bullets or bold markers
+        line = raw_line.strip().lstrip('-*#> ').replace('**', '').strip()
+        if line.startswith("Column:"):
+            flush()
+            current_column = line.replace("Column:", "", 1).strip().strip('`"\'')
+            current_desc = ""
+            current_tags = []
+        elif current_column is not None and line.startswith("Description:"):
+            current_desc = line.replace("Description:", "", 1).strip()
+        elif current_column is not None and line.startswith("Tags:"):
+            tags_str = line.replace("Tags:", "", 1).strip().strip('[]')
+            current_tags = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
+    flush()
+    return parsed
+
+def load_changes(filepath=CHANGES_FILE_PATH):
+    """Loads the added/changed/dropped change set written by metadata_extractor.py, if any."""
+    try:
+        with open(filepath, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError:
+        print(f"Warning: Could not decode change set '{filepath}'. Enriching all tables.")
+        return None
+
+def delete_enriched_metadata_for_tables(table_names):
+    """Removes the enriched rows (table row and its column rows) of the given tables."""
+    if not table_names:
+        return
+    conn = None
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        placeholders = ", ".join(["%s"] * len(table_names))
+        cursor.execute(f"""
+            DELETE FROM enriched_metadata
+            WHERE (object_type = 'table' AND object_name IN ({placeholders}))
+               OR (object_type = 'column' AND parent_table_name IN ({placeholders}))
+        """, tuple(table_names) * 2)
+        conn.commit()
+        print(f"Removed {cursor.rowcount} stale enriched rows for {len(table_names)} tables.")
+    except mysql.connector.Error as err:
+        print(f"Database error while removing stale enriched metadata: {err}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn and conn.is_connected():
+            cursor.close()
+            conn.close()
+
+def fetch_last_enriched_id():
+    """Highest enriched_metadata id so far (0 when empty), or None on a database error."""
+    conn = None
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM enriched_metadata")
+        return int(cursor.fetchone()[0])
+    except mysql.connector.Error as err:
+        print(f"Database error while reading the last enriched id: {err}")
+        return None
+    finally:
+        if conn and conn.is_connected():
+            cursor.close()
+            conn.close()
 
-def process_table_metadata(llm, table_name, table_data):
-    """Generates and stores enriched metadata for a single table."""
+def delete_replaced_enriched_metadata(table_name, column_names, last_old_id):
+    """Removes the rows of a re-enriched table that this run's rows replace, in one transaction.
+
+    Rows up to `last_old_id` (stored by earlier runs) go when a newer row for
+    the same table/column exists, or when their column is no longer in the
+    table. An object whose re-enrichment failed keeps its previous row.
+    """
+    conn = None
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE old FROM enriched_metadata AS old
+            JOIN enriched_metadata AS new
+              ON new.object_type = old.object_type AND new.object_name = old.object_name
+             AND new.parent_table_name <=> old.parent_table_name AND new.id > %s
+            WHERE old.id <= %s
+              AND ((old.object_type = 'table' AND old.object_name = %s)
+                OR (old.object_type = 'column' AND old.parent_table_name = %s))
+        """, (last_old_id, last_old_id, table_name, table_name))
+        removed_count = cursor.rowcount
+        sql = """
+            DELETE FROM enriched_metadata
+            WHERE id <= %s AND object_type = 'column' AND parent_table_name = %s
+        """
+        if column_names:
+            sql += f" AND object_name NOT IN ({', '.join(['%s'] * len(column_names))})"
+        cursor.execute(sql, (last_old_id, table_name, *column_names))
+        removed_count += cursor.rowcount
+        conn.commit()
+        print(f"Replaced {removed_count} previous enriched rows of {table_name}.")
+    except mysql.connector.Error as err:
+        print(f"Database error while replacing enriched metadata of {table_name}: {err}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn and conn.is_connected():
+            cursor.close()
+            conn.close()
+
+def when_all_done(futures, callback):
+    """Calls callback() once every future in `futures` has finished (right away if they all have)."""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            callback()
+
+    for future in futures:
+        future.add_done_callback(on_done)
+
+def process_table_metadata(llm, table_name, table_data, rate_limiter=None, cache=None):
+    """Generates and stores enriched metadata for a single table. Returns True if a row was stored."""
     if table_name in ['enriched_metadata', 'inferred_relationships']:
         print(f"Skipping LLM enrichment for metadata table: {table_name}")
-        return
+        return False
     print(f"\nProcessing table: {table_name}...")
     
     column_details_for_prompt = []
@@ -164,12 +461,13 @@ def process_table_metadata(llm, table_name, table_data):
     
     try:
         print(f"Invoking LLM for table: {table_name}...")
-        raw_llm_output = chain.invoke(prompt_input)
+        raw_llm_output = invoke_with_backoff(chain, prompt_input, rate_limiter, f"table {table_name}",
+                                             cache=cache, prompt_template=TABLE_PROMPT_TEMPLATE)
         # print(f"LLM Raw Output for table {table_name}:\n{raw_llm_output}") # For debugging
         description, tags = parse_llm_output(raw_llm_output)
         
         if description or tags:
-            store_enriched_metadata(
+            return store_enriched_metadata(
                 object_type='table',
                 object_name=table_name,
                 parent_table_name=None,
@@ -177,31 +475,21 @@ def process_table_metadata(llm, table_name, table_data):
                 semantic_desc=description,
                 tags_list=tags
             )
-        else:
-            print(f"Skipping storage for table {table_name} due to empty description and tags.")
+        print(f"Skipping storage for table {table_name} due to empty description and tags.")
 
     except Exception as e:
         print(f"Error processing table {table_name} with LLM: {e}")
+    return False
 
-    # Small delay to avoid overwhelming the local LLM or hitting rate limits if any
-    time.sleep(2) 
-
-def process_column_metadata(llm, table_name, column_data, all_column_names, table_sample_data):
-    """Generates and stores enriched metadata for a single column."""
+def process_column_metadata(llm, table_name, column_data, all_column_names, table_sample_data, rate_limiter=None, cache=None):
+    """Generates and stores enriched metadata for a single column. Returns True if a row was stored."""
     column_name = column_data.get('name', 'N/A')
     if column_name == 'embedding_vector':
         print(f"Skipping LLM enrichment for embedding column: {table_name}.{column_name}")
-        return
+        return False
     print(f"  Processing column: {table_name}.{column_name}...")
 
-    sample_column_values = []
-    if table_sample_data:
-        for row in table_sample_data:
-            if isinstance(row, dict) and column_name in row:
-                sample_column_values.append(row[column_name])
-            elif isinstance(row, list) and len(row) > all_column_names.index(column_name):
-                 # Fallback if sample_data isn't dicts (should be from extractor)
-                sample_column_values.append(row[all_column_names.index(column_name)])
+    sample_column_values = get_sample_column_values(column_name, all_column_names, table_sample_data)
 
     prompt_input = {
         "table_name": table_name,
@@ -210,6 +498,7 @@ def process_column_metadata(llm, table_name, column_data, all_column_names, tabl
         "is_nullable": column_data.get('is_nullable', 'N/A'),
         "is_primary_key": column_data.get('is_primary_key', 'N/A'),
         "other_column_names": ", ".join([c for c in all_column_names if c != column_name]),
+        "column_profile": format_column_profile(column_data.get('profile')),
         "sample_column_values": json.dumps(sample_column_values[:5], indent=2) # First 5 sample values for this col
     }
 
@@ -218,12 +507,13 @@ def process_column_metadata(llm, table_name, column_data, all_column_names, tabl
 
     try:
         print(f"  Invoking LLM for column: {table_name}.{column_name}...")
-        raw_llm_output = chain.invoke(prompt_input)
+        raw_llm_output = invoke_with_backoff(chain, prompt_input, rate_limiter, f"column {table_name}.{column_name}",
+                                             cache=cache, prompt_template=COLUMN_PROMPT_TEMPLATE)
         # print(f"LLM Raw Output for column {table_name}.{column_name}:\n{raw_llm_output}") # For debugging
         description, tags = parse_llm_output(raw_llm_output)
 
         if description or tags:
-            store_enriched_metadata(
+            return store_enriched_metadata(
                 object_type='column',
                 object_name=column_name,
                 parent_table_name=table_name,
@@ -231,13 +521,78 @@ def process_column_metadata(llm, table_name, column_data, all_column_names, tabl
                 semantic_desc=description,
                 tags_list=tags
             )
-        else:
-            print(f"Skipping storage for column {table_name}.{column_name} due to empty description and tags.")
-            
+        print(f"Skipping storage for column {table_name}.{column_name} due to empty description and tags.")
+
     except Exception as e:
         print(f"Error processing column {table_name}.{column_name} with LLM: {e}")
-    
-    time.sleep(1) # Shorter delay for columns
+    return False
+
+def process_column_batch(llm, table_name, columns_chunk, all_column_names, table_sample_data, rate_limiter=None, cache=None):
+    """Enriches a chunk of columns of one table with a single LLM call.
+
+    Columns the model skipped or that could not be parsed are retried one by one
+    with process_column_metadata. Returns the number of column rows stored.
+    """
+    columns_to_describe = [col for col in columns_chunk if col.get('name', 'N/A') != 'embedding_vector']
+    if not columns_to_describe:
+        return 0
+    column_names = [col.get('name', 'N/A') for col in columns_to_describe]
+    print(f"  Processing {len(column_names)} columns of {table_name} in one batch...")
+
+    column_blocks = []
+    for col in columns_to_describe:
+        sample_values = get_sample_column_values(col.get('name', 'N/A'), all_column_names, table_sample_data)
+        column_blocks.append(
+            f"- Column Name: {col.get('name', 'N/A')}\n"
+            f"  Column Type: {col.get('column_type', 'N/A')}\n"
+            f"  Column is Nullable: {col.get('is_nullable', 'N/A')}\n"
+            f"  Column is Primary Key: {col.get('is_primary_key', 'N/A')}\n"
+            f"  Column Profile: {format_column_profile(col.get('profile'))}\n"
+            f"  Sample Data: {json.dumps(sample_values[:5], default=str)}"
+        )
+
+    prompt_input = {
+        "table_name": table_name,
+        "all_column_names": ", ".join(all_column_names),
+        "columns_block": "\n".join(column_blocks)
+    }
+
+    batch_prompt = ChatPromptTemplate.from_template(BATCH_COLUMN_PROMPT_TEMPLATE)
+    chain = batch_prompt | llm | StrOutputParser()
+
+    parsed = {}
+    try:
+        print(f"  Invoking LLM for column batch: {table_name} ({len(column_names)} columns)...")
+        raw_llm_output = invoke_with_backoff(chain, prompt_input, rate_limiter, f"column batch {table_name}",
+                                             cache=cache, prompt_template=BATCH_COLUMN_PROMPT_TEMPLATE)
+        parsed = parse_batch_llm_output(raw_llm_output, set(column_names))
+    except Exception as e:
+        print(f"Error processing column batch for {table_name} with LLM: {e}")
+
+    stored_count = 0
+    fallback_columns = []
+    for col in columns_to_describe:
+        column_name = col.get('name', 'N/A')
+        if column_name not in parsed:
+            fallback_columns.append(col)
+            continue
+        description, tags = parsed[column_name]
+        if store_enriched_metadata(
+            object_type='column',
+            object_name=column_name,
+            parent_table_name=table_name,
+            tech_metadata=col,
+            semantic_desc=description,
+            tags_list=tags
+        ):
+            stored_count += 1
+
+    if fallback_columns:
+        print(f"  Falling back to per-column prompts for {len(fallback_columns)} unparsed columns of {table_name}.")
+        for col in fallback_columns:
+            if process_column_metadata(llm, table_name, col, all_column_names, table_sample_data, rate_limiter, cache):
+                stored_count += 1
+    return stored_count
 
 def main():
     print("Starting LLM enrichment process...")
@@ -246,29 +601,95 @@ def main():
         print("LLM not available. Exiting.")
         return
 
-    try:
-        with open(METADATA_FILE_PATH, 'r') as f:
-            technical_metadata = json.load(f)
-    except FileNotFoundError:
+    metadata_path = find_existing_catalog(METADATA_FILE_PATH)
+    if not metadata_path:
         print(f"Error: Metadata file '{METADATA_FILE_PATH}' not found.")
-        print("Please run metadata_extractor.py first and ensure the JSON output is saved.")
-        return
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from '{METADATA_FILE_PATH}'.")
-        return
-
-    if not technical_metadata or 'tables' not in technical_metadata:
-        print("No table data found in metadata file. Exiting.")
+        print("Please run metadata_extractor.py first and ensure the catalog output is saved.")
         return
 
-    for table_name, table_data in technical_metadata.get('tables', {}).items():
-        process_table_metadata(llm, table_name, table_data)
-        
-        all_column_names_in_table = [col.get('name','') for col in table_data.get('columns', [])]
-        table_sample_data = table_data.get('sample_data', [])
-        for column_data in table_data.get('columns', []):
-            process_column_metadata(llm, table_name, column_data, all_column_names_in_table, table_sample_data)
-            
+    delta = None
+    changed_tables = set()
+    last_old_id = None
+    changes = load_changes() if INCREMENTAL_ENRICHMENT else None
+    if changes is not None:
+        changed_tables = set(changes.get('changed', []))
+        delta = set(changes.get('added', [])) | changed_tables
+        print(f"Incremental mode: enriching {len(delta)} added/changed tables, "
+              f"removing {len(changes.get('dropped', []))} dropped tables.")
+        delete_enriched_metadata_for_tables(list(changes.get('dropped', [])))
+        # Rows of a changed table are replaced once its new rows are stored (so a failed run keeps them)
+        if changed_tables:
+            last_old_id = fetch_last_enriched_id()
+            if last_old_id is None:
+                print("Warning: Previous rows of changed tables will be kept alongside their new ones.")
+
+    rate_limiter = AdaptiveRateLimiter()
+    cache = LLMResponseCache() if USE_LLM_CACHE else None
+    try:
+        start_time = time.monotonic()
+        submitted_count = 0
+        stored_count = 0
+        max_pending = max(1, ENRICHMENT_CONCURRENCY) * MAX_PENDING_TASKS_PER_WORKER
+
+        # Tables and columns are independent prompts, so they all share one worker pool.
+        # The rate limiter (not a fixed sleep) keeps the LLM server from being overwhelmed.
+        print(f"Enriching {metadata_path} with up to {ENRICHMENT_CONCURRENCY} concurrent LLM requests...")
+        with ThreadPoolExecutor(max_workers=max(1, ENRICHMENT_CONCURRENCY)) as executor:
+            pending = set()
+
+            def submit(fn, *args):
+                nonlocal stored_count
+                # Back-pressure: don't read further into the catalog than the workers can keep up with
+                while len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.discard(future)
+                        # process_table_metadata/process_column_metadata return a bool, process_column_batch a count
+                        stored_count += int(future.result())
+                future = executor.submit(fn, *args)
+                pending.add(future)
+                return future
+
+            try:
+                for table_name, table_data in iter_catalog_tables(metadata_path):
+                    if delta is not None and table_name not in delta:
+                        continue
+                    table_futures = [submit(process_table_metadata, llm, table_name, table_data, rate_limiter, cache)]
+                    submitted_count += 1
+
+                    columns = table_data.get('columns', [])
+                    all_column_names_in_table = [col.get('name','') for col in columns]
+                    table_sample_data = table_data.get('sample_data', [])
+                    # The workers skip the embedding column on purpose; it is neither stored nor failed
+                    submitted_count += sum(1 for col in columns if col.get('name', 'N/A') != 'embedding_vector')
+                    if COLUMN_ENRICHMENT_MODE == 'batch':
+                        batch_size = max(1, COLUMN_BATCH_SIZE)
+                        for start in range(0, len(columns), batch_size):
+                            table_futures.append(submit(process_column_batch, llm, table_name, columns[start:start + batch_size],
+                                                        all_column_names_in_table, table_sample_data, rate_limiter, cache))
+                    else:
+                        for column_data in columns:
+                            table_futures.append(submit(process_column_metadata, llm, table_name, column_data,
+                                                        all_column_names_in_table, table_sample_data, rate_limiter, cache))
+                    if table_name in changed_tables and last_old_id is not None:
+                        when_all_done(table_futures, lambda table_name=table_name, column_names=all_column_names_in_table:
+                                      delete_replaced_enriched_metadata(table_name, column_names, last_old_id))
+            except (IOError, ValueError) as e:
+                print(f"Error: Could not read catalog '{metadata_path}': {e}")
+
+            for future in wait(pending).done:
+                stored_count += int(future.result())
+            failed_count = submitted_count - stored_count
+
+        elapsed = time.monotonic() - start_time
+        rate = stored_count / elapsed if elapsed else 0.0
+        print(f"\nEnriched {stored_count} items ({failed_count} skipped or failed) in {elapsed:.1f}s "
+              f"- {rate:.2f} items/sec, {rate_limiter.throttle_events} throttle back-offs.")
+        if cache is not None:
+            cache.print_stats()
+    finally:
+        if cache is not None:
+            cache.close()
     print("\nLLM enrichment process finished.")
 
 if __name__ == "__main__":
@@ -1,7 +1,14 @@
 import mysql.connector
+from mysql.connector import pooling
 import json
 import decimal
 import datetime # Added missing import
+import hashlib
+import fnmatch
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from catalog_io import CatalogWriter, find_existing_catalog, read_catalog_fingerprints, CATALOG_FILE_PATH
 
 # --- Database Connection Details (same as database_setup.py) ---
 DB_CONFIG = {
@@ -13,107 +20,447 @@ DB_CONFIG = {
 
 SAMPLE_DATA_LIMIT = 5  # Number of sample rows to fetch
 
-def extract_metadata():
-    """Connects to the database and extracts schema metadata and sample data."""
-    conn = None
-    metadata = {
-        "database_name": DB_CONFIG['database'],
-        "tables": {}
+METADATA_FILE_PATH = CATALOG_FILE_PATH # JSON Lines catalog (see catalog_io.py); end with .gz to compress
+PRINT_METADATA_TO_STDOUT = False # Also echo every extracted table record to stdout
+CHANGES_FILE_PATH = "metadata_changes.json" # Added/changed/dropped tables of the last run, read by the later stages
+
+# --- Extraction Targets ---
+# (host, schema) pairs to catalog. User/password come from DB_CONFIG. With more than one
+# target, table names in the catalog are namespaced as "host/schema.table".
+EXTRACTION_TARGETS = [
+    (DB_CONFIG['host'], DB_CONFIG['database']),
+]
+EXTRACTION_MAX_WORKERS = 8 # Targets extracted in parallel
+CONNECTION_POOL_SIZE = 4 # Pooled connections per host (mysql.connector allows at most 32)
+CONNECTION_TIMEOUT = 10 # Seconds to wait when connecting, so an unreachable host fails fast
+
+# --- Extraction Mode ---
+EXTRACTION_MODE = 'bulk' # 'bulk' (one information_schema query for all columns, one for all FKs) or 'per_table'
+TABLE_INCLUDE_PATTERNS = [] # fnmatch-style patterns, e.g. ['sales_*']; empty means every table
+TABLE_EXCLUDE_PATTERNS = [] # e.g. ['tmp_*', '*_backup']
+
+# --- Column Profiling ---
+PROFILE_COLUMNS = False # Compute per-column statistics (null fraction, distinct count, min/max, top-k, lengths)
+PROFILE_SAMPLE_ROWS = 100000 # Tables with more (estimated) rows are profiled on a RAND()-bounded sample of about this size
+PROFILE_TOP_K = 5 # Most frequent values kept per column
+PROFILE_TIME_BUDGET_MS = 5000 # Per-table time budget for the profiling queries (MAX_EXECUTION_TIME)
+# Types that are not meaningful to group or compare; only their null fraction is profiled
+PROFILE_SKIP_VALUE_STATS_TYPES = {'tinyblob', 'blob', 'mediumblob', 'longblob', 'binary', 'varbinary',
+                                  'geometry', 'point', 'linestring', 'polygon', 'json', 'bit'}
+PROFILE_LENGTH_TYPES = {'char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext', 'enum', 'set'}
+
+# --- Incremental Extraction ---
+INCREMENTAL_EXTRACTION = True # Reuse sample data of tables whose fingerprint didn't change since the last snapshot
+FINGERPRINT_INCLUDE_UPDATE_TIME = False # Also treat a newer information_schema.TABLES.UPDATE_TIME as a change
+FINGERPRINT_INCLUDE_ROW_COUNT = False # Also treat a different (estimated) row count as a change
+
+def compute_table_fingerprint(table_info, table_stats=None):
+    """Hashes the structural metadata of a table (columns, types, keys, FKs).
+
+    Sample data is deliberately left out so that only schema changes, and
+    optionally UPDATE_TIME / row count changes, mark a table as changed.
+    """
+    fingerprint_source = {
+        "columns": [
+            [col.get('name'), col.get('column_type'), col.get('is_nullable'), col.get('is_primary_key'), col.get('extra')]
+            for col in table_info.get('columns', [])
+        ],
+        "primary_keys": table_info.get('primary_keys', []),
+        "foreign_keys": sorted(
+            [fk['constraint_name'], fk['column_name'], fk['references_table'], fk['references_column']]
+            for fk in table_info.get('foreign_keys', [])
+        )
+    }
+    if table_stats:
+        if FINGERPRINT_INCLUDE_UPDATE_TIME:
+            fingerprint_source["update_time"] = table_stats.get('update_time')
+        if FINGERPRINT_INCLUDE_ROW_COUNT:
+            fingerprint_source["row_count"] = table_stats.get('row_count')
+    payload = json.dumps(fingerprint_source, sort_keys=True, default=custom_json_serializer)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def fetch_table_stats(cursor, db_name):
+    """Fetches UPDATE_TIME and the estimated row count of every table in one information_schema query."""
+    cursor.execute("""
+        SELECT TABLE_NAME, UPDATE_TIME, TABLE_ROWS
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = %s
+    """, (db_name,))
+    return {
+        row['TABLE_NAME']: {"update_time": row['UPDATE_TIME'], "row_count": row['TABLE_ROWS']}
+        for row in cursor.fetchall()
     }
 
+def load_previous_snapshot(filepath=METADATA_FILE_PATH):
+    """Reads the fingerprints of the catalog written by the previous run.
+
+    Only {table_name: fingerprint} is kept in memory; the records of unchanged
+    tables are streamed from `snapshot["path"]` into the new catalog afterwards.
+    Returns None if there is no usable snapshot.
+    """
+    previous_path = find_existing_catalog(filepath)
+    if not previous_path:
+        return None
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True) # Use dictionary cursor for easier row access
-        db_name = DB_CONFIG['database']
-
-        # 1. List Tables
-        cursor.execute("SHOW TABLES")
-        tables = [row[f'Tables_in_{db_name}'] for row in cursor.fetchall()]
-
-        for table_name in tables:
-            print(f"Extracting metadata for table: {table_name}...")
-            table_info = {
-                "columns": [],
-                "primary_keys": [],
-                "foreign_keys": [],
-                "sample_data": []
-            }
-
-            # 2. Get Columns and Primary Keys
-            # Using information_schema.columns for more detail
-            sql_columns = f"""
-                SELECT 
-                    COLUMN_NAME, 
-                    DATA_TYPE, 
-                    COLUMN_TYPE, 
-                    IS_NULLABLE, 
-                    COLUMN_KEY, 
-                    EXTRA 
-                FROM 
-                    information_schema.columns 
-                WHERE 
-                    TABLE_SCHEMA = %s AND TABLE_NAME = %s
-                ORDER BY ORDINAL_POSITION;
-            """
-            cursor.execute(sql_columns, (db_name, table_name))
-            for col_row in cursor.fetchall():
-                column_details = {
-                    "name": col_row['COLUMN_NAME'],
-                    "data_type": col_row['DATA_TYPE'],
-                    "column_type": col_row['COLUMN_TYPE'], # e.g., varchar(255), int(11)
-                    "is_nullable": col_row['IS_NULLABLE'] == 'YES',
-                    "is_primary_key": col_row['COLUMN_KEY'] == 'PRI',
-                    "extra": col_row['EXTRA']
-                }
-                table_info["columns"].append(column_details)
-                if column_details["is_primary_key"]:
-                    table_info["primary_keys"].append(col_row['COLUMN_NAME'])
-            
-            # 3. Get Foreign Keys
-            sql_fks = f"""
-                SELECT 
-                    CONSTRAINT_NAME, 
-                    COLUMN_NAME, 
-                    REFERENCED_TABLE_NAME, 
-                    REFERENCED_COLUMN_NAME 
-                FROM 
-                    information_schema.KEY_COLUMN_USAGE 
-                WHERE 
-                    TABLE_SCHEMA = %s 
-                    AND TABLE_NAME = %s 
-                    AND REFERENCED_TABLE_NAME IS NOT NULL;
-            """
-            cursor.execute(sql_fks, (db_name, table_name))
-            for fk_row in cursor.fetchall():
-                table_info["foreign_keys"].append({
-                    "constraint_name": fk_row['CONSTRAINT_NAME'],
-                    "column_name": fk_row['COLUMN_NAME'],
-                    "references_table": fk_row['REFERENCED_TABLE_NAME'],
-                    "references_column": fk_row['REFERENCED_COLUMN_NAME']
-                })
-
-            # 4. Fetch Sample Data
-            # Be cautious with large text/blob fields in sample data for LLM context
-            # For simplicity, selecting all columns here.
-            if table_info["columns"]: # Only fetch if columns exist
-                try:
-                    cursor.execute(f"SELECT * FROM {table_name} LIMIT {SAMPLE_DATA_LIMIT}")
-                    sample_rows = cursor.fetchall()
-                    # Convert datetime/date objects and Decimal objects to string for JSON serialization
-                    for row in sample_rows:
-                        for key, value in row.items():
-                            if hasattr(value, 'isoformat'): # Check for date/datetime objects
-                                row[key] = value.isoformat()
-                            elif isinstance(value, decimal.Decimal): # Check for Decimal objects
-                                row[key] = str(value) # Convert Decimal to string
-                    table_info["sample_data"] = sample_rows
-                except mysql.connector.Error as sample_err:
-                    print(f"Could not fetch sample data for {table_name}: {sample_err}")
-                    table_info["sample_data"] = [{"error": str(sample_err)}]
-            
+        fingerprints = read_catalog_fingerprints(previous_path)
+    except (IOError, ValueError) as e:
+        print(f"Could not read previous snapshot {previous_path}: {e}. Running a full extraction.")
+        return None
+    if not fingerprints:
+        print(f"Previous snapshot {previous_path} has no fingerprints. Running a full extraction.")
+        return None
+    return {"path": previous_path, "fingerprints": fingerprints}
+
+def diff_fingerprints(previous_fingerprints, current_fingerprints):
+    """Compares two {table_name: fingerprint} maps and returns the change set."""
+    previous_fingerprints = previous_fingerprints or {}
+    changes = {"added": [], "changed": [], "dropped": [], "unchanged": []}
+    for table_name, fingerprint in current_fingerprints.items():
+        if table_name not in previous_fingerprints:
+            changes["added"].append(table_name)
+        elif previous_fingerprints[table_name] != fingerprint:
+            changes["changed"].append(table_name)
+        else:
+            changes["unchanged"].append(table_name)
+    changes["dropped"] = [name for name in previous_fingerprints if name not in current_fingerprints]
+    return changes
+
+def table_matches_patterns(table_name, include_patterns=None, exclude_patterns=None):
+    """Applies fnmatch-style include/exclude patterns (e.g. 'sales_*') to a table name."""
+    if include_patterns and not any(fnmatch.fnmatchcase(table_name, pattern) for pattern in include_patterns):
+        return False
+    if exclude_patterns and any(fnmatch.fnmatchcase(table_name, pattern) for pattern in exclude_patterns):
+        return False
+    return True
+
+def build_column_details(col_row):
+    """Converts an information_schema.columns row into the catalog's column dict."""
+    return {
+        "name": col_row['COLUMN_NAME'],
+        "data_type": col_row['DATA_TYPE'],
+        "column_type": col_row['COLUMN_TYPE'], # e.g., varchar(255), int(11)
+        "is_nullable": col_row['IS_NULLABLE'] == 'YES',
+        "is_primary_key": col_row['COLUMN_KEY'] == 'PRI',
+        "extra": col_row['EXTRA']
+    }
+
+def build_foreign_key_details(fk_row):
+    """Converts an information_schema.KEY_COLUMN_USAGE row into the catalog's FK dict."""
+    return {
+        "constraint_name": fk_row['CONSTRAINT_NAME'],
+        "column_name": fk_row['COLUMN_NAME'],
+        "references_table": fk_row['REFERENCED_TABLE_NAME'],
+        "references_column": fk_row['REFERENCED_COLUMN_NAME']
+    }
+
+def new_table_info():
+    return {
+        "columns": [],
+        "primary_keys": [],
+        "foreign_keys": [],
+        "sample_data": []
+    }
+
+def add_column(table_info, column_details):
+    table_info["columns"].append(column_details)
+    if column_details["is_primary_key"]:
+        table_info["primary_keys"].append(column_details["name"])
+
+def fetch_table_structure(cursor, db_name, table_name):
+    """Fetches the columns and foreign keys of a single table (two queries per table)."""
+    table_info = new_table_info()
+
+    # Using information_schema.columns for more detail
+    sql_columns = """
+        SELECT 
+            COLUMN_NAME, 
+            DATA_TYPE, 
+            COLUMN_TYPE, 
+            IS_NULLABLE, 
+            COLUMN_KEY, 
+            EXTRA 
+        FROM 
+            information_schema.columns 
+        WHERE 
+            TABLE_SCHEMA = %s AND TABLE_NAME = %s
+        ORDER BY ORDINAL_POSITION;
+    """
+    cursor.execute(sql_columns, (db_name, table_name))
+    for col_row in cursor.fetchall():
+        add_column(table_info, build_column_details(col_row))
+
+    sql_fks = """
+        SELECT 
+            CONSTRAINT_NAME, 
+            COLUMN_NAME, 
+            REFERENCED_TABLE_NAME, 
+            REFERENCED_COLUMN_NAME 
+        FROM 
+            information_schema.KEY_COLUMN_USAGE 
+        WHERE 
+            TABLE_SCHEMA = %s 
+            AND TABLE_NAME = %s 
+            AND REFERENCED_TABLE_NAME IS NOT NULL;
+    """
+    cursor.execute(sql_fks, (db_name, table_name))
+    for fk_row in cursor.fetchall():
+        table_info["foreign_keys"].append(build_foreign_key_details(fk_row))
+    return table_info
+
+def fetch_schema_structures_bulk(cursor, db_name, table_names):
+    """Fetches columns and foreign keys of all given tables with one query each.
+
+    Rows for the whole schema are grouped in memory into the same per-table
+    structure fetch_table_structure() produces, so the cost no longer grows
+    with one information_schema round trip per table.
+    """
+    wanted = set(table_names)
+    structures = {table_name: new_table_info() for table_name in table_names}
+
+    cursor.execute("""
+        SELECT 
+            TABLE_NAME,
+            COLUMN_NAME, 
+            DATA_TYPE, 
+            COLUMN_TYPE, 
+            IS_NULLABLE, 
+            COLUMN_KEY, 
+            EXTRA 
+        FROM 
+            information_schema.columns 
+        WHERE 
+            TABLE_SCHEMA = %s
+        ORDER BY TABLE_NAME, ORDINAL_POSITION;
+    """, (db_name,))
+    for col_row in cursor.fetchall():
+        if col_row['TABLE_NAME'] in wanted:
+            add_column(structures[col_row['TABLE_NAME']], build_column_details(col_row))
+
+    cursor.execute("""
+        SELECT 
+            TABLE_NAME,
+            CONSTRAINT_NAME, 
+            COLUMN_NAME, 
+            REFERENCED_TABLE_NAME, 
+            REFERENCED_COLUMN_NAME 
+        FROM 
+            information_schema.KEY_COLUMN_USAGE 
+        WHERE 
+            TABLE_SCHEMA = %s 
+            AND REFERENCED_TABLE_NAME IS NOT NULL;
+    """, (db_name,))
+    for fk_row in cursor.fetchall():
+        if fk_row['TABLE_NAME'] in wanted:
+            structures[fk_row['TABLE_NAME']]["foreign_keys"].append(build_foreign_key_details(fk_row))
+    return structures
+
+def fetch_sample_data(cursor, db_name, table_name):
+    """Fetches up to SAMPLE_DATA_LIMIT rows of a table with JSON-friendly values."""
+    # Be cautious with large text/blob fields in sample data for LLM context
+    # For simplicity, selecting all columns here.
+    try:
+        cursor.execute(f"SELECT * FROM `{db_name}`.`{table_name}` LIMIT {SAMPLE_DATA_LIMIT}")
+        sample_rows = cursor.fetchall()
+        # Convert datetime/date objects and Decimal objects to string for JSON serialization
+        for row in sample_rows:
+            for key, value in row.items():
+                if hasattr(value, 'isoformat'): # Check for date/datetime objects
+                    row[key] = value.isoformat()
+                elif isinstance(value, decimal.Decimal): # Check for Decimal objects
+                    row[key] = str(value) # Convert Decimal to string
+        return sample_rows
+    except mysql.connector.Error as sample_err:
+        print(f"Could not fetch sample data for {table_name}: {sample_err}")
+        return [{"error": str(sample_err)}]
+
+def quote_identifier(name):
+    return "`" + str(name).replace("`", "``") + "`"
+
+def profile_table(cursor, db_name, table_name, table_info, estimated_rows=None):
+    """Adds a "profile" dict to every column of `table_info` using server-side aggregates.
+
+    One aggregate query computes null counts, distinct counts, min/max and
+    string lengths for all columns at once, and one window-function query
+    (MySQL 8+) collects the top-k values of every column. Tables estimated to
+    be larger than PROFILE_SAMPLE_ROWS are profiled on a RAND()-bounded sample,
+    so distinct counts and top-k frequencies are then sample-based. Both queries
+    share PROFILE_TIME_BUDGET_MS; a query that runs out of time is skipped.
+    """
+    columns = table_info.get('columns', [])
+    if not columns:
+        return
+    table_ref = f"{quote_identifier(db_name)}.{quote_identifier(table_name)}"
+    is_sampled = bool(estimated_rows) and estimated_rows > PROFILE_SAMPLE_ROWS
+    if is_sampled:
+        fraction = min(1.0, (PROFILE_SAMPLE_ROWS * 1.2) / estimated_rows) # Oversample a bit, LIMIT trims it
+        rows_sql = f"(SELECT * FROM {table_ref} WHERE RAND() < {fraction:.8f} LIMIT {PROFILE_SAMPLE_ROWS})"
+    else:
+        rows_sql = f"(SELECT * FROM {table_ref})"
+
+    value_stat_columns = []
+    select_parts = ["COUNT(*) AS row_count"]
+    for i, col in enumerate(columns):
+        quoted = quote_identifier(col['name'])
+        select_parts.append(f"SUM({quoted} IS NULL) AS c{i}_nulls")
+        if col.get('data_type') in PROFILE_SKIP_VALUE_STATS_TYPES:
+            continue
+        value_stat_columns.append(i)
+        select_parts.append(f"COUNT(DISTINCT {quoted}) AS c{i}_distinct")
+        select_parts.append(f"MIN({quoted}) AS c{i}_min")
+        select_parts.append(f"MAX({quoted}) AS c{i}_max")
+        if col.get('data_type') in PROFILE_LENGTH_TYPES:
+            select_parts.append(f"AVG(CHAR_LENGTH({quoted})) AS c{i}_avg_len")
+            select_parts.append(f"MIN(CHAR_LENGTH({quoted})) AS c{i}_min_len")
+            select_parts.append(f"MAX(CHAR_LENGTH({quoted})) AS c{i}_max_len")
+
+    start = time.monotonic()
+    try:
+        cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(PROFILE_TIME_BUDGET_MS)}")
+        cursor.execute(f"SELECT {', '.join(select_parts)} FROM {rows_sql} AS profile_source")
+        stats = cursor.fetchone()
+    except mysql.connector.Error as err:
+        print(f"Could not profile {db_name}.{table_name}: {err}")
+        cursor.execute("SET SESSION MAX_EXECUTION_TIME = 0")
+        return
+
+    row_count = stats['row_count'] or 0
+    for i, col in enumerate(columns):
+        nulls = int(stats[f'c{i}_nulls'] or 0)
+        profile = {
+            "profiled_rows": row_count,
+            "is_sampled": is_sampled,
+            "null_fraction": round(nulls / row_count, 4) if row_count else None
+        }
+        if i in value_stat_columns:
+            profile["approx_distinct"] = stats[f'c{i}_distinct']
+            profile["min"] = stats[f'c{i}_min']
+            profile["max"] = stats[f'c{i}_max']
+            if f'c{i}_avg_len' in stats:
+                avg_len = stats[f'c{i}_avg_len']
+                profile["avg_length"] = round(float(avg_len), 2) if avg_len is not None else None
+                profile["min_length"] = stats[f'c{i}_min_len']
+                profile["max_length"] = stats[f'c{i}_max_len']
+        col["profile"] = profile
+
+    remaining_ms = PROFILE_TIME_BUDGET_MS - (time.monotonic() - start) * 1000
+    if value_stat_columns and PROFILE_TOP_K > 0 and remaining_ms > 0:
+        # The CTE is materialized once, so every column's top-k comes from the same (sampled) rows
+        union_parts = " UNION ALL ".join(
+            f"SELECT {i} AS col_idx, CAST({quote_identifier(columns[i]['name'])} AS CHAR(200)) AS value FROM profile_rows"
+            for i in value_stat_columns
+        )
+        try:
+            cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {max(1, int(remaining_ms))}")
+            cursor.execute(f"""
+                WITH profile_rows AS {rows_sql}
+                SELECT col_idx, value, freq FROM (
+                    SELECT col_idx, value, COUNT(*) AS freq,
+                           ROW_NUMBER() OVER (PARTITION BY col_idx ORDER BY COUNT(*) DESC) AS rank_in_column
+                    FROM ({union_parts}) AS column_values
+                    WHERE value IS NOT NULL
+                    GROUP BY col_idx, value
+                ) AS ranked
+                WHERE rank_in_column <= {int(PROFILE_TOP_K)}
+                ORDER BY col_idx, freq DESC
+            """)
+            for row in cursor.fetchall():
+                columns[row['col_idx']]["profile"].setdefault("top_values", []).append(
+                    {"value": row['value'], "count": row['freq']}
+                )
+        except mysql.connector.Error as err:
+            print(f"Could not collect top values for {db_name}.{table_name}: {err}")
+    cursor.execute("SET SESSION MAX_EXECUTION_TIME = 0")
+
+def extract_schema(cursor, db_name, previous_metadata=None, mode=None,
+                   include_patterns=None, exclude_patterns=None, include_sample_data=True, on_table=None):
+    """Extracts the metadata of one schema using an open dictionary cursor.
+
+    If `previous_metadata` (an earlier snapshot with fingerprints) is given, the
+    sample data of tables whose fingerprint is unchanged is carried over instead
+    of being queried again, and the result includes a "changes" set of
+    added/changed/dropped/unchanged table names.
+
+    `mode` is 'bulk' (default, see EXTRACTION_MODE) or 'per_table'; the include
+    and exclude patterns default to TABLE_INCLUDE_PATTERNS / TABLE_EXCLUDE_PATTERNS.
+    Database errors are raised to the caller.
+
+    With an `on_table(table_name, table_info, fingerprint)` callback, each table
+    is handed over as soon as it is extracted instead of being collected in
+    metadata["tables"]. Unchanged tables whose data isn't in `previous_metadata`
+    are then skipped entirely; the caller copies them from the previous catalog.
+    """
+    mode = mode or EXTRACTION_MODE
+    include_patterns = TABLE_INCLUDE_PATTERNS if include_patterns is None else include_patterns
+    exclude_patterns = TABLE_EXCLUDE_PATTERNS if exclude_patterns is None else exclude_patterns
+    metadata = {
+        "database_name": db_name,
+        "tables": {},
+        "fingerprints": {}
+    }
+    previous_tables = (previous_metadata or {}).get('tables', {})
+    previous_fingerprints = (previous_metadata or {}).get('fingerprints', {})
+
+    # 1. List Tables
+    cursor.execute(f"SHOW TABLES FROM `{db_name}`")
+    tables = [row[f'Tables_in_{db_name}'] for row in cursor.fetchall()]
+    tables = [name for name in tables if table_matches_patterns(name, include_patterns, exclude_patterns)]
+
+    table_stats = {}
+    if FINGERPRINT_INCLUDE_UPDATE_TIME or FINGERPRINT_INCLUDE_ROW_COUNT or PROFILE_COLUMNS:
+        table_stats = fetch_table_stats(cursor, db_name)
+
+    # 2./3. Get Columns, Primary Keys and Foreign Keys
+    if mode == 'bulk':
+        print(f"Extracting columns and foreign keys for {len(tables)} tables of {db_name} in bulk...")
+        structures = fetch_schema_structures_bulk(cursor, db_name, tables)
+    else:
+        structures = None
+
+    for table_name in tables:
+        if structures is not None:
+            table_info = structures[table_name]
+        else:
+            print(f"Extracting metadata for table: {db_name}.{table_name}...")
+            table_info = fetch_table_structure(cursor, db_name, table_name)
+
+        fingerprint = compute_table_fingerprint(table_info, table_stats.get(table_name))
+        metadata["fingerprints"][table_name] = fingerprint
+
+        # 4. Fetch Sample Data
+        unchanged = previous_fingerprints.get(table_name) == fingerprint
+        if unchanged and table_name in previous_tables:
+            # Unchanged since the last snapshot: keep the sample rows we already have
+            table_info["sample_data"] = previous_tables[table_name].get("sample_data", [])
+        elif unchanged and on_table is not None:
+            continue # The previous catalog's record is copied over as-is
+        elif include_sample_data and table_info["columns"]: # Only fetch if columns exist
+            table_info["sample_data"] = fetch_sample_data(cursor, db_name, table_name)
+            if PROFILE_COLUMNS:
+                profile_table(cursor, db_name, table_name, table_info,
+                              (table_stats.get(table_name) or {}).get('row_count'))
+
+        if on_table is not None:
+            on_table(table_name, table_info, fingerprint)
+        else:
             metadata["tables"][table_name] = table_info
 
-        return metadata
+    metadata["changes"] = diff_fingerprints(previous_fingerprints, metadata["fingerprints"])
+    return metadata
+
+def extract_metadata(previous_metadata=None, db_config=None, mode=None,
+                     include_patterns=None, exclude_patterns=None, include_sample_data=True):
+    """Connects to the database and extracts schema metadata and sample data.
+
+    Single-schema entry point; see extract_schema() for the arguments and
+    extract_catalog() for extracting several hosts/schemas in parallel.
+    """
+    db_config = db_config or DB_CONFIG
+    conn = None
+    try:
+        conn = mysql.connector.connect(**db_config)
+        cursor = conn.cursor(dictionary=True) # Use dictionary cursor for easier row access
+        return extract_schema(cursor, db_config['database'], previous_metadata, mode,
+                              include_patterns, exclude_patterns, include_sample_data)
 
     except mysql.connector.Error as err:
         print(f"Database Error: {err}")
@@ -127,38 +474,203 @@ def extract_metadata():
             conn.close()
             print("Database connection closed.")
 
+def target_label(host, schema):
+    return f"{host}/{schema}"
+
+def split_snapshot_by_target(previous_metadata, host, schema):
+    """Returns the part of a namespaced snapshot that belongs to one target, with plain table names."""
+    if not previous_metadata:
+        return None
+    prefix = f"{target_label(host, schema)}."
+    return {
+        "tables": {name[len(prefix):]: info for name, info in previous_metadata.get('tables', {}).items() if name.startswith(prefix)},
+        "fingerprints": {name[len(prefix):]: fp for name, fp in previous_metadata.get('fingerprints', {}).items() if name.startswith(prefix)}
+    }
+
+def create_connection_pools(targets):
+    """Creates one bounded connection pool per distinct host."""
+    pools = {}
+    server_config = {k: v for k, v in DB_CONFIG.items() if k not in ('host', 'database')}
+    server_config.setdefault('connection_timeout', CONNECTION_TIMEOUT)
+    for i, host in enumerate(sorted({host for host, _ in targets})):
+        pools[host] = pooling.MySQLConnectionPool(
+            pool_name=f"extract_pool_{i}",
+            pool_size=max(1, min(CONNECTION_POOL_SIZE, 32)), # mysql.connector caps pools at 32 connections
+            host=host,
+            **server_config
+        )
+    return pools
+
+def extract_catalog(targets=None, previous_metadata=None, mode=None,
+                    include_patterns=None, exclude_patterns=None, include_sample_data=True, on_table=None):
+    """Extracts several (host, schema) targets in parallel into one catalog document.
+
+    Targets run on a bounded worker pool with pooled connections per host, and
+    each gets its own entry in "target_reports" with timing and any error, so a
+    slow or failing host doesn't stall the others. With more than one target,
+    table names are namespaced as "host/schema.table"; with a single target the
+    document looks exactly like extract_metadata()'s. Tables of a failed target
+    are carried over from the previous snapshot instead of being reported as dropped.
+    `on_table` streams tables out as they are extracted (see extract_schema()).
+    """
+    targets = [tuple(target) for target in (targets or EXTRACTION_TARGETS)]
+    namespaced = len(targets) > 1
+    try:
+        pools = create_connection_pools(targets)
+    except mysql.connector.Error as err:
+        print(f"Database Error while creating connection pools: {err}")
+        return None
+    # A pool raises instead of blocking when it runs dry, so workers queue on a per-host semaphore
+    host_slots = {host: threading.Semaphore(pool.pool_size) for host, pool in pools.items()}
+
+    def run_target(host, schema):
+        start = time.monotonic()
+        report = {"target": target_label(host, schema), "host": host, "database": schema}
+        conn = None
+        previous = previous_metadata
+        if namespaced:
+            previous = split_snapshot_by_target(previous_metadata, host, schema)
+        prefix = f"{target_label(host, schema)}." if namespaced else ""
+        streamed = {} # name -> fingerprint of the tables handed to on_table, kept even if the target fails later
+
+        def target_on_table(name, info, fingerprint):
+            on_table(prefix + name, info, fingerprint)
+            streamed[name] = fingerprint
+        try:
+            with host_slots[host]:
+                conn = pools[host].get_connection()
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    result = extract_schema(cursor, schema, previous, mode, include_patterns, exclude_patterns,
+                                            include_sample_data, target_on_table if on_table is not None else None)
+                finally:
+                    cursor.close()
+            report.update(status="ok", table_count=len(result["fingerprints"]))
+        except Exception as e:
+            print(f"Extraction of {report['target']} failed: {e}")
+            result = None
+            report.update(status="error", error=str(e), table_count=0)
+        finally:
+            if conn:
+                conn.close() # Returns the connection to its pool
+        report["elapsed_seconds"] = round(time.monotonic() - start, 3)
+        return (host, schema), result, previous, report, streamed
+
+    catalog = {
+        "database_name": targets[0][1] if not namespaced else None,
+        "targets": [{"host": host, "database": schema} for host, schema in targets],
+        "tables": {},
+        "fingerprints": {},
+        "changes": {"added": [], "changed": [], "dropped": [], "unchanged": []},
+        "target_reports": []
+    }
+    reports_by_target = {}
+    with ThreadPoolExecutor(max_workers=max(1, EXTRACTION_MAX_WORKERS)) as executor:
+        futures = [executor.submit(run_target, host, schema) for host, schema in targets]
+        for future in as_completed(futures):
+            (host, schema), result, previous, report, streamed = future.result()
+            reports_by_target[(host, schema)] = report
+            prefix = f"{target_label(host, schema)}." if namespaced else ""
+            if result is None:
+                # Keep what we knew about this target rather than dropping its tables. The tables it
+                # streamed before failing are already written, so they are reported as extracted
+                previous_fingerprints = (previous or {}).get('fingerprints', {})
+                for name, info in (previous or {}).get('tables', {}).items():
+                    catalog["tables"][prefix + name] = info
+                for name, fingerprint in {**previous_fingerprints, **streamed}.items():
+                    catalog["fingerprints"][prefix + name] = fingerprint
+                    if previous_fingerprints.get(name) == fingerprint:
+                        catalog["changes"]["unchanged"].append(prefix + name)
+                    else:
+                        catalog["changes"]["changed" if name in previous_fingerprints else "added"].append(prefix + name)
+                continue
+            for name, info in result["tables"].items():
+                catalog["tables"][prefix + name] = info
+            for name, fingerprint in result["fingerprints"].items():
+                catalog["fingerprints"][prefix + name] = fingerprint
+            for change_type, names in result["changes"].items():
+                catalog["changes"][change_type].extend(prefix + name for name in names)
+
+    if namespaced and previous_metadata:
+        # Tables of targets that were removed from EXTRACTION_TARGETS are dropped too
+        known_prefixes = tuple(f"{target_label(host, schema)}." for host, schema in targets)
+        catalog["changes"]["dropped"].extend(
+            name for name in previous_metadata.get('fingerprints', {}) if not name.startswith(known_prefixes)
+        )
+
+    catalog["target_reports"] = [reports_by_target[target] for target in targets]
+    if all(report["status"] == "error" for report in catalog["target_reports"]):
+        return None
+    return catalog
+
+def print_target_reports(target_reports):
+    print("\n--- Extraction Report ---")
+    for report in target_reports:
+        if report["status"] == "ok":
+            print(f"{report['target']}: {report['table_count']} tables in {report['elapsed_seconds']:.2f}s")
+        else:
+            print(f"{report['target']}: FAILED after {report['elapsed_seconds']:.2f}s - {report['error']}")
+
 def custom_json_serializer(obj):
     """Custom JSON serializer for objects not serializable by default json code."""
     if isinstance(obj, decimal.Decimal):
         return str(obj)  # Convert Decimal to string
     if isinstance(obj, (datetime.date, datetime.datetime)):
         return obj.isoformat() # Convert date/datetime to ISO 8601 string
-    if isinstance(obj, bytes):
+    if isinstance(obj, (bytes, bytearray)):
         try:
             return obj.decode('utf-8') # Try to decode bytes to string
         except UnicodeDecodeError:
             return obj.hex() # If not decodable, return hex representation
     raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
 
+def save_changes(changes, filepath=CHANGES_FILE_PATH):
+    """Writes the change set so enrichment, embedding and relationship inference can process only the delta."""
+    try:
+        with open(filepath, "w") as f:
+            json.dump(changes, f, indent=4)
+        print(f"Changes: {len(changes['added'])} added, {len(changes['changed'])} changed, "
+              f"{len(changes['dropped'])} dropped, {len(changes['unchanged'])} unchanged. Saved to {filepath}")
+    except IOError as e:
+        print(f"Error saving change set to file: {e}")
+
 if __name__ == "__main__":
     print("Starting metadata extraction...")
-    extracted_data = extract_metadata()
-
-    if extracted_data:
-        print("\n--- Extracted Metadata (JSON) ---")
-        # Pretty print the JSON
-        print(json.dumps(extracted_data, indent=4, default=custom_json_serializer))
-        
-        # Optionally, save to a file
-        try:
-            with open("extracted_metadata.json", "w") as f:
-                json.dump(extracted_data, f, indent=4, default=custom_json_serializer)
-            print("\nSuccessfully saved metadata to extracted_metadata.json")
-        except IOError as e:
-            print(f"\nError saving metadata to file: {e}")
-        except Exception as e:
-            print(f"\nAn unexpected error occurred while saving to file: {e}")
-    else:
-        print("Metadata extraction failed.")
+    previous_snapshot = load_previous_snapshot() if INCREMENTAL_EXTRACTION else None
+    if previous_snapshot:
+        print(f"Incremental mode: comparing against {len(previous_snapshot['fingerprints'])} tables in {previous_snapshot['path']}.")
+
+    writer = CatalogWriter(
+        METADATA_FILE_PATH,
+        header={"targets": [{"host": host, "database": schema} for host, schema in EXTRACTION_TARGETS]},
+        default=custom_json_serializer
+    )
+
+    def write_table(table_name, table_info, fingerprint):
+        writer.write_table(table_name, table_info, fingerprint)
+        if PRINT_METADATA_TO_STDOUT:
+            print(json.dumps({table_name: table_info}, indent=4, default=custom_json_serializer))
+
+    extracted_data = None
+    try:
+        extracted_data = extract_catalog(EXTRACTION_TARGETS, previous_snapshot, on_table=write_table)
+        if extracted_data:
+            print_target_reports(extracted_data["target_reports"])
+            changes = extracted_data["changes"]
+            if previous_snapshot:
+                copied = writer.copy_tables_from(previous_snapshot["path"], changes["unchanged"])
+                print(f"Carried over {copied} unchanged tables from {previous_snapshot['path']}.")
+            writer.close(footer={
+                "database_name": extracted_data["database_name"],
+                "target_reports": extracted_data["target_reports"]
+            })
+            print(f"\nSuccessfully saved metadata for {writer.table_count} tables to {METADATA_FILE_PATH}")
+            save_changes(changes)
+        else:
+            writer.abort()
+            print("Metadata extraction failed.")
+    except Exception as e:
+        writer.abort()
+        print(f"\nAn unexpected error occurred while saving the catalog: {e}")
 
     print("\nMetadata extraction script finished.")
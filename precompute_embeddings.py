@@ -3,6 +3,10 @@ import json
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import faiss # Though not strictly for storing, good to have consistent imports
+import time
+from concurrent.futures import ThreadPoolExecutor
+from vector_index import (build_faiss_index, encode_embedding, fetch_catalog_signature, load_catalog_items_from_db,
+                          load_index, resolve_index_type, save_index, EMBEDDING_FORMAT)
 
 # --- Database Connection Details ---
 DB_CONFIG = {
@@ -17,75 +21,200 @@ MODEL_NAME = 'all-MiniLM-L6-v2'
 model = SentenceTransformer(MODEL_NAME)
 print(f"Sentence Transformer model '{MODEL_NAME}' loaded.")
 
-def get_all_enriched_data_for_embedding():
-    """Fetches id and semantic_description from enriched_metadata for items needing embedding."""
+# --- Streaming Pipeline ---
+EMBEDDING_FETCH_PAGE_SIZE = 5000 # Pending rows fetched from MySQL per page
+EMBEDDING_ENCODE_BATCH_SIZE = 256 # Descriptions per model.encode call; each encoded batch is written and committed as a checkpoint
+
+EXPORT_SEARCH_INDEX = True # Write the FAISS index file + sidecar that search_api.py loads at startup
+
+# Rows that still need an embedding for the current model and storage format (EMBEDDING_FORMAT in
+# vector_index.py); a committed batch drops out of this set, which is what lets an interrupted run
+# resume where it stopped. Rows without a format marker predate it and are float32.
+PENDING_EMBEDDING_FILTER = """
+    semantic_description IS NOT NULL AND TRIM(semantic_description) <> ''
+    AND (embedding_vector IS NULL OR embedding_model_version != %s OR COALESCE(embedding_format, 'float32') != %s)
+"""
+
+# Columns added to enriched_metadata on first run: the storage format marker, and the time each
+# embedding was written (the watermark search_api.py polls to pick up new embeddings live).
+EMBEDDING_TRACKING_COLUMNS = {
+    'embedding_format': "ALTER TABLE enriched_metadata ADD COLUMN embedding_format VARCHAR(16) NULL AFTER embedding_model_version",
+    'embedded_at': "ALTER TABLE enriched_metadata ADD COLUMN embedded_at DATETIME(6) NULL AFTER embedding_format, ADD INDEX idx_enriched_metadata_embedded_at (embedded_at)"
+}
+
+def ensure_embedding_tracking_columns():
+    """Adds the embedding_format and embedded_at columns to enriched_metadata if they are missing."""
     conn = None
-    items_to_embed = []
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        
-        # Select items that don't have an embedding yet or where it might need update
-        # For simplicity, let's assume a column 'embedding_vector' will store the blob
-        # And we add a new column 'embedding_model_version'
-        # This example will try to embed all for now if 'embedding_vector' is NULL
-        # Modify your enriched_metadata table to include:
-        # embedding_vector BLOB,
-        # embedding_model_version VARCHAR(255)
-        
-        # Check if 'embedding_vector' column exists, if not, this script won't update.
-        # For this script, we assume it exists.
-        
-        cursor.execute("""
-            SELECT id, semantic_description 
-            FROM enriched_metadata 
-            WHERE semantic_description IS NOT NULL AND TRIM(semantic_description) <> ''
-            AND (embedding_vector IS NULL OR embedding_model_version != %s) 
-        """, (MODEL_NAME,)) # Only process if embedding is NULL or model changed
-        
-        items = cursor.fetchall()
-        
-        for item in items:
-            if item['semantic_description'] and item['semantic_description'].strip():
-                items_to_embed.append(item)
-        
-        print(f"Found {len(items_to_embed)} items to embed/re-embed.")
-        return items_to_embed
-        
+        cursor = conn.cursor()
+        for column_name, alter_sql in EMBEDDING_TRACKING_COLUMNS.items():
+            cursor.execute("""
+                SELECT COUNT(*) FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'enriched_metadata' AND COLUMN_NAME = %s
+            """, (DB_CONFIG['database'], column_name))
+            if cursor.fetchone()[0] == 0:
+                print(f"Adding '{column_name}' column to 'enriched_metadata'...")
+                cursor.execute(alter_sql)
+                conn.commit()
+        return True
     except mysql.connector.Error as err:
-        print(f"Database error in get_all_enriched_data_for_embedding: {err}")
-        return []
-    except Exception as e:
-        print(f"Unexpected error in get_all_enriched_data_for_embedding: {e}")
-        return []
+        print(f"Database error in ensure_embedding_tracking_columns: {err}")
+        return False
     finally:
         if conn and conn.is_connected():
             cursor.close()
             conn.close()
 
-def store_embeddings(item_id: int, embedding: np.ndarray, model_name: str):
-    """Stores the generated embedding vector and model version in the database."""
+def count_items_to_embed():
+    """Returns how many items still need an embedding for MODEL_NAME."""
     conn = None
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor()
-        
-        # Convert numpy array to bytes for BLOB storage
-        embedding_blob = embedding.tobytes()
-        
-        sql = """
-            UPDATE enriched_metadata 
-            SET embedding_vector = %s, embedding_model_version = %s
-            WHERE id = %s
-        """
-        cursor.execute(sql, (embedding_blob, model_name, item_id))
-        conn.commit()
-        # print(f"Stored embedding for item ID {item_id} using model {model_name}.")
-        
+        cursor.execute(f"SELECT COUNT(*) FROM enriched_metadata WHERE {PENDING_EMBEDDING_FILTER}", (MODEL_NAME, EMBEDDING_FORMAT))
+        return cursor.fetchone()[0]
     except mysql.connector.Error as err:
-        print(f"Database error in store_embeddings for item ID {item_id}: {err}")
-    except Exception as e:
-        print(f"Unexpected error in store_embeddings for item ID {item_id}: {e}")
+        print(f"Database error in count_items_to_embed: {err}")
+        return None
+    finally:
+        if conn and conn.is_connected():
+            cursor.close()
+            conn.close()
+
+def iter_items_to_embed(page_size=EMBEDDING_FETCH_PAGE_SIZE):
+    """Yields pages of {id, semantic_description} for items needing embedding.
+
+    Pages are fetched with keyset pagination (id > last seen id) on a dedicated
+    read connection, so only one page is held in memory and no result set stays
+    open on the server while the model is encoding.
+    """
+    # Modify your enriched_metadata table to include:
+    # embedding_vector BLOB,
+    # embedding_model_version VARCHAR(255)
+    conn = None
+    last_id = 0
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor(dictionary=True)
+        while True:
+            cursor.execute(f"""
+                SELECT id, semantic_description 
+                FROM enriched_metadata 
+                WHERE id > %s AND {PENDING_EMBEDDING_FILTER}
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, MODEL_NAME, EMBEDDING_FORMAT, page_size)) # Only process if embedding is NULL or model/format changed
+            page = cursor.fetchall()
+            conn.commit() # End the read transaction so the next page sees freshly committed rows
+            if not page:
+                return
+            last_id = page[-1]['id']
+            yield [item for item in page if item['semantic_description'] and item['semantic_description'].strip()]
+    except mysql.connector.Error as err:
+        print(f"Database error in iter_items_to_embed: {err}")
+    finally:
+        if conn and conn.is_connected():
+            cursor.close()
+            conn.close()
+
+class EmbeddingBatchWriter:
+    """Writes embeddings in batches over a single connection.
+
+    Each batch is bulk-inserted into a session-scoped temporary table (the
+    connector turns executemany INSERTs into one multi-row statement), applied
+    to enriched_metadata with a single joined UPDATE, and committed.
+    Embeddings are serialized in `embedding_format` (see vector_index.encode_embedding).
+    """
+
+    def __init__(self, model_name, embedding_format=EMBEDDING_FORMAT):
+        self.model_name = model_name
+        self.embedding_format = embedding_format
+        self.pending = []
+        self.rows_written = 0
+        self.write_seconds = 0.0
+        self.conn = mysql.connector.connect(**DB_CONFIG)
+        self.cursor = self.conn.cursor()
+        self.cursor.execute("""
+            CREATE TEMPORARY TABLE IF NOT EXISTS tmp_embedding_updates (
+                id INT PRIMARY KEY,
+                embedding_vector BLOB NOT NULL
+            )
+        """)
+
+    def flush(self):
+        if not self.pending:
+            return
+        start = time.perf_counter()
+        try:
+            self.cursor.executemany(
+                "INSERT INTO tmp_embedding_updates (id, embedding_vector) VALUES (%s, %s)",
+                self.pending
+            )
+            self.cursor.execute("""
+                UPDATE enriched_metadata e
+                JOIN tmp_embedding_updates t ON e.id = t.id
+                SET e.embedding_vector = t.embedding_vector, e.embedding_model_version = %s, e.embedding_format = %s,
+                    e.embedded_at = NOW(6)
+            """, (self.model_name, self.embedding_format))
+            self.cursor.execute("DELETE FROM tmp_embedding_updates")
+            self.conn.commit()
+            self.rows_written += len(self.pending)
+        except mysql.connector.Error as err:
+            print(f"Database error while writing a batch of {len(self.pending)} embeddings: {err}")
+            self.conn.rollback()
+        finally:
+            self.pending = []
+            self.write_seconds += time.perf_counter() - start
+
+    def write_batch(self, item_ids, embeddings):
+        """Writes and commits one encoded batch (a resumable checkpoint)."""
+        for item_id, embedding in zip(item_ids, embeddings):
+            # Convert numpy array to bytes for BLOB storage
+            self.pending.append((int(item_id), encode_embedding(embedding, self.embedding_format)))
+        self.flush()
+
+    @property
+    def rows_per_second(self):
+        return self.rows_written / self.write_seconds if self.write_seconds > 0 else 0.0
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self.conn.is_connected():
+                self.cursor.close()
+                self.conn.close()
+
+def export_search_index():
+    """Builds the search index from the stored embeddings and saves it for search_api.py.
+
+    Skipped when the saved index already matches the database.
+    """
+    conn = None
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor(dictionary=True)
+        signature = fetch_catalog_signature(cursor, MODEL_NAME)
+        existing_index, _ = load_index(signature, mmap=True, expected_index_type=resolve_index_type(signature['item_count']))
+        if existing_index is not None:
+            print("Saved search index is already up to date.")
+            return
+        if signature['item_count'] == 0:
+            print("No embedded items to index.")
+            return
+
+        print(f"Building search index for {signature['item_count']} items...")
+        embeddings_matrix, catalog = load_catalog_items_from_db(cursor, MODEL_NAME, model.get_sentence_embedding_dimension())
+        # Rows may have been embedded while we were reading; only save an index that matches its signature
+        if fetch_catalog_signature(cursor, MODEL_NAME) != signature or len(catalog) != signature['item_count']:
+            print("Catalog changed while building the index (or contained invalid embeddings); not saving it. search_api.py will rebuild from the database.")
+            return
+        save_index(build_faiss_index(embeddings_matrix, ids=catalog.live_ids()), catalog, signature)
+    except mysql.connector.Error as err:
+        print(f"Database error in export_search_index: {err}")
+    except (IOError, RuntimeError) as e:
+        print(f"Error writing the search index: {e}")
     finally:
         if conn and conn.is_connected():
             cursor.close()
@@ -99,31 +228,59 @@ def main():
     # ALTER TABLE enriched_metadata ADD COLUMN embedding_vector BLOB;
     # ALTER TABLE enriched_metadata ADD COLUMN embedding_model_version VARCHAR(255);
     # print("Ensure 'embedding_vector BLOB' and 'embedding_model_version VARCHAR(255)' columns exist in 'enriched_metadata' table.")
+    # The 'embedding_format' and 'embedded_at' tracking columns are added automatically:
+    if not ensure_embedding_tracking_columns():
+        return
 
-    items_to_process = get_all_enriched_data_for_embedding()
-    
-    if not items_to_process:
-        print("No items found that require embedding. Exiting.")
+    total_pending = count_items_to_embed()
+    if not total_pending:
+        print("No items found that require embedding.")
+        if EXPORT_SEARCH_INDEX and total_pending == 0:
+            export_search_index()
         return
+    print(f"Found {total_pending} items to embed/re-embed as {EMBEDDING_FORMAT} (already committed batches are skipped on resume).")
 
-    descriptions = [item['semantic_description'] for item in items_to_process] # Corrected typo here
-    
-    if not descriptions:
-        print("No valid descriptions to embed. Exiting.")
+    try:
+        writer = EmbeddingBatchWriter(MODEL_NAME)
+    except mysql.connector.Error as err:
+        print(f"Database error while opening the embedding writer: {err}")
         return
 
-    print(f"Generating embeddings for {len(descriptions)} descriptions...")
-    embeddings_np = model.encode(descriptions, convert_to_tensor=False, show_progress_bar=True)
-    
-    print("Storing embeddings in the database...")
-    for i, item in enumerate(items_to_process):
-        item_id = item['id']
-        embedding_vector = embeddings_np[i]
-        store_embeddings(item_id, embedding_vector, MODEL_NAME)
-        if (i+1) % 10 == 0: # Print progress every 10 items
-             print(f"Processed {i+1}/{len(items_to_process)} items.")
-    
-    print(f"Finished pre-computing and storing embeddings for {len(items_to_process)} items.")
+    start_time = time.perf_counter()
+    encode_seconds = 0.0
+    encoded_count = 0
+    # One background writer thread: the DB write of batch N overlaps with encoding batch N+1.
+    # Waiting for the previous write before submitting the next keeps at most one batch in flight.
+    write_executor = ThreadPoolExecutor(max_workers=1)
+    pending_write = None
+    try:
+        for page in iter_items_to_embed():
+            for start in range(0, len(page), EMBEDDING_ENCODE_BATCH_SIZE):
+                batch = page[start:start + EMBEDDING_ENCODE_BATCH_SIZE]
+                descriptions = [item['semantic_description'] for item in batch]
+                encode_start = time.perf_counter()
+                embeddings_np = model.encode(descriptions, batch_size=len(descriptions),
+                                             convert_to_tensor=False, show_progress_bar=False)
+                encode_seconds += time.perf_counter() - encode_start
+                encoded_count += len(batch)
+
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = write_executor.submit(writer.write_batch, [item['id'] for item in batch], embeddings_np)
+                print(f"Encoded {encoded_count}/{total_pending} items ({writer.rows_written} committed).")
+        if pending_write is not None:
+            pending_write.result()
+    finally:
+        write_executor.shutdown(wait=True)
+        writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Finished pre-computing and storing embeddings for {writer.rows_written}/{total_pending} items in {elapsed:.1f}s "
+          f"(encode {encoded_count / encode_seconds if encode_seconds else 0:.0f} items/sec, "
+          f"write {writer.rows_per_second:.0f} rows/sec).")
+
+    if EXPORT_SEARCH_INDEX:
+        export_search_index()
 
 if __name__ == '__main__':
     main()
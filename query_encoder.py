@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+
+# --- Query Embedding Cache / Batching Configuration (used by search_api.py) ---
+QUERY_CACHE_MAX_ENTRIES = 10000 # Least recently used query vectors are evicted beyond this many
+QUERY_CACHE_TTL_SECONDS = 3600 # Cached vectors expire after this long (e.g. in case the model is swapped)
+QUERY_BATCH_WINDOW_MS = 5 # Cache misses arriving within this window are encoded in one model.encode call
+QUERY_MAX_BATCH_SIZE = 64
+QUERY_ENCODE_TIMEOUT_SECONDS = 30
+
+def collapse_whitespace(query):
+    """The query trimmed and whitespace-collapsed; this is the text that gets encoded."""
+    return " ".join(query.split())
+
+def normalize_query(query):
+    """Cache key for a query: trimmed, whitespace-collapsed and lowercased.
+
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so case does not change the
+    embedding. The key is only used for lookups; the encoded text keeps its case.
+    """
+    return collapse_whitespace(query).lower()
+
+class QueryEncoder:
+    """Bounded LRU/TTL cache of query -> embedding with micro-batched encoding.
+
+    encode() returns cached vectors immediately. Misses are queued for a
+    single background thread, which waits up to QUERY_BATCH_WINDOW_MS for
+    more misses and encodes them together; concurrent requests for the same
+    query share one encoding. Safe to call from any number of request threads.
+    The thread is started on the first miss in each process, so an encoder
+    created before a fork (gunicorn --preload) works in every worker.
+    """
+
+    def __init__(self, encode_batch, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl_seconds=QUERY_CACHE_TTL_SECONDS,
+                 batch_window_ms=QUERY_BATCH_WINDOW_MS, max_batch_size=QUERY_MAX_BATCH_SIZE):
+        self.encode_batch = encode_batch # Callable: list of texts -> 2D array of embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.max_observed_batch = 0
+        self._cache = OrderedDict() # normalized query -> (vector, expires_at)
+        self._in_flight = {} # normalized query -> Future shared by all waiting requests
+        self._queue = [] # (normalized query, text to encode)
+        self._lock = threading.Lock()
+        self._queue_ready = threading.Condition(self._lock)
+        self._worker = None
+        self._worker_pid = None
+
+    def encode(self, query):
+        """Returns the float32 embedding of `query` with shape (1, dimension)."""
+        return self.submit(query).result(timeout=QUERY_ENCODE_TIMEOUT_SECONDS)
+
+    def submit(self, query):
+        """Returns a concurrent.futures.Future of the embedding of `query`, already resolved on a cache hit.
+
+        Lets async callers await the batched encoding (asyncio.wrap_future) without holding a thread.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    future = Future()
+                    future.set_result(entry[0])
+                    return future
+                del self._cache[key]
+                self.expirations += 1
+            self.misses += 1
+            future = self._in_flight.get(key)
+            if future is None:
+                future = Future()
+                self._in_flight[key] = future
+                self._queue.append((key, collapse_whitespace(query)))
+                self._ensure_worker()
+                self._queue_ready.notify()
+        return future
+
+    def encode_many(self, queries):
+        """Returns the embeddings of `queries` as a (len(queries), dimension) float32 matrix.
+
+        Cached vectors are reused and all misses are encoded together in one
+        encode_batch call on the calling thread, for callers that already hold
+        a whole batch (e.g. /search/batch). Duplicate queries are encoded once.
+        """
+        keys = [normalize_query(query) for query in queries]
+        texts = {} # The first spelling of each key is the one encoded
+        for key, query in zip(keys, queries):
+            texts.setdefault(key, collapse_whitespace(query))
+        vectors = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if key in vectors:
+                    continue
+                entry = self._cache.get(key)
+                if entry is None:
+                    continue
+                if entry[1] > now:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    vectors[key] = entry[0]
+                else:
+                    del self._cache[key]
+                    self.expirations += 1
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing:
+            embeddings = np.asarray(self.encode_batch([texts[key] for key in missing]), dtype=np.float32)
+            expires_at = time.monotonic() + self.ttl_seconds
+            with self._lock:
+                self.misses += len(missing)
+                self.batches += 1
+                self.batched_queries += len(missing)
+                self.max_observed_batch = max(self.max_observed_batch, len(missing))
+                for key, embedding in zip(missing, embeddings):
+                    vector = embedding.reshape(1, -1)
+                    vector.setflags(write=False) # Shared between requests through the cache
+                    vectors[key] = vector
+                    self._cache[key] = (vector, expires_at)
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+                    self.evictions += 1
+        return np.vstack([vectors[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def _ensure_worker(self):
+        """Starts the batching thread in this process if needed (called with the lock held)."""
+        if self._worker_pid != os.getpid() or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run_batches, name="query-encoder", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run_batches(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._queue_ready.wait()
+            # Give concurrent misses a moment to join this batch
+            deadline = time.monotonic() + self.batch_window
+            while time.monotonic() < deadline:
+                with self._lock:
+                    if len(self._queue) >= self.max_batch_size:
+                        break
+                time.sleep(self.batch_window / 5)
+            with self._lock:
+                batch = self._queue[:self.max_batch_size]
+                del self._queue[:len(batch)]
+                futures = [self._in_flight[key] for key, _ in batch]
+            self._encode_and_publish(batch, futures)
+
+    def _encode_and_publish(self, batch, futures):
+        try:
+            embeddings = np.asarray(self.encode_batch([text for _, text in batch]), dtype=np.float32)
+        except Exception as e:
+            with self._lock:
+                for key, _ in batch:
+                    self._in_flight.pop(key, None)
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        vectors = [embedding.reshape(1, -1) for embedding in embeddings]
+        for vector in vectors:
+            vector.setflags(write=False) # Shared between requests through the cache
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self.batches += 1
+            self.batched_queries += len(batch)
+            self.max_observed_batch = max(self.max_observed_batch, len(batch))
+            for (key, _), vector in zip(batch, vectors):
+                self._cache[key] = (vector, expires_at)
+                self._cache.move_to_end(key)
+                self._in_flight.pop(key, None)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        for future, vector in zip(futures, vectors):
+            future.set_result(vector)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._cache),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "batches": self.batches,
+                "avg_batch_size": (self.batched_queries / self.batches) if self.batches else 0.0,
+                "max_batch_size": self.max_observed_batch,
+            }
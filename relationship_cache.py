@@ -0,0 +1,123 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# --- Inferred Relationships Cache Configuration (used by search_api.py) ---
+RELATIONSHIP_FILTER_FIELDS = ('source_table', 'target_table', 'relationship_type') # /inferred-relationships query parameters
+RELATIONSHIPS_VERSION_CHECK_INTERVAL_SECONDS = 2 # Requests within this long of the last version check skip the DB entirely
+# The version (row count, max created_at, max id) changes on inserts and deletes but not when
+# relationship_inferer.py updates an existing relationship in place, so snapshots are also reloaded after this long
+RELATIONSHIPS_CACHE_MAX_AGE_SECONDS = 300
+RELATIONSHIPS_PAGE_CACHE_MAX_ENTRIES = 256 # Serialized pages kept per snapshot (one per filters/limit/cursor combination)
+
+def format_cursor(row):
+    """Keyset cursor of a relationship: its created_at and id, the sort key of the listing."""
+    return f"{row['created_at'] or ''},{row['id']}"
+
+def parse_cursor(cursor):
+    """Sort key (created_at, id) of a cursor from format_cursor(); raises ValueError when malformed."""
+    created_at, _, row_id = cursor.rpartition(',')
+    return (datetime.fromisoformat(created_at) if created_at else datetime.min, int(row_id))
+
+def relationship_sort_key(row):
+    return (datetime.fromisoformat(row['created_at']) if row['created_at'] else datetime.min, row['id'])
+
+class RelationshipSnapshot:
+    """All inferred relationships at one table version, newest first, with their serialized pages.
+
+    Never modified after creation apart from the page cache, so a request
+    keeps a consistent listing while a newer snapshot replaces it.
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = sorted(rows, key=relationship_sort_key, reverse=True)
+        self.loaded_at = time.monotonic()
+        self._pages = OrderedDict() # (filters, limit, cursor) -> (body, etag)
+        self._pages_lock = threading.Lock()
+
+    def page(self, filters, limit, cursor=None):
+        """(JSON body, ETag value) of one page of relationships matching `filters`, after `cursor`.
+
+        Filters match case-insensitively. Pages are keyset-paginated on
+        (created_at, id), so rows added since a client's first page do not
+        shift the pages that follow. The ETag is a hash of the body, so it
+        only changes when the page's content does.
+        """
+        filters = {field: value.lower() for field, value in filters.items() if value}
+        key = (tuple(sorted(filters.items())), limit, cursor)
+        with self._pages_lock:
+            entry = self._pages.get(key)
+            if entry is not None:
+                self._pages.move_to_end(key)
+                return entry
+
+        after = parse_cursor(cursor) if cursor else None
+        matching = [row for row in self.rows
+                    if all((row.get(field) or '').lower() == value for field, value in filters.items())]
+        start = 0
+        if after is not None:
+            while start < len(matching) and relationship_sort_key(matching[start]) >= after:
+                start += 1
+        page_rows = matching[start:start + limit]
+        has_more = start + limit < len(matching)
+        body = json.dumps({
+            "relationships": page_rows,
+            "next_cursor": format_cursor(page_rows[-1]) if has_more else None,
+            "total": len(matching)
+        })
+        entry = (body, hashlib.sha1(body.encode()).hexdigest())
+        with self._pages_lock:
+            self._pages[key] = entry
+            while len(self._pages) > RELATIONSHIPS_PAGE_CACHE_MAX_ENTRIES:
+                self._pages.popitem(last=False)
+        return entry
+
+class RelationshipCache:
+    """In-process cache of the inferred_relationships table, invalidated by its version.
+
+    `load(known_version)` must return (version, rows), with rows None when
+    the version still equals `known_version`. It is called at most every
+    RELATIONSHIPS_VERSION_CHECK_INTERVAL_SECONDS, and by one thread at a time.
+    """
+
+    def __init__(self, check_interval_seconds=RELATIONSHIPS_VERSION_CHECK_INTERVAL_SECONDS,
+                 max_age_seconds=RELATIONSHIPS_CACHE_MAX_AGE_SECONDS):
+        self.check_interval_seconds = check_interval_seconds
+        self.max_age_seconds = max_age_seconds
+        self.version_checks = 0
+        self.reloads = 0
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self, load):
+        """The current RelationshipSnapshot, reloaded through `load` when the table changed."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval_seconds:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            now = time.monotonic()
+            if snapshot is not None and now - self._checked_at < self.check_interval_seconds:
+                return snapshot # Another thread checked while this one waited
+            expired = snapshot is None or now - snapshot.loaded_at >= self.max_age_seconds
+            version, rows = load(None if expired else snapshot.version)
+            self.version_checks += 1
+            if rows is not None:
+                snapshot = RelationshipSnapshot(version, rows)
+                self._snapshot = snapshot
+                self.reloads += 1
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version_checks": self.version_checks,
+            "reloads": self.reloads,
+            "rows": len(snapshot.rows) if snapshot else 0
+        }
@@ -4,6 +4,8 @@ from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 import re
+from llm_cache import LLMResponseCache
+from catalog_io import iter_catalog_tables, find_existing_catalog, CATALOG_FILE_PATH
 
 # --- Database Connection Details ---
 DB_CONFIG = {
@@ -16,6 +18,13 @@ DB_CONFIG = {
 # --- LLM Configuration (same as llm_enrichment.py and search_api.py) ---
 LLM_MODEL_NAME = 'gemma-3-4b-it-qat' # Your model in LM Studio
 LLM_BASE_URL = 'http://127.0.0.1:1234/v1' # LM Studio OpenAI-compatible endpoint
+LLM_TEMPERATURE = 0.2 # Slightly higher for creative inference but still structured
+
+METADATA_FILE_PATH = CATALOG_FILE_PATH # Catalog written by metadata_extractor.py; its .gz variant is found too
+CHANGES_FILE_PATH = "metadata_changes.json" # Written by metadata_extractor.py
+INCREMENTAL_INFERENCE = True # Only analyse added/changed tables in detail when a change set exists
+
+USE_LLM_CACHE = True # Reuse the cached response when the schema hasn't changed (see llm_cache.py)
 
 # --- Prompt Template for Relationship Inference ---
 RELATIONSHIP_INFERENCE_PROMPT_TEMPLATE = """
@@ -43,33 +52,76 @@ Ensure the output is ONLY the JSON list, with no other text before or after it.
 Inferred Relationships (JSON List):
 """
 
-def load_extracted_metadata(filepath="extracted_metadata.json"):
-    """Loads the extracted metadata from the JSON file."""
+def load_extracted_metadata(filepath=METADATA_FILE_PATH):
+    """Loads the schema part of the extracted catalog.
+
+    Tables are streamed from the catalog file one at a time and only their
+    columns and keys are kept; sample data isn't needed for the prompt.
+    """
+    metadata_path = find_existing_catalog(filepath)
+    if not metadata_path:
+        print(f"Error: Metadata file not found at {filepath}")
+        return None
+    metadata = {"tables": {}}
+    try:
+        for table_name, table_info in iter_catalog_tables(metadata_path):
+            metadata["tables"][table_name] = {
+                "columns": table_info.get('columns', []),
+                "primary_keys": table_info.get('primary_keys', []),
+                "foreign_keys": table_info.get('foreign_keys', [])
+            }
+    except (IOError, ValueError) as e:
+        print(f"Error: Could not read catalog {metadata_path}: {e}")
+        return None
+    print(f"Successfully loaded metadata for {len(metadata['tables'])} tables from {metadata_path}")
+    return metadata
+
+def load_changes(filepath=CHANGES_FILE_PATH):
+    """Loads the added/changed/dropped change set written by metadata_extractor.py, if any."""
     try:
         with open(filepath, 'r') as f:
-            metadata = json.load(f)
-        print(f"Successfully loaded metadata from {filepath}")
-        return metadata
+            return json.load(f)
     except FileNotFoundError:
-        print(f"Error: Metadata file not found at {filepath}")
         return None
     except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from {filepath}")
+        print(f"Warning: Could not decode change set '{filepath}'. Analysing the full schema.")
         return None
 
-def format_schema_for_llm(metadata):
-    """Formats the schema details from metadata for the LLM prompt."""
+def format_profile_hint(profile):
+    """Short profile summary (distinct count, nulls, value range) that helps spot FK-like columns."""
+    if not profile:
+        return ""
+    hints = []
+    if profile.get('approx_distinct') is not None:
+        hints.append(f"distinct~{profile['approx_distinct']}/{profile.get('profiled_rows')} rows")
+    if profile.get('null_fraction') is not None:
+        hints.append(f"nulls {profile['null_fraction']:.0%}")
+    if profile.get('min') is not None or profile.get('max') is not None:
+        hints.append(f"range {profile.get('min')}..{profile.get('max')}")
+    return f" [{', '.join(hints)}]" if hints else ""
+
+def format_schema_for_llm(metadata, focus_tables=None):
+    """Formats the schema details from metadata for the LLM prompt.
+
+    With `focus_tables`, only those tables are listed with all their columns;
+    the remaining tables are listed by name and primary key so the LLM can
+    still link the focus tables to them.
+    """
     if not metadata or 'tables' not in metadata:
         return "No schema details available."
 
     schema_str = "Tables and Columns:\\n"
     for table_name, table_details in metadata['tables'].items():
+        if focus_tables is not None and table_name not in focus_tables:
+            primary_keys = ", ".join(table_details.get('primary_keys', [])) or "none"
+            schema_str += f"- Table: {table_name} (context only, primary keys: {primary_keys})\\n"
+            continue
         schema_str += f"- Table: {table_name}\\n"
         if 'columns' in table_details and isinstance(table_details['columns'], list):
             for col_data in table_details['columns']: # Iterate over list of column dicts
                 column_name = col_data.get('name', 'UNKNOWN_COLUMN')
                 col_type = col_data.get('type', 'UNKNOWN_TYPE')
-                schema_str += f"  - Column: {column_name} (Type: {col_type})\\n"
+                schema_str += f"  - Column: {column_name} (Type: {col_type}){format_profile_hint(col_data.get('profile'))}\\n"
         elif 'columns' in table_details and isinstance(table_details['columns'], dict):
             # Fallback for dictionary structure, though the error indicates it's a list
             for column_name, col_details_dict in table_details['columns'].items():
@@ -95,9 +147,18 @@ def format_schema_for_llm(metadata):
     return schema_str + "\\n" + fk_str
 
 
-def store_inferred_relationships(relationships):
-    """Stores the inferred relationships in the database."""
-    if not relationships:
+def relationship_key(rel):
+    """The columns of the unique_relationship key of an inferred relationship."""
+    return (rel['source_table'], rel['source_column'], rel['target_table'], rel['target_column'], LLM_MODEL_NAME)
+
+def store_inferred_relationships(relationships, replace_tables=None):
+    """Stores the inferred relationships in the database.
+
+    With `replace_tables` (the changed tables of an incremental run), the stored
+    relationships from or to those tables that are not in `relationships` are
+    deleted in the same transaction, e.g. those of a column that no longer exists.
+    """
+    if not relationships and not replace_tables:
         print("No relationships to store.")
         return
 
@@ -116,8 +177,8 @@ def store_inferred_relationships(relationships):
             llm_model_version = VALUES(llm_model_version)
         """
         
-        stored_count = 0
-        for rel in relationships:
+        stored_keys = []
+        for rel in relationships or []:
             # Basic validation
             if not all(k in rel for k in ["source_table", "source_column", "target_table", "target_column", "relationship_type", "justification"]):
                 print(f"Skipping invalid relationship object: {rel}")
@@ -129,15 +190,57 @@ def store_inferred_relationships(relationships):
                 rel['relationship_type'], rel['justification'],
                 LLM_MODEL_NAME 
             ))
-            stored_count += 1
-        
+            stored_keys.append(relationship_key(rel))
+
+        removed_count = 0
+        if replace_tables:
+            table_names = tuple(replace_tables)
+            placeholders = ", ".join(["%s"] * len(table_names))
+            sql = f"""
+                DELETE FROM inferred_relationships
+                WHERE (source_table IN ({placeholders}) OR target_table IN ({placeholders}))
+            """
+            params = table_names * 2
+            if stored_keys:
+                sql += f" AND (source_table, source_column, target_table, target_column, llm_model_version) NOT IN ({', '.join(['(%s, %s, %s, %s, %s)'] * len(stored_keys))})"
+                params += tuple(value for key in stored_keys for value in key)
+            cursor.execute(sql, params)
+            removed_count = cursor.rowcount
+
         conn.commit()
-        print(f"Successfully stored/updated {stored_count} inferred relationships in the database.")
+        print(f"Successfully stored/updated {len(stored_keys)} inferred relationships in the database"
+              f" (removed {removed_count} no longer inferred for changed tables).")
 
     except mysql.connector.Error as err:
         print(f"Database error while storing relationships: {err}")
+        if conn and conn.is_connected():
+            conn.rollback()
     except Exception as e:
         print(f"An unexpected error occurred during storage: {e}")
+        if conn and conn.is_connected():
+            conn.rollback()
+    finally:
+        if conn and conn.is_connected():
+            cursor.close()
+            conn.close()
+
+def delete_relationships_for_tables(table_names):
+    """Removes inferred relationships that point from or to tables that no longer exist."""
+    if not table_names:
+        return
+    conn = None
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        placeholders = ", ".join(["%s"] * len(table_names))
+        cursor.execute(f"""
+            DELETE FROM inferred_relationships
+            WHERE source_table IN ({placeholders}) OR target_table IN ({placeholders})
+        """, tuple(table_names) * 2)
+        conn.commit()
+        print(f"Removed {cursor.rowcount} inferred relationships involving dropped tables.")
+    except mysql.connector.Error as err:
+        print(f"Database error while removing relationships of dropped tables: {err}")
     finally:
         if conn and conn.is_connected():
             cursor.close()
@@ -169,8 +272,18 @@ def main():
     if not metadata:
         return
         
+    focus_tables = None
+    changes = load_changes() if INCREMENTAL_INFERENCE else None
+    if changes is not None:
+        delete_relationships_for_tables(changes.get('dropped', []))
+        focus_tables = set(changes.get('added', [])) | set(changes.get('changed', []))
+        if not focus_tables:
+            print("No added or changed tables since the last extraction. Nothing to infer.")
+            return
+        print(f"Incremental mode: inferring relationships for {len(focus_tables)} added/changed tables.")
+
     # 2. Format schema for LLM
-    schema_details_for_prompt = format_schema_for_llm(metadata)
+    schema_details_for_prompt = format_schema_for_llm(metadata, focus_tables)
     # print(f"Schema for LLM:\\n{schema_details_for_prompt}") # For debugging
 
     # 3. Initialize LLM
@@ -179,7 +292,7 @@ def main():
             model=LLM_MODEL_NAME,
             base_url=LLM_BASE_URL,
             api_key="not-needed", 
-            temperature=0.2 # Slightly higher for creative inference but still structured
+            temperature=LLM_TEMPERATURE
         )
         print(f"LLM ({LLM_MODEL_NAME}) initialized successfully for relationship inference.")
     except Exception as e:
@@ -190,21 +303,41 @@ def main():
     prompt = ChatPromptTemplate.from_template(RELATIONSHIP_INFERENCE_PROMPT_TEMPLATE)
     chain = prompt | llm | StrOutputParser()
     
-    print("Invoking LLM for relationship inference (this may take a moment)...")
-    try:
-        llm_response_str = chain.invoke({"schema_details": schema_details_for_prompt})
-        print(f"LLM raw response:\\n{llm_response_str}")
-    except Exception as e:
-        print(f"Error invoking LLM chain: {e}")
-        return
+    prompt_input = {"schema_details": schema_details_for_prompt}
+    cache = LLMResponseCache() if USE_LLM_CACHE else None
+    # Temperature changes the answer, so it is part of the cache key alongside the model name
+    cache_model_id = f"{LLM_MODEL_NAME}|temperature={LLM_TEMPERATURE}"
+    cache_key = cache.make_key(cache_model_id, RELATIONSHIP_INFERENCE_PROMPT_TEMPLATE, prompt_input) if cache else None
+    llm_response_str = cache.get(cache_key) if cache else None
+
+    if llm_response_str is not None:
+        print("Schema unchanged since the last run; using cached LLM response.")
+    else:
+        print("Invoking LLM for relationship inference (this may take a moment)...")
+        try:
+            llm_response_str = chain.invoke(prompt_input)
+            print(f"LLM raw response:\\n{llm_response_str}")
+        except Exception as e:
+            print(f"Error invoking LLM chain: {e}")
+            if cache:
+                cache.close()
+            return
+        if cache:
+            cache.put(cache_key, cache_model_id, llm_response_str)
 
     # 5. Parse LLM output
     inferred_relationships = parse_llm_json_output(llm_response_str)
+    if inferred_relationships is None and cache:
+        # Don't keep serving a response we can't parse; the next run will ask the model again
+        cache.invalidate(cache_key)
+    if cache:
+        cache.print_stats()
+        cache.close()
     
     if inferred_relationships is not None:
         print(f"Successfully parsed {len(inferred_relationships)} potential relationships from LLM response.")
         # 6. Store relationships
-        store_inferred_relationships(inferred_relationships)
+        store_inferred_relationships(inferred_relationships, (changes or {}).get('changed'))
     else:
         print("Could not parse relationships from LLM response. No relationships will be stored.")
 
@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+from query_encoder import normalize_query
+
+# --- Re-rank Cache Configuration (used by search_api.py) ---
+RERANK_CACHE_MAX_ENTRIES = 5000 # Least recently used orderings are evicted beyond this many
+RERANK_CACHE_TTL_SECONDS = 6 * 3600 # Orderings expire after this long
+
+class RerankCache:
+    """In-memory LRU/TTL cache of re-rank orderings.
+
+    Keyed by (normalized query, candidate ids in retrieval order, re-rank
+    model), so a cached ordering is only reused for exactly the same
+    candidate set. Safe to share between request and background threads.
+    """
+
+    def __init__(self, max_entries=RERANK_CACHE_MAX_ENTRIES, ttl_seconds=RERANK_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # key -> (ordered ids, expires_at)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query, candidate_ids, model_name):
+        return (normalize_query(query), tuple(candidate_ids), model_name)
+
+    def get(self, key):
+        """Returns the cached ordering (a list of ids) for `key`, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, ordered_ids):
+        with self._lock:
+            self._entries[key] = (list(ordered_ids), time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+            }
@@ -1,12 +1,28 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import mysql.connector
+from mysql.connector import pooling
 import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import numpy as np # Added for FAISS
-from sentence_transformers import SentenceTransformer # Added for embeddings
+from sentence_transformers import SentenceTransformer, CrossEncoder # Added for embeddings
 import faiss # Added for vector search
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from catalog_filters import CatalogFilterIndex, FILTER_FIELDS
+from catalog_store import CatalogStore
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from query_encoder import QueryEncoder
+from relationship_cache import parse_cursor, RelationshipCache, RELATIONSHIP_FILTER_FIELDS
+from rerank_cache import RerankCache
+from vector_index import (apply_catalog_changes, build_faiss_index, fetch_catalog_signature, fetch_indexable_ids,
+                          get_index_type, index_file_lock, index_file_version, load_catalog_items_from_db, load_index,
+                          load_saved_index, make_search_params, read_index_file, resolve_index_type, save_index, search_with_filter,
+                          CATALOG_ITEMS_FILTER, INDEX_FILE_PATH, INDEX_LOCK_SUFFIX)
 
 # --- Database Connection Details (same as other scripts) ---
 DB_CONFIG = {
@@ -16,26 +32,34 @@ DB_CONFIG = {
     'database': 'semantic_catalog_db'
 }
 
-# --- Initialize Sentence Transformer Model ---
+# --- Connection Pool (used by /inferred-relationships) ---
+# Created on first use in each worker process; pooled connections must not cross a fork
+DB_POOL_SIZE = 8 # Matches the gunicorn threads per worker (mysql.connector allows at most 32)
+db_pool = None
+db_pool_pid = None
+db_pool_slots = threading.Semaphore(DB_POOL_SIZE) # A pool raises instead of blocking when it runs dry
+db_pool_lock = threading.Lock()
+
+# --- Inferred Relationships Listing ---
+RELATIONSHIPS_DEFAULT_LIMIT = 100 # Relationships per page
+RELATIONSHIPS_MAX_LIMIT = 1000
+RELATIONSHIP_CACHE = RelationshipCache() # Table snapshot and serialized pages; see relationship_cache.py
+EXCLUDED_RELATIONSHIP_TABLES = ('enriched_metadata', 'inferred_relationships') # The catalog's own tables
+
+# --- Sentence Transformer Model ---
+# Loaded on first use (get_model()), not at import: under gunicorn the app is
+# imported once in the master and forked, and each worker loads its own model.
 MODEL_NAME = 'all-MiniLM-L6-v2' 
-model = SentenceTransformer(MODEL_NAME)
-print(f"Sentence Transformer model '{MODEL_NAME}' loaded.")
+MODEL_EMBEDDING_DIMS = {'all-MiniLM-L6-v2': 384} # Lets the master rebuild the index without loading the model
+model = None
+model_lock = threading.Lock()
 
 # --- LLM Configuration for Re-ranking ---
 LLM_RERANK_MODEL_NAME = 'gemma-3-4b-it-qat' # Your model in LM Studio
 LLM_RERANK_BASE_URL = 'http://127.0.0.1:1234/v1' # LM Studio OpenAI-compatible endpoint
-llm_reranker = None
-try:
-    llm_reranker = ChatOpenAI(
-        model=LLM_RERANK_MODEL_NAME,
-        base_url=LLM_RERANK_BASE_URL,
-        api_key="not-needed", # LM Studio typically doesn't require an API key
-        temperature=0.1 # Lower temperature for more deterministic output for re-ranking
-    )
-    print(f"LLM Re-ranker ({LLM_RERANK_MODEL_NAME}) initialized successfully.")
-except Exception as e:
-    print(f"Error initializing LLM Re-ranker: {e}. Re-ranking will be disabled.")
-    llm_reranker = None
+llm_reranker = None # Created on first use by get_llm_reranker(), once per worker process
+llm_reranker_initialized = False
+llm_reranker_lock = threading.Lock()
 
 # --- Prompt Template for Re-ranking ---
 RERANK_PROMPT_TEMPLATE = """
@@ -53,226 +77,670 @@ Items to re-rank:
 Re-ranked IDs (comma-separated list ONLY):
 """
 
+# --- Re-rank Latency Budget ---
+RERANK_LATENCY_BUDGET_MS = 800 # Longest a /search request waits for the LLM re-ranker before returning the FAISS order
+RERANK_MAX_CONCURRENCY = 4 # Background re-rank calls in flight at once
+RERANK_EXECUTOR = ThreadPoolExecutor(max_workers=RERANK_MAX_CONCURRENCY, thread_name_prefix="rerank")
+RERANK_CACHE = RerankCache() # Orderings keyed by (query, candidate ids, model); see rerank_cache.py
+RERANK_IN_FLIGHT = {} # cache key -> Future, so identical concurrent requests share one LLM call
+RERANK_IN_FLIGHT_LOCK = threading.Lock()
+RERANK_STATS = {"llm_calls": 0, "llm_errors": 0, "budget_timeouts": 0, "cross_encoder_calls": 0}
+
+# --- Re-rank Modes ---
+# 'llm': the LM Studio model above (slow; bounded by the latency budget)
+# 'cross_encoder': a small local CrossEncoder scoring (query, description) pairs on CPU in one batch
+# 'none': plain FAISS order
+RERANK_MODES = ('llm', 'cross_encoder', 'none')
+DEFAULT_RERANK_MODE = 'llm' # Used when /search is called without rerank_mode
+CROSS_ENCODER_MODEL_NAME = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+cross_encoder = None # Loaded on first use, so processes that never use it don't pay for it
+cross_encoder_lock = threading.Lock()
+
+# --- Hybrid Retrieval ---
+HYBRID_SEARCH = True # Fuse BM25 keyword hits (exact column/table names) with the vector candidates; /search?hybrid=false turns it off per request
+LEXICAL_CANDIDATES = 10 # BM25 hits fused with the vector candidates
+RRF_K = 60 # Reciprocal rank fusion constant; larger values flatten the rank weighting
+
+# --- Streaming Search ---
+STREAM_RERANK_TIMEOUT_MS = 30000 # How long a streaming /search (stream=true) waits for the re-ranked order; the vector hits are already sent
+NDJSON_MIMETYPE = 'application/x-ndjson'
+EMPTY_INDEX_MESSAGE = "FAISS index is not available or empty."
+
+# --- Filters and Pagination ---
+# /search accepts object_type, parent_table_name, tag and schema filters (see catalog_filters.py)
+SEARCH_DEFAULT_K = 10 # Results per page
+SEARCH_MAX_K = 100
+SEARCH_MAX_OFFSET = 1000 # offset + k items are retrieved to serve a page
+SEARCH_MAX_NPROBE = 65536 # Largest accepted nprobe (IVF); it is clamped to the index's nlist anyway
+SEARCH_MAX_EF_SEARCH = 4096 # Largest accepted ef_search (HNSW); search time grows with it
+
+# --- Batch Search ---
+SEARCH_BATCH_MAX_QUERIES = 1000 # Queries accepted by one POST /search/batch
+DEFAULT_BATCH_RERANK_MODE = 'none' # Re-ranking hundreds of queries would dominate the batch; opt in per request
+
+SAVE_INDEX_ON_REBUILD = True # Write the index file after a DB rebuild so the next start can load it directly
+
+# --- Server Workers (see gunicorn.conf.py) ---
+WARM_MODEL_ON_WORKER_START = True # Load the Sentence Transformer when a worker starts instead of on its first request
+
+# --- Live Index Updates ---
+INDEX_POLL_INTERVAL_SECONDS = 30 # Background check for new/removed embeddings; 0 disables the poller (POST /admin/refresh-index still works)
+LIVE_UPDATE_MAX_TOMBSTONE_FRACTION = 0.2 # Rebuild from scratch once this share of catalog rows are removed leftovers
+EPOCH_WATERMARK = '1000-01-01 00:00:00' # Used when no indexed row has an embedded_at yet
+# Server workers (init_worker) share index updates through INDEX_FILE_PATH: one process at a time
+# (holding INDEX_REFRESH_LOCK_PATH) applies a change and saves the index, and every worker then
+# memory-maps the new file, so updated indexes stay shared instead of becoming one private copy per worker
+SHARE_INDEX_UPDATES = False
+INDEX_REFRESH_LOCK_PATH = INDEX_FILE_PATH + ".refresh.lock"
+rejected_index_file_version = None # A saved index that could not be used; not read again until it is replaced
+
+class IndexState:
+    """The searchable index, its catalog rows, their BM25 and filter indexes and the DB signature they reflect.
+
+    Never modified after creation: updates build a new IndexState and replace
+    INDEX_STATE in one assignment, so a request that read INDEX_STATE keeps a
+    consistent index/catalog pair without any locking.
+    """
+    __slots__ = ('index', 'catalog', 'lexical', 'filters', 'signature', 'file_version', 'created_at')
+
+    def __init__(self, index, catalog, signature, lexical=None, filters=None, file_version=None):
+        self.index = index
+        self.catalog = catalog
+        self.lexical = lexical
+        self.filters = filters
+        self.signature = signature
+        self.file_version = file_version # index_file_version() of the saved file the index was mapped from, if any
+        self.created_at = time.time()
+
 # --- Global variables for pre-loaded data and FAISS index ---
-FAISS_INDEX = None
-ALL_ITEMS_DATA = [] # Stores the full data of items in the FAISS index
-ALL_ITEMS_IDS = [] # Stores the database IDs of items in the FAISS index, mapping FAISS index to DB ID
+INDEX_STATE = IndexState(None, CatalogStore(), None)
+INDEX_UPDATE_LOCK = threading.Lock() # One writer (poller or admin refresh) at a time; searches never take it
+INDEX_FRESHNESS = {
+    "last_check_at": None, # Last time the DB was compared with the index
+    "last_update_at": None, # Last time new embeddings became searchable
+    "last_update_lag_seconds": None, # Oldest applied embedding's age when it became searchable
+    "items_added": 0,
+    "items_removed": 0,
+    "full_rebuilds": 0,
+    "last_error": None
+}
 
 # --- Embedding and Vector Search Functions ---
 def get_embeddings(texts: list[str]):
     """Generates embeddings for a list of texts using the loaded Sentence Transformer model."""
     if not texts:
         return []
-    embeddings = model.encode(texts, convert_to_tensor=False) # convert_to_tensor=False for numpy array
+    embeddings = get_model().encode(texts, convert_to_tensor=False) # convert_to_tensor=False for numpy array
     return embeddings
 
-def build_faiss_index(embeddings: np.ndarray):
-    """Builds a FAISS index from a list of embeddings."""
-    if embeddings is None or len(embeddings) == 0:
-        return None
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)  # Using L2 distance
-    index.add(embeddings)
-    return index
+def encode_query_batch(texts: list[str]):
+    """Encodes a micro-batch of queries in one model.encode call (used by QUERY_ENCODER)."""
+    return get_model().encode(texts, batch_size=len(texts), convert_to_tensor=False, show_progress_bar=False)
 
-def search_faiss_index(index, query_embedding: np.ndarray, k=10):
-    """Searches the FAISS index for the top k similar items."""
-    if index is None or query_embedding is None or index.ntotal == 0:
-        print("Warning: FAISS index is None, query_embedding is None, or index is empty.")
-        return np.array([]), np.array([])
-    distances, indices = index.search(query_embedding, k)
-    return distances[0], indices[0]
+# Cached, micro-batched query embeddings; see query_encoder.py for the cache size, TTL and batch window
+QUERY_ENCODER = QueryEncoder(encode_query_batch)
 
 
 app = Flask(__name__)
 
+def get_model():
+    """Returns the Sentence Transformer model, loading it on first use in this process."""
+    global model
+    with model_lock:
+        if model is None:
+            model = SentenceTransformer(MODEL_NAME)
+            print(f"Sentence Transformer model '{MODEL_NAME}' loaded.")
+        return model
+
+def get_embedding_dimension():
+    """Embedding size of MODEL_NAME, without loading the model when it is known."""
+    if model is None and MODEL_NAME in MODEL_EMBEDDING_DIMS:
+        return MODEL_EMBEDDING_DIMS[MODEL_NAME]
+    return get_model().get_sentence_embedding_dimension()
+
+def get_llm_reranker():
+    """Returns the LLM re-ranker client, creating it on first use (None if it cannot be created)."""
+    global llm_reranker, llm_reranker_initialized
+    with llm_reranker_lock:
+        if not llm_reranker_initialized:
+            llm_reranker_initialized = True
+            try:
+                llm_reranker = ChatOpenAI(
+                    model=LLM_RERANK_MODEL_NAME,
+                    base_url=LLM_RERANK_BASE_URL,
+                    api_key="not-needed", # LM Studio typically doesn't require an API key
+                    temperature=0.1 # Lower temperature for more deterministic output for re-ranking
+                )
+                print(f"LLM Re-ranker ({LLM_RERANK_MODEL_NAME}) initialized successfully.")
+            except Exception as e:
+                print(f"Error initializing LLM Re-ranker: {e}. Re-ranking will be disabled.")
+                llm_reranker = None
+        return llm_reranker
+
+def build_lexical_index(catalog, previous=None):
+    """BM25 index over `catalog` for hybrid search, or None when hybrid search is off.
+
+    `previous` is the BM25 index of the catalog `catalog` was live-updated from;
+    its postings are reused so only the updated items are tokenized.
+    """
+    if not HYBRID_SEARCH or not len(catalog):
+        return None
+    start = time.perf_counter()
+    lexical = LexicalIndex(catalog, previous=previous)
+    action = "updated" if previous is not None else "built"
+    print(f"BM25 index {action} over {lexical.doc_count} items in {time.perf_counter() - start:.2f}s.")
+    return lexical
+
+def make_index_state(index, catalog, signature, file_version=None, previous_lexical=None):
+    """IndexState for a searchable index/catalog pair, with the BM25 and filter indexes derived from the catalog."""
+    # Plain (single-target) table names belong to the configured database's schema
+    filters = CatalogFilterIndex(catalog, default_schema=DB_CONFIG['database'])
+    return IndexState(index, catalog, signature, build_lexical_index(catalog, previous_lexical), filters, file_version)
+
+def build_index_state_from_db(cursor, signature, save=SAVE_INDEX_ON_REBUILD):
+    """Builds a fresh IndexState from the embedding BLOBs in the DB."""
+    # Fetch items that have an embedding_vector and the correct model version
+    # AND are not metadata tables/columns themselves
+    embedding_dim = get_embedding_dimension() # Get expected dimension
+    embeddings_matrix, catalog = load_catalog_items_from_db(cursor, MODEL_NAME, embedding_dim)
+
+    if not len(catalog):
+        print("No pre-computed embeddings found for the current model. FAISS index will be empty.")
+        return IndexState(None, CatalogStore(), signature)
+
+    # Vectors are labelled with their DB ids, so live updates can add/remove them by id
+    index = build_faiss_index(embeddings_matrix, ids=catalog.live_ids())
+    del embeddings_matrix # The index holds its own copy; nothing else keeps the vectors
+    if not index:
+        print("Failed to build FAISS index.")
+        return IndexState(None, CatalogStore(), signature)
+
+    print(f"FAISS index ({get_index_type(index)}) built successfully with {index.ntotal} items.")
+    file_version = None
+    if save and len(catalog) == signature['item_count']:
+        try:
+            save_index(index, catalog, signature)
+            file_version = index_file_version() # Workers then know the saved file holds this index
+        except (IOError, RuntimeError) as e:
+            print(f"Could not save the rebuilt index: {e}")
+    catalog.build_id_lookup()
+    return make_index_state(index, catalog, signature, file_version)
+
 def load_and_index_data():
-    """Loads data and pre-computed embeddings from DB, then builds FAISS index."""
-    global FAISS_INDEX, ALL_ITEMS_DATA, ALL_ITEMS_IDS
+    """Loads the saved FAISS index if it is current, otherwise rebuilds it from pre-computed embeddings in the DB."""
+    global INDEX_STATE
     conn = None
     print("Loading pre-computed embeddings and building FAISS index...")
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor(dictionary=True)
-        
-        # Fetch items that have an embedding_vector and the correct model version
-        # AND are not metadata tables/columns themselves
-        query = """
-            SELECT id, object_type, object_name, parent_table_name, semantic_description, tags, embedding_vector 
-            FROM enriched_metadata 
-            WHERE embedding_vector IS NOT NULL 
-              AND embedding_model_version = %s
-              AND NOT (object_type = 'table' AND object_name IN ('enriched_metadata', 'inferred_relationships'))
-              AND NOT (object_type = 'column' AND parent_table_name IN ('enriched_metadata', 'inferred_relationships'))
-        """
-        cursor.execute(query, (MODEL_NAME,))
-        
-        items_with_embeddings = cursor.fetchall()
-        
-        if not items_with_embeddings:
-            print("No pre-computed embeddings found for the current model. FAISS index will be empty.")
-            FAISS_INDEX = None
-            ALL_ITEMS_DATA = []
-            ALL_ITEMS_IDS = []
+
+        # 1. Prefer the index file written by precompute_embeddings.py, if it matches the DB
+        signature = fetch_catalog_signature(cursor, MODEL_NAME)
+        file_version = index_file_version()
+        index, catalog = load_index(signature, expected_index_type=resolve_index_type(signature['item_count']))
+        if index is not None:
+            catalog.build_id_lookup()
+            INDEX_STATE = make_index_state(index, catalog, signature, file_version)
+            print(f"FAISS index ({get_index_type(index)}) loaded from {INDEX_FILE_PATH} with {index.ntotal} items.")
             return
 
-        loaded_embeddings_list = []
-        temp_items_data = []
-        temp_items_ids = []
+        # 2. Fall back to rebuilding from the embedding BLOBs
+        INDEX_STATE = build_index_state_from_db(cursor, signature)
+            
+    except mysql.connector.Error as err:
+        print(f"Database error in load_and_index_data: {err}")
+    except Exception as e:
+        print(f"Unexpected error in load_and_index_data: {e}")
+    finally:
+        if conn and conn.is_connected():
+            cursor.close()
+            conn.close()
 
-        embedding_dim = model.get_sentence_embedding_dimension() # Get expected dimension
+def refresh_index(wait=True):
+    """Brings the live index up to date with enriched_metadata without blocking searches.
 
-        for item in items_with_embeddings:
-            if item['embedding_vector']:
-                try:
-                    # Deserialize BLOB to numpy array
-                    embedding_np = np.frombuffer(item['embedding_vector'], dtype=np.float32)
-                    
-                    # Ensure the embedding has the correct dimension
-                    if embedding_np.shape[0] == embedding_dim:
-                        loaded_embeddings_list.append(embedding_np)
-                        # Store other data, deserialize tags
-                        if item.get('tags') and isinstance(item['tags'], str):
-                            try:
-                                item['tags'] = json.loads(item['tags'])
-                            except (json.JSONDecodeError, TypeError):
-                                item['tags'] = []
-                        temp_items_data.append(item)
-                        temp_items_ids.append(item['id'])
-                    else:
-                        print(f"Warning: Item ID {item['id']}: embedding dimension mismatch. Expected {embedding_dim}, got {embedding_np.shape[0]}. Skipping.")
-                except Exception as e:
-                    print(f"Error processing embedding for item ID {item['id']}: {e}. Skipping.")
-            
-        if not loaded_embeddings_list:
-            print("No valid embeddings were loaded. FAISS index will be empty.")
-            FAISS_INDEX = None
-            ALL_ITEMS_DATA = []
-            ALL_ITEMS_IDS = []
-            return
+    Rows embedded after the current watermark (signature['max_embedded_at'])
+    and live rows missing from the index are added, rows that left the
+    catalog are removed, all on a copy of the index that then replaces
+    INDEX_STATE. Falls back to a full rebuild when
+    the index type cannot remove vectors (HNSW) or too many removed rows
+    have piled up. Returns a summary dict.
+    """
+    with INDEX_UPDATE_LOCK:
+        if not SHARE_INDEX_UPDATES:
+            return refresh_index_locked()
+        with index_file_lock(INDEX_REFRESH_LOCK_PATH, blocking=wait) as acquired:
+            if not acquired:
+                # Another worker is applying the change; the poller maps its saved index next time
+                return {"status": "busy", "items": INDEX_STATE.index.ntotal if INDEX_STATE.index else 0}
+            reload_saved_index() # Pick up what the previous lock holder saved
+            return refresh_index_locked(publish=True)
 
-        # Convert list of embeddings to a 2D numpy array
-        embeddings_matrix = np.array(loaded_embeddings_list).astype('float32')
-        
-        FAISS_INDEX = build_faiss_index(embeddings_matrix)
-        ALL_ITEMS_DATA = temp_items_data
+def refresh_index_locked(publish=False):
+    """refresh_index() with INDEX_UPDATE_LOCK held; with `publish`, the new index is saved and memory-mapped."""
+    global INDEX_STATE
+    conn = None
+    state = INDEX_STATE
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor(dictionary=True)
+        signature = fetch_catalog_signature(cursor, MODEL_NAME)
+        INDEX_FRESHNESS["last_check_at"] = time.time()
+        if signature == state.signature:
+            return {"status": "unchanged", "items": state.index.ntotal if state.index else 0}
 
-        ALL_ITEMS_IDS = temp_items_ids # This now directly maps FAISS index to original item data
+        watermark = (state.signature or {}).get('max_embedded_at') or EPOCH_WATERMARK
+        cursor.execute(f"""
+            SELECT TIMESTAMPDIFF(MICROSECOND, MIN(embedded_at), NOW(6)) / 1e6 AS oldest_pending_age
+            FROM enriched_metadata
+            WHERE {CATALOG_ITEMS_FILTER} AND embedded_at > %s
+        """, (MODEL_NAME, watermark))
+        oldest_pending_age = cursor.fetchone()['oldest_pending_age']
 
-        if FAISS_INDEX:
-            print(f"FAISS index built successfully with {FAISS_INDEX.ntotal} items.")
+        too_many_tombstones = state.catalog.tombstones > LIVE_UPDATE_MAX_TOMBSTONE_FRACTION * max(len(state.catalog), 1)
+        if state.index is None or too_many_tombstones:
+            new_state = build_index_state_from_db(cursor, signature, save=SAVE_INDEX_ON_REBUILD and not publish)
+            status = "rebuilt"
         else:
-            print("Failed to build FAISS index.")
-            
+            embedding_dim = get_embedding_dimension()
+            live_ids = fetch_indexable_ids(cursor, MODEL_NAME)
+            # A row committed after the watermark was taken can carry an older embedded_at; load it by id
+            missing_ids = np.setdiff1d(live_ids, state.catalog.live_ids())
+            changed_embeddings, changed_catalog = load_catalog_items_from_db(
+                cursor, MODEL_NAME, embedding_dim, embedded_after=watermark, include_ids=missing_ids
+            )
+            try:
+                new_index, new_catalog, added, removed = apply_catalog_changes(
+                    state.index, state.catalog, changed_embeddings, changed_catalog, live_ids
+                )
+                # The new catalog keeps the old rows (some tombstoned) and appends the changed items, so the
+                # BM25 index only tokenizes those; the filter subsets are rebuilt
+                new_state = make_index_state(new_index, new_catalog, signature, previous_lexical=state.lexical)
+                INDEX_FRESHNESS["items_added"] += added
+                INDEX_FRESHNESS["items_removed"] += removed
+                status = "updated"
+                print(f"Live index update: {added} items added/replaced, {removed} removed ({new_index.ntotal} items).")
+            except RuntimeError as e:
+                print(f"Live update not possible ({e}). Rebuilding the index.")
+                new_state = build_index_state_from_db(cursor, signature, save=SAVE_INDEX_ON_REBUILD and not publish)
+                status = "rebuilt"
+
+        if publish and new_state.index is not None:
+            new_state = publish_index_state(new_state)
+        INDEX_STATE = new_state # Copy-on-write swap: in-flight searches finish on the old state
+        if status == "rebuilt":
+            INDEX_FRESHNESS["full_rebuilds"] += 1
+        INDEX_FRESHNESS["last_update_at"] = time.time()
+        INDEX_FRESHNESS["last_update_lag_seconds"] = float(oldest_pending_age) if oldest_pending_age is not None else None
+        INDEX_FRESHNESS["last_error"] = None
+        return {"status": status, "items": new_state.index.ntotal if new_state.index else 0}
     except mysql.connector.Error as err:
-        print(f"Database error in load_and_index_data: {err}")
-    except Exception as e:
-        print(f"Unexpected error in load_and_index_data: {e}")
+        print(f"Database error in refresh_index: {err}")
+        INDEX_FRESHNESS["last_error"] = str(err)
+        return {"status": "error", "error": str(err)}
     finally:
         if conn and conn.is_connected():
             cursor.close()
             conn.close()
 
-@app.route('/search', methods=['GET'])
-def search():
-    query = request.args.get('query', '')
-    if not query:
-        return jsonify({"error": "Query parameter is required"}), 400
+def publish_index_state(state):
+    """Saves `state`'s index for the other workers and returns `state` with the saved file memory-mapped.
 
-    global FAISS_INDEX, ALL_ITEMS_DATA, llm_reranker
+    Keeps the private in-memory index if the file cannot be written or no
+    longer holds exactly this index's ids (another process replaced it).
+    """
+    try:
+        save_index(state.index, state.catalog, state.signature)
+        with index_file_lock(INDEX_FILE_PATH + INDEX_LOCK_SUFFIX, exclusive=False):
+            file_version = index_file_version()
+            index = read_index_file()
+    except (IOError, RuntimeError) as e:
+        print(f"Could not share the updated index through {INDEX_FILE_PATH} ({e}). This worker keeps a private copy.")
+        return state
+    if not np.array_equal(np.sort(faiss.vector_to_array(index.id_map)), np.sort(state.catalog.live_ids())):
+        print(f"{INDEX_FILE_PATH} was replaced by another process. This worker keeps a private copy of its update.")
+        return state
+    return IndexState(index, state.catalog, state.signature, state.lexical, state.filters, file_version)
 
-    if FAISS_INDEX is None or FAISS_INDEX.ntotal == 0:
-        return jsonify({"results": [], "message": "FAISS index is not available or empty."}), 200
+def reload_saved_index():
+    """Swaps in the index at INDEX_FILE_PATH if another process saved a newer one; returns True if it did.
 
-    # 1. Get embedding for the query
-    query_embedding = get_embeddings([query])
-    if len(query_embedding) == 0:
-        return jsonify({"error": "Could not generate query embedding."}), 500
-    
-    query_embedding_np = np.array(query_embedding).astype('float32')
+    Call with INDEX_UPDATE_LOCK held. Only used when SHARE_INDEX_UPDATES is on.
+    """
+    global INDEX_STATE, rejected_index_file_version
+    state = INDEX_STATE
+    file_version = index_file_version()
+    if file_version is None or file_version in (state.file_version, rejected_index_file_version):
+        return False
+    index, catalog, signature = load_saved_index()
+    older = ((signature or {}).get('max_embedded_at') or '') < ((state.signature or {}).get('max_embedded_at') or '')
+    if index is None or older:
+        rejected_index_file_version = file_version
+        return False
+    catalog.build_id_lookup()
+    INDEX_STATE = make_index_state(index, catalog, signature, file_version)
+    INDEX_FRESHNESS["last_update_at"] = time.time()
+    print(f"Memory-mapped the index saved by another worker ({index.ntotal} items).")
+    return True
+
+def poll_index_updates():
+    """Background loop that calls refresh_index() every INDEX_POLL_INTERVAL_SECONDS."""
+    while True:
+        time.sleep(INDEX_POLL_INTERVAL_SECONDS)
+        try:
+            if SHARE_INDEX_UPDATES:
+                with INDEX_UPDATE_LOCK:
+                    reload_saved_index() # Every worker maps another worker's update, without waiting for its lock
+            refresh_index(wait=False)
+        except Exception as e:
+            print(f"Unexpected error while refreshing the index: {e}")
+            INDEX_FRESHNESS["last_error"] = str(e)
 
-    # 2. Search the FAISS index
-    distances, indices = search_faiss_index(FAISS_INDEX, query_embedding_np, k=10)
+def start_index_poller():
+    if INDEX_POLL_INTERVAL_SECONDS > 0:
+        threading.Thread(target=poll_index_updates, name="index-poller", daemon=True).start()
+        print(f"Polling for new embeddings every {INDEX_POLL_INTERVAL_SECONDS}s.")
+
+def init_worker():
+    """Per-process start-up of a server worker (called from gunicorn.conf.py after fork).
+
+    Threads do not survive fork, so the index poller is started here rather
+    than in the master. The index itself was loaded once in the master and is
+    shared with the workers copy-on-write; later updates are shared through
+    the saved index file (SHARE_INDEX_UPDATES).
+    """
+    global SHARE_INDEX_UPDATES
+    SHARE_INDEX_UPDATES = True
+    start_index_poller()
+    if WARM_MODEL_ON_WORKER_START:
+        get_model()
+
+@app.route('/admin/refresh-index', methods=['POST'])
+def admin_refresh_index():
+    """Applies new/removed embeddings to the live index now instead of waiting for the poller.
+
+    Under gunicorn the other workers map the saved result on their next poll.
+    """
+    result = refresh_index()
+    return jsonify(result), (500 if result["status"] == "error" else 200)
+
+@app.route('/admin/index-status', methods=['GET'])
+def admin_index_status():
+    """Index size/type, the watermark it reflects and how fresh it is."""
+    state = INDEX_STATE
+    now = time.time()
+    freshness = dict(INDEX_FRESHNESS)
+    for key in ("last_check_at", "last_update_at"):
+        freshness[f"seconds_since_{key[:-3]}"] = (now - freshness[key]) if freshness[key] else None
+    return jsonify({
+        "items": state.index.ntotal if state.index else 0,
+        "index_type": get_index_type(state.index) if state.index else None,
+        "removed_rows_pending_compaction": state.catalog.tombstones,
+        "signature": state.signature,
+        "freshness": freshness
+    })
+
+def build_rerank_prompt_input(query, candidates):
+    """Formats the candidates into RERANK_PROMPT_TEMPLATE inputs, or None if there is nothing to re-rank."""
+    items_for_reranking_str = ""
+    for item in candidates:
+        description = item.get('semantic_description', 'No description available.')
+        if not isinstance(description, str):
+            description = str(description)
+        
+        # Escape backslashes first, then double quotes to safely include in the prompt string
+        processed_description = description.replace('\\\\', '\\\\\\\\').replace('"', '\\\\"')
+
+        # Construct the item line for the prompt, ensuring the description is wrapped in escaped quotes
+        item_line = f"ID: {item['id']}, Description: \\\"{processed_description}\\\""
+        items_for_reranking_str += item_line + "\\n"
+    if not items_for_reranking_str:
+        return None
+    return {
+        "user_query": query,
+        "items_for_reranking": items_for_reranking_str.strip()
+    }
+
+def parse_reranked_ids(reranked_ids_str):
+    """Parses the LLM's comma-separated id list, ignoring anything that is not an integer id."""
+    parsed_ids = []
+    if reranked_ids_str and isinstance(reranked_ids_str, str):
+        for id_str_part in reranked_ids_str.split(','):
+            cleaned_id_str = id_str_part.strip()
+            if cleaned_id_str.isdigit():
+                parsed_ids.append(int(cleaned_id_str))
+    return parsed_ids
+
+def order_by_ids(candidates, ordered_ids):
+    """Reorders candidates by `ordered_ids`; candidates the ordering does not mention keep their relative order at the end."""
+    original_results_map = {item['id']: item for item in candidates}
+    reranked_results_temp = []
+    ids_added_to_final_list = set() # Tracks IDs added to the final list to ensure uniqueness
+
+    # Add items based on LLM's ranked order, ensuring uniqueness
+    for item_id in ordered_ids:
+        if item_id in original_results_map and item_id not in ids_added_to_final_list:
+            reranked_results_temp.append(original_results_map[item_id])
+            ids_added_to_final_list.add(item_id)
     
-    initial_search_results = []
+    # Add any remaining items from the initial search that weren't included (e.g. not in LLM list or were duplicates from LLM)
+    for item in candidates:
+        if item['id'] not in ids_added_to_final_list:
+            reranked_results_temp.append(item)
+    return reranked_results_temp
+
+def llm_rerank_ids(query, candidates, cache_key):
+    """Asks the LLM to re-rank `candidates`; caches and returns the id order, or None if unusable.
+
+    Runs on RERANK_EXECUTOR so it can outlive the request that started it.
+    """
+    rerank_prompt_input = build_rerank_prompt_input(query, candidates)
+    if rerank_prompt_input is None:
+        return None
+    rerank_chain = build_rerank_chain()
+
+    print(f"Invoking LLM for re-ranking {len(candidates)} items for query: '{query}'...")
+    RERANK_STATS["llm_calls"] += 1
+    try:
+        reranked_ids_str = rerank_chain.invoke(rerank_prompt_input)
+    except Exception:
+        RERANK_STATS["llm_errors"] += 1
+        raise
+    return store_llm_rerank(reranked_ids_str, cache_key)
+
+def build_rerank_chain():
+    rerank_chat_prompt = ChatPromptTemplate.from_template(RERANK_PROMPT_TEMPLATE)
+    return rerank_chat_prompt | get_llm_reranker() | StrOutputParser()
+
+def store_llm_rerank(reranked_ids_str, cache_key):
+    """Parses the LLM re-ranker output; caches and returns the id order, or None if unusable."""
+    print(f"LLM Re-ranker raw output: '{reranked_ids_str}'")
+    parsed_ids = parse_reranked_ids(reranked_ids_str)
+    if parsed_ids:
+        RERANK_CACHE.put(cache_key, parsed_ids)
+        return parsed_ids
+    return None
+
+def submit_llm_rerank(query, candidates, cache_key):
+    """Starts (or joins) the background LLM re-rank for `cache_key` and returns its future."""
+    with RERANK_IN_FLIGHT_LOCK:
+        future = RERANK_IN_FLIGHT.get(cache_key)
+        if future is None:
+            future = RERANK_EXECUTOR.submit(llm_rerank_ids, query, candidates, cache_key)
+            RERANK_IN_FLIGHT[cache_key] = future
+            future.add_done_callback(lambda _: release_in_flight_rerank(cache_key))
+        return future
+
+def release_in_flight_rerank(cache_key):
+    with RERANK_IN_FLIGHT_LOCK:
+        RERANK_IN_FLIGHT.pop(cache_key, None)
+
+def get_cross_encoder():
+    """Returns the CrossEncoder re-ranker, loading it on first use (None if it cannot be loaded)."""
+    global cross_encoder
+    with cross_encoder_lock:
+        if cross_encoder is None:
+            try:
+                cross_encoder = CrossEncoder(CROSS_ENCODER_MODEL_NAME, device='cpu')
+                print(f"Cross-encoder re-ranker '{CROSS_ENCODER_MODEL_NAME}' loaded.")
+            except Exception as e:
+                print(f"Error loading cross-encoder '{CROSS_ENCODER_MODEL_NAME}': {e}.")
+                return None
+        return cross_encoder
+
+def cross_encoder_passage(item):
+    """The text scored against the query for one candidate: its description, or its name if it has none."""
+    description = item.get('semantic_description')
+    if isinstance(description, str) and description.strip():
+        return description
+    return f"{item.get('parent_table_name') or ''} {item.get('object_name') or ''}".strip()
+
+def cross_encoder_rerank_ids(query, candidates, encoder):
+    """Scores all (query, description) pairs in one CrossEncoder batch and returns the ids, best first."""
+    RERANK_STATS["cross_encoder_calls"] += 1
+    scores = encoder.predict([(query, cross_encoder_passage(item)) for item in candidates],
+                             batch_size=len(candidates), show_progress_bar=False)
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    return [candidates[i]['id'] for i in order]
+
+def rerank_results(query, candidates, budget_ms=RERANK_LATENCY_BUDGET_MS, mode=DEFAULT_RERANK_MODE):
+    """Re-ranks candidates using `mode` (one of RERANK_MODES).
+
+    Returns (results, reranked). Cached orderings are applied immediately.
+    The cross-encoder runs inline (it is fast) and falls back to the LLM if it
+    cannot be loaded. For the LLM, the request waits at most `budget_ms`; on
+    timeout it gets the FAISS order (reranked=False) while the LLM call keeps
+    running in the background and stores its ordering in the cache for next time.
+    """
+    if mode == 'none' or not candidates:
+        return candidates, False
+    if mode == 'cross_encoder':
+        encoder = get_cross_encoder()
+        if encoder is not None:
+            cache_key = RerankCache.make_key(query, [item['id'] for item in candidates], CROSS_ENCODER_MODEL_NAME)
+            ordered_ids = RERANK_CACHE.get(cache_key)
+            if ordered_ids is None:
+                try:
+                    ordered_ids = cross_encoder_rerank_ids(query, candidates, encoder)
+                except Exception as e:
+                    print(f"Error during cross-encoder re-ranking: {e}. Using original FAISS order.")
+                    return candidates, False
+                RERANK_CACHE.put(cache_key, ordered_ids)
+            return order_by_ids(candidates, ordered_ids), True
+        print("Cross-encoder unavailable. Falling back to the LLM re-ranker.")
+
+    if not get_llm_reranker():
+        return candidates, False
+    cache_key = RerankCache.make_key(query, [item['id'] for item in candidates], LLM_RERANK_MODEL_NAME)
+    cached_ids = RERANK_CACHE.get(cache_key)
+    if cached_ids is not None:
+        return order_by_ids(candidates, cached_ids), True
+
+    future = submit_llm_rerank(query, candidates, cache_key)
+    try:
+        ordered_ids = future.result(timeout=budget_ms / 1000.0)
+    except FutureTimeoutError:
+        RERANK_STATS["budget_timeouts"] += 1
+        print(f"LLM re-ranking exceeded the {budget_ms} ms budget for query '{query}'. Using original FAISS order; the re-rank continues in the background.")
+        return candidates, False
+    except Exception as e:
+        print(f"Error during LLM re-ranking: {e}. Using original FAISS order.")
+        return candidates, False
+    if not ordered_ids:
+        print("LLM did not return valid IDs for re-ranking or output was empty. Using original FAISS order.")
+        return candidates, False
+    reranked = order_by_ids(candidates, ordered_ids)
+    print(f"Search results re-ranked by LLM. New order IDs: {[item['id'] for item in reranked]}")
+    return reranked, True
+
+@app.route('/admin/stats', methods=['GET'])
+def admin_stats():
+    """Cache and batching statistics of the search path."""
+    return jsonify({
+        "query_embeddings": QUERY_ENCODER.stats(),
+        "rerank": dict(RERANK_STATS, cache=RERANK_CACHE.stats(), in_flight=len(RERANK_IN_FLIGHT)),
+        "inferred_relationships": RELATIONSHIP_CACHE.stats()
+    })
+
+def search_vectors(state, query_embeddings, k=10, nprobe=None, ef_search=None, filters=None):
+    """(distances, labels) of the k nearest items for each row of `query_embeddings`, like index.search().
+
+    `filters` ({field: value}, see FILTER_FIELDS) are applied inside the FAISS
+    search through precomputed ID subsets, so the k results all match them.
+    Returns None when the filters match no item.
+    """
+    filter_rows = state.filters.matching_rows(filters) if filters and state.filters else None
+    if filter_rows is None:
+        search_params = make_search_params(state.index, nprobe=nprobe, ef_search=ef_search)
+        return state.index.search(query_embeddings, k, params=search_params)
+    if not len(filter_rows):
+        return None
+    return search_with_filter(state.index, query_embeddings, k, state.filters.item_ids[filter_rows],
+                              state.filters.id_selector(filters), nprobe=nprobe, ef_search=ef_search)
+
+def candidates_from_hits(state, distances, indices):
+    """Result rows for one query's FAISS hits, in FAISS order."""
+    candidates = []
     if indices.size > 0:
+        # FAISS returns DB ids (-1 for empty slots); map them to catalog rows
+        rows = state.catalog.rows_for_ids(indices)
         for i in range(len(indices)):
-            faiss_idx = indices[i]
-            if 0 <= faiss_idx < len(ALL_ITEMS_DATA):
-                result_item = ALL_ITEMS_DATA[faiss_idx].copy() 
-                # Remove the embedding_vector as it's bytes and not JSON serializable
-                if 'embedding_vector' in result_item:
-                    del result_item['embedding_vector']
-                result_item['similarity_score'] = float(1 / (1 + distances[i])) 
-                initial_search_results.append(result_item)
-
-    # 3. LLM Re-ranking (if enabled and results exist)
-    final_search_results = initial_search_results # Initialize with FAISS results
-    if llm_reranker and initial_search_results:
-        items_for_reranking_str = ""
-        for item in initial_search_results:
-            description = item.get('semantic_description', 'No description available.')
-            if not isinstance(description, str):
-                description = str(description)
-            
-            # Escape backslashes first, then double quotes to safely include in the prompt string
-            processed_description = description.replace('\\\\', '\\\\\\\\').replace('"', '\\\\"')
-
-            # Construct the item line for the prompt, ensuring the description is wrapped in escaped quotes
-            item_line = f"ID: {item['id']}, Description: \\\"{processed_description}\\\""
-            items_for_reranking_str += item_line + "\\n"
-
-        if items_for_reranking_str:
-            rerank_prompt_input = {
-                "user_query": query,
-                "items_for_reranking": items_for_reranking_str.strip()
-            }
-            
-            rerank_chat_prompt = ChatPromptTemplate.from_template(RERANK_PROMPT_TEMPLATE)
-            rerank_chain = rerank_chat_prompt | llm_reranker | StrOutputParser()
+            if rows[i] >= 0:
+                candidates.append(state.catalog.result_row(rows[i], float(1 / (1 + distances[i]))))
+    return candidates
 
-            try:
-                print(f"Invoking LLM for re-ranking {len(initial_search_results)} items for query: '{query}'...")
-                reranked_ids_str = rerank_chain.invoke(rerank_prompt_input)
-                print(f"LLM Re-ranker raw output: '{reranked_ids_str}'")
-
-                parsed_ids = []
-                if reranked_ids_str and isinstance(reranked_ids_str, str):
-                    for id_str_part in reranked_ids_str.split(','):
-                        cleaned_id_str = id_str_part.strip()
-                        if cleaned_id_str.isdigit():
-                            parsed_ids.append(int(cleaned_id_str))
-                
-                if parsed_ids:
-                    original_results_map = {item['id']: item for item in initial_search_results}
-                    reranked_results_temp = []
-                    ids_added_to_final_list = set() # Tracks IDs added to the final list to ensure uniqueness
-
-                    # Add items based on LLM's ranked order, ensuring uniqueness
-                    for item_id in parsed_ids:
-                        if item_id in original_results_map and item_id not in ids_added_to_final_list:
-                            reranked_results_temp.append(original_results_map[item_id])
-                            ids_added_to_final_list.add(item_id)
-                    
-                    # Add any remaining items from the initial search that weren't included (e.g. not in LLM list or were duplicates from LLM)
-                    for item in initial_search_results:
-                        if item['id'] not in ids_added_to_final_list:
-                            reranked_results_temp.append(item)
-                    
-                    final_search_results = reranked_results_temp
-                    print(f"Search results re-ranked by LLM. New order IDs: {[item['id'] for item in final_search_results]}")
-                else:
-                    print("LLM did not return valid IDs for re-ranking or output was empty. Using original FAISS order.")
+def retrieve_candidates(state, query_embedding_np, k=10, nprobe=None, ef_search=None, filters=None):
+    """Nearest catalog items to the query embedding, as result rows in FAISS order."""
+    if state.index is None or state.index.ntotal == 0:
+        print("Warning: FAISS index is None or empty.")
+        return []
+    hits = search_vectors(state, query_embedding_np, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+    if hits is None:
+        return []
+    distances, indices = hits
+    return candidates_from_hits(state, distances[0], indices[0])
 
-            except Exception as e:
-                print(f"Error during LLM re-ranking: {e}. Using original FAISS order.")
-        else:
-            print("No valid items to send for LLM re-ranking. Using original FAISS order.")
+def fuse_lexical_hits(state, query, vector_candidates, k=10, filters=None):
+    """Vector candidates fused with BM25 hits by reciprocal rank fusion, best first.
+
+    Items found only by BM25 (e.g. an exact column name the embedding missed)
+    have no similarity_score; every result carries its fusion_score.
+    """
+    if state.lexical is None:
+        return vector_candidates
+    filter_rows = state.filters.matching_rows(filters) if filters and state.filters else None
+    lexical_rows, lexical_scores = state.lexical.search(query, k=max(k, LEXICAL_CANDIDATES), allowed_rows=filter_rows)
+    if not len(lexical_rows):
+        return vector_candidates
+
+    candidates_by_id = {item['id']: item for item in vector_candidates}
+    lexical_ids = []
+    for row, score in zip(lexical_rows, lexical_scores):
+        item_id = state.catalog.ids[row]
+        if item_id not in candidates_by_id:
+            candidates_by_id[item_id] = state.catalog.result_row(row)
+        candidates_by_id[item_id]['lexical_score'] = float(score)
+        lexical_ids.append(item_id)
 
-    # Deduplicate final_search_results based on (object_type, object_name, parent_table_name)
+    # BM25 list first: on a fused-score tie the keyword hit wins, so exact names like `order_item_id` lead
+    fused = reciprocal_rank_fusion([lexical_ids, [item['id'] for item in vector_candidates]], k=RRF_K)
+    candidates = []
+    for item_id, fusion_score in fused[:k]:
+        candidates_by_id[item_id]['fusion_score'] = fusion_score
+        candidates.append(candidates_by_id[item_id])
+    return candidates
+
+def retrieve_hybrid_candidates(state, query, query_embedding_np, k=10, nprobe=None, ef_search=None, filters=None):
+    """FAISS candidates for the query fused with its BM25 hits (see fuse_lexical_hits)."""
+    vector_candidates = retrieve_candidates(state, query_embedding_np, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+    return fuse_lexical_hits(state, query, vector_candidates, k=k, filters=filters)
+
+def deduplicate_results(results):
+    """Deduplicates results based on (object_type, object_name, parent_table_name)."""
     deduplicated_results = []
     seen_entities = set()
-    for item in final_search_results:
+    for item in results:
         object_type = item.get('object_type')
         object_name = item.get('object_name')
         # Handle cases where parent_table_name might be None or missing for tables
@@ -284,46 +752,335 @@ def search():
         if entity_key not in seen_entities:
             deduplicated_results.append(item)
             seen_entities.add(entity_key)
-            
-    return jsonify({"results": deduplicated_results})
+    return deduplicated_results
+
+def is_stream_request(args):
+    return args.get('stream', 'false').lower() in ('true', '1', 'yes')
+
+def parse_flag(value, default):
+    """True/False from a query-string or JSON flag (true/false, 1/0, yes/no); `default` when absent, None when invalid."""
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in ('true', '1', 'yes'):
+        return True
+    if normalized in ('false', '0', 'no'):
+        return False
+    return None
+
+def parse_int_option(value, maximum, minimum=1):
+    """An int (or its decimal string) within minimum..maximum, else None."""
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            return None
+    if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= maximum:
+        return None
+    return value
+
+def parse_search_options(values):
+    """Validated "hybrid", "nprobe" and "ef_search" shared by /search (query string) and /search/batch (JSON body).
+
+    Returns (options, error message).
+    """
+    hybrid = parse_flag(values.get('hybrid'), default=True)
+    if hybrid is None:
+        return None, "hybrid must be true or false"
+    options = {"hybrid": hybrid}
+    # Optional recall/latency knobs for approximate indexes (ignored by exact Flat search)
+    for name, maximum in (('nprobe', SEARCH_MAX_NPROBE), ('ef_search', SEARCH_MAX_EF_SEARCH)):
+        value = values.get(name)
+        if value is None or value == '':
+            options[name] = None
+            continue
+        options[name] = parse_int_option(value, maximum)
+        if options[name] is None:
+            return None, f"{name} must be an integer between 1 and {maximum}"
+    return options, None
+
+def parse_search_args(args):
+    """Validated /search parameters from the query string; returns (params, error message)."""
+    query = args.get('query', '')
+    if not query:
+        return None, "Query parameter is required"
+    rerank_mode = args.get('rerank_mode', DEFAULT_RERANK_MODE)
+    if rerank_mode not in RERANK_MODES:
+        return None, f"rerank_mode must be one of {', '.join(RERANK_MODES)}"
+    # Pagination: page `offset // k` of the ranked results
+    k = parse_int_option(args.get('k', SEARCH_DEFAULT_K), SEARCH_MAX_K)
+    offset = parse_int_option(args.get('offset', 0), SEARCH_MAX_OFFSET, minimum=0)
+    if k is None or offset is None:
+        return None, f"k must be between 1 and {SEARCH_MAX_K} and offset between 0 and {SEARCH_MAX_OFFSET}"
+    # Optional tighter re-rank budget for this request (never above RERANK_LATENCY_BUDGET_MS)
+    rerank_budget_ms = parse_int_option(args.get('rerank_budget_ms', RERANK_LATENCY_BUDGET_MS), sys.maxsize, minimum=0)
+    if rerank_budget_ms is None:
+        return None, "rerank_budget_ms must be a non-negative integer"
+    options, error = parse_search_options(args)
+    if error:
+        return None, error
+    return {
+        "query": query,
+        **options,
+        "rerank_budget_ms": min(rerank_budget_ms, RERANK_LATENCY_BUDGET_MS),
+        "rerank_mode": rerank_mode,
+        "stream": is_stream_request(args),
+        "k": k,
+        "offset": offset,
+        "filters": {field: args.get(field) for field in FILTER_FIELDS if args.get(field)}
+    }, None
+
+def rank_candidates(state, params, query_embedding_np):
+    """The first offset + k ranked results: FAISS within the filters, fused with BM25 hits unless hybrid is off."""
+    depth = params['offset'] + params['k']
+    if params['hybrid']:
+        return retrieve_hybrid_candidates(state, params['query'], query_embedding_np, k=depth, nprobe=params['nprobe'],
+                                          ef_search=params['ef_search'], filters=params['filters'])
+    return retrieve_candidates(state, query_embedding_np, k=depth, nprobe=params['nprobe'], ef_search=params['ef_search'],
+                               filters=params['filters'])
+
+def search_response_body(state, params, ranked, final_search_results, reranked):
+    """The /search JSON body for one page of (re-ranked) results."""
+    depth = params['offset'] + params['k']
+    return {
+        "results": deduplicate_results(final_search_results), "reranked": reranked, "rerank_mode": params['rerank_mode'],
+        "hybrid": params['hybrid'] and state.lexical is not None, "filters": params['filters'],
+        "k": params['k'], "offset": params['offset'], "next_offset": depth if len(ranked) >= depth else None
+    }
+
+def ndjson_event(event, body=None):
+    """One line of a streaming /search response."""
+    return json.dumps(dict(body or {}, event=event)) + "\n"
+
+def search_error_event(message):
+    """The only line of a streaming /search that fails or has no index to search ("results" stays empty)."""
+    return ndjson_event("error", {"error": message, "results": []})
+
+def search_error(message, status, stream):
+    """An error answer of /search: {"error": message}, or a single NDJSON "error" event when streaming,
+    so a streaming client can parse every line of any answer it gets."""
+    if stream:
+        return Response(search_error_event(message), status=status, mimetype=NDJSON_MIMETYPE)
+    return jsonify({"error": message}), status
+
+def stream_search_events(state, params, ranked, candidates):
+    """Events of a streaming /search, as NDJSON lines.
+
+    "results" carries the retrieval order (with similarity_score) as soon as
+    it is known. "reranked" follows with the same items in re-ranked order
+    once the re-ranker answers (at most STREAM_RERANK_TIMEOUT_MS), and "done"
+    ends the stream.
+    """
+    yield ndjson_event("results", search_response_body(state, params, ranked, candidates, False))
+    if params['rerank_mode'] != 'none' and candidates:
+        final_search_results, reranked = rerank_results(params['query'], candidates, budget_ms=STREAM_RERANK_TIMEOUT_MS,
+                                                        mode=params['rerank_mode'])
+        if reranked:
+            yield ndjson_event("reranked", search_response_body(state, params, ranked, final_search_results, True))
+    yield ndjson_event("done")
+
+@app.route('/search', methods=['GET'])
+def search():
+    params, error = parse_search_args(request.args)
+    if error:
+        return search_error(error, 400, is_stream_request(request.args))
+    query = params['query']
+
+    state = INDEX_STATE # One consistent index/catalog pair for the whole request
+
+    if state.index is None or state.index.ntotal == 0:
+        if params['stream']:
+            return search_error(EMPTY_INDEX_MESSAGE, 200, stream=True)
+        return jsonify({"results": [], "message": EMPTY_INDEX_MESSAGE}), 200
+
+    # 1. Get embedding for the query (cached; concurrent misses are encoded together)
+    try:
+        query_embedding_np = QUERY_ENCODER.encode(query)
+    except Exception as e:
+        print(f"Error encoding query '{query}': {e}")
+        return search_error("Could not generate query embedding.", 500, params['stream'])
+
+    # 2. Search the FAISS index within the filters (fused with BM25 keyword hits unless hybrid=false)
+    ranked = rank_candidates(state, params, query_embedding_np)
+    initial_search_results = ranked[params['offset']:params['offset'] + params['k']]
+    if params['stream']:
+        # Send the vector hits now and the re-ranked order when it is ready
+        return Response(stream_search_events(state, params, ranked, initial_search_results), mimetype=NDJSON_MIMETYPE)
+
+    # 3. Re-ranking (LLM bounded by the latency budget, or the local cross-encoder)
+    final_search_results, reranked = rerank_results(query, initial_search_results, budget_ms=params['rerank_budget_ms'],
+                                                    mode=params['rerank_mode'])
+    return jsonify(search_response_body(state, params, ranked, final_search_results, reranked))
+
+def parse_batch_entry(entry):
+    """Normalizes one /search/batch entry (a query string or {"query", "k", filters...}); returns (spec, error)."""
+    if isinstance(entry, str):
+        entry = {"query": entry}
+    if not isinstance(entry, dict) or not isinstance(entry.get('query'), str) or not entry['query'].strip():
+        return None, "Each entry needs a non-empty 'query'"
+    k = entry.get('k', SEARCH_DEFAULT_K)
+    if not isinstance(k, int) or not 1 <= k <= SEARCH_MAX_K:
+        return None, f"k must be between 1 and {SEARCH_MAX_K}"
+    filters = {field: str(entry[field]) for field in FILTER_FIELDS if entry.get(field)}
+    return {"query": entry['query'], "k": k, "filters": filters}, None
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """Searches many queries in one request.
+
+    Body: {"queries": ["order_item_id", {"query": "customer email", "k": 5, "object_type": "column"}, ...]}
+    plus optional "hybrid", "rerank_mode" (default DEFAULT_BATCH_RERANK_MODE),
+    "nprobe" and "ef_search". All queries are embedded in one model.encode
+    call, and the queries sharing a filter set are searched with one matrix
+    index.search call. Results come back in input order; an invalid entry
+    gets an "error" instead of failing the whole batch.
+    """
+    payload = request.get_json(silent=True)
+    entries = payload.get('queries') if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "'queries' must be a non-empty list"}), 400
+    if len(entries) > SEARCH_BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch"}), 400
+    rerank_mode = payload.get('rerank_mode', DEFAULT_BATCH_RERANK_MODE)
+    if rerank_mode not in RERANK_MODES:
+        return jsonify({"error": f"rerank_mode must be one of {', '.join(RERANK_MODES)}"}), 400
+    options, error = parse_search_options(payload)
+    if error:
+        return jsonify({"error": error}), 400
+    hybrid, nprobe, ef_search = options['hybrid'], options['nprobe'], options['ef_search']
+
+    state = INDEX_STATE # One consistent index/catalog pair for the whole batch
+    parsed = [parse_batch_entry(entry) for entry in entries]
+    responses = [{"error": error} if error else {"query": spec['query']} for spec, error in parsed]
+    positions = [position for position, (spec, error) in enumerate(parsed) if spec is not None]
+    if state.index is None or state.index.ntotal == 0:
+        for position in positions:
+            responses[position]['results'] = []
+        return jsonify({"results": responses, "message": EMPTY_INDEX_MESSAGE}), 200
+    if not positions:
+        return jsonify({"results": responses, "rerank_mode": rerank_mode, "hybrid": hybrid and state.lexical is not None})
+
+    # 1. One encode call for every query that is not cached yet
+    try:
+        query_embeddings = QUERY_ENCODER.encode_many([parsed[position][0]['query'] for position in positions])
+    except Exception as e:
+        print(f"Error encoding a batch of {len(positions)} queries: {e}")
+        return jsonify({"error": "Could not generate query embeddings."}), 500
+
+    # 2. One FAISS search per distinct filter set, at the largest k in that group
+    groups = {}
+    for embedding_row, position in enumerate(positions):
+        filters_key = tuple(sorted(parsed[position][0]['filters'].items()))
+        groups.setdefault(filters_key, []).append((embedding_row, position))
+    for filters_key, members in groups.items():
+        filters = dict(filters_key)
+        group_k = max(parsed[position][0]['k'] for _, position in members)
+        hits = search_vectors(state, query_embeddings[[row for row, _ in members]], k=group_k,
+                              nprobe=nprobe, ef_search=ef_search, filters=filters)
+        for hit_row, (_, position) in enumerate(members):
+            spec = parsed[position][0]
+            if hits is None:
+                responses[position]['results'] = []
+                continue
+            candidates = candidates_from_hits(state, hits[0][hit_row][:spec['k']], hits[1][hit_row][:spec['k']])
+            if hybrid:
+                candidates = fuse_lexical_hits(state, spec['query'], candidates, k=spec['k'], filters=filters)
+            # 3. Optional re-ranking (off by default for batches)
+            candidates, reranked = rerank_results(spec['query'], candidates, mode=rerank_mode)
+            responses[position]['results'] = deduplicate_results(candidates)
+            responses[position]['reranked'] = reranked
+
+    return jsonify({"results": responses, "rerank_mode": rerank_mode, "hybrid": hybrid and state.lexical is not None})
+
+def get_db_pool():
+    """This process's connection pool, created on first use (and again in a forked child)."""
+    global db_pool, db_pool_pid
+    with db_pool_lock:
+        if db_pool is None or db_pool_pid != os.getpid():
+            db_pool = pooling.MySQLConnectionPool(pool_name=f"search_api_pool_{os.getpid()}",
+                                                  pool_size=max(1, min(DB_POOL_SIZE, 32)), **DB_CONFIG)
+            db_pool_pid = os.getpid()
+        return db_pool
+
+def load_relationships(known_version):
+    """(version, rows) of inferred_relationships for RELATIONSHIP_CACHE; rows is None while the version is unchanged.
+
+    The version is (row count, max created_at, max id), read in one cheap
+    aggregate query; the full listing is only fetched when it differs from `known_version`.
+    """
+    conn = None
+    with db_pool_slots:
+        try:
+            conn = get_db_pool().get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT COUNT(*) AS row_count, MAX(created_at) AS max_created_at, MAX(id) AS max_id FROM inferred_relationships")
+            row = cursor.fetchone()
+            version = (row['row_count'], row['max_created_at'], row['max_id'])
+            if version == known_version:
+                return version, None
+
+            cursor.execute("""
+                SELECT id, source_table, source_column, target_table, target_column, relationship_type, justification, llm_model_version, created_at
+                FROM inferred_relationships
+                WHERE source_table NOT IN (%s, %s)
+                  AND target_table NOT IN (%s, %s)
+            """, EXCLUDED_RELATIONSHIP_TABLES * 2)
+            relationships = cursor.fetchall()
+
+            # Convert datetime objects to string for JSON serialization
+            for rel in relationships:
+                if 'created_at' in rel and rel['created_at'] is not None:
+                    rel['created_at'] = rel['created_at'].isoformat()
+            print(f"Loaded {len(relationships)} inferred relationships (version {version}).")
+            return version, relationships
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close() # Returns the connection to the pool
 
 @app.route('/inferred-relationships', methods=['GET'])
 def get_inferred_relationships():
-    """Fetches all inferred relationships from the database."""
-    conn = None
+    """Lists inferred relationships, newest first.
+
+    Query parameters: `limit` (default RELATIONSHIPS_DEFAULT_LIMIT), `cursor`
+    (the previous page's `next_cursor`) and the filters source_table,
+    target_table and relationship_type. Pages come from RELATIONSHIP_CACHE,
+    and a request whose If-None-Match matches the page's ETag gets a 304.
+    """
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT id, source_table, source_column, target_table, target_column, relationship_type, justification, llm_model_version, created_at
-            FROM inferred_relationships
-            WHERE source_table NOT IN ('enriched_metadata', 'inferred_relationships')
-              AND target_table NOT IN ('enriched_metadata', 'inferred_relationships')
-            ORDER BY created_at DESC
-        """)
-        
-        relationships = cursor.fetchall()
-        
-        # Convert datetime objects to string for JSON serialization
-        for rel in relationships:
-            if 'created_at' in rel and rel['created_at'] is not None:
-                rel['created_at'] = rel['created_at'].isoformat()
-            
-        return jsonify({"relationships": relationships})
+        limit = int(request.args.get('limit', RELATIONSHIPS_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer."}), 400
+    if not 1 <= limit <= RELATIONSHIPS_MAX_LIMIT:
+        return jsonify({"error": f"'limit' must be between 1 and {RELATIONSHIPS_MAX_LIMIT}."}), 400
+    cursor = request.args.get('cursor') or None
+    if cursor:
+        try:
+            parse_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "Invalid 'cursor'."}), 400
+    filters = {field: request.args.get(field, '').strip() for field in RELATIONSHIP_FILTER_FIELDS}
 
+    try:
+        snapshot = RELATIONSHIP_CACHE.snapshot(load_relationships)
+        body, etag = snapshot.page(filters, limit, cursor)
     except mysql.connector.Error as err:
         print(f"Database error in get_inferred_relationships: {err}")
         return jsonify({"error": f"Database error: {err}"}), 500
     except Exception as e:
         print(f"Unexpected error in get_inferred_relationships: {e}")
         return jsonify({"error": f"Unexpected error: {e}"}), 500
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache' # Clients may keep the page but must revalidate it
+    return response.make_conditional(request) # 304 without a body when If-None-Match matches
 
 if __name__ == '__main__':
+    # Development server. For production use gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
     print("Flask API starting with FAISS and Sentence Transformers...")
     load_and_index_data()
-    app.run(debug=True, port=5001)
+    start_index_poller()
+    app.run(debug=True, use_reloader=False, port=5001, threaded=True) # The reloader would load the index a second time
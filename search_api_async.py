@@ -0,0 +1,169 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, request, jsonify
+import search_api
+from query_encoder import QUERY_ENCODE_TIMEOUT_SECONDS
+from rerank_cache import RerankCache
+from search_api import (build_rerank_chain, build_rerank_prompt_input, get_cross_encoder, get_llm_reranker,
+                        is_stream_request, ndjson_event, order_by_ids, parse_search_args, rank_candidates, rerank_results,
+                        search_error_event, search_response_body, store_llm_rerank, EMPTY_INDEX_MESSAGE,
+                        LLM_RERANK_MODEL_NAME, NDJSON_MIMETYPE, QUERY_ENCODER, RERANK_CACHE, RERANK_MAX_CONCURRENCY,
+                        RERANK_STATS, STREAM_RERANK_TIMEOUT_MS)
+
+# Async (ASGI) variant of the /search endpoint of search_api.py, with the same parameters and response.
+# Run with: hypercorn search_api_async:app --bind 127.0.0.1:5001
+# Requests never hold a thread while they wait: the query embedding is awaited on
+# QUERY_ENCODER's batching thread, CPU-bound FAISS / BM25 / cross-encoder work runs in
+# a small bounded pool, and the LLM re-rank is awaited with a timeout and cancellation.
+
+# --- Async Server Configuration ---
+ASYNC_CPU_WORKERS = 4 # Threads for FAISS search, BM25 fusion and the cross-encoder, shared by all in-flight requests
+ASYNC_LLM_TIMEOUT_SECONDS = 30 # An LLM re-rank still running after this long is cancelled
+CPU_EXECUTOR = ThreadPoolExecutor(max_workers=ASYNC_CPU_WORKERS, thread_name_prefix="search-cpu")
+LLM_RERANK_TASKS = {} # cache key -> asyncio.Task, so identical concurrent requests share one LLM call
+llm_rerank_slots = None # asyncio.Semaphore(RERANK_MAX_CONCURRENCY), created on the server's event loop
+
+app = Quart(__name__)
+
+@app.before_serving
+async def startup():
+    global llm_rerank_slots
+    llm_rerank_slots = asyncio.Semaphore(RERANK_MAX_CONCURRENCY)
+    await run_cpu(search_api.load_and_index_data)
+    search_api.init_worker()
+
+async def run_cpu(func, *args, **kwargs):
+    """Runs blocking, CPU-bound `func` on CPU_EXECUTOR and awaits its result."""
+    return await asyncio.get_running_loop().run_in_executor(CPU_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+async def encode_query(query):
+    """The query embedding from QUERY_ENCODER (cached / micro-batched), awaited without blocking a thread."""
+    return await asyncio.wait_for(asyncio.wrap_future(QUERY_ENCODER.submit(query)), QUERY_ENCODE_TIMEOUT_SECONDS)
+
+async def llm_rerank_ids_async(query, candidates, cache_key):
+    """Async counterpart of search_api.llm_rerank_ids(): awaits the LLM via ainvoke, at most ASYNC_LLM_TIMEOUT_SECONDS."""
+    rerank_prompt_input = build_rerank_prompt_input(query, candidates)
+    if rerank_prompt_input is None:
+        return None
+    async with llm_rerank_slots:
+        print(f"Invoking LLM for re-ranking {len(candidates)} items for query: '{query}'...")
+        RERANK_STATS["llm_calls"] += 1
+        try:
+            reranked_ids_str = await asyncio.wait_for(build_rerank_chain().ainvoke(rerank_prompt_input), ASYNC_LLM_TIMEOUT_SECONDS)
+        except Exception:
+            RERANK_STATS["llm_errors"] += 1
+            raise
+    return store_llm_rerank(reranked_ids_str, cache_key)
+
+def start_llm_rerank(query, candidates, cache_key):
+    """Starts (or joins) the LLM re-rank task for `cache_key`."""
+    task = LLM_RERANK_TASKS.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(llm_rerank_ids_async(query, candidates, cache_key))
+        LLM_RERANK_TASKS[cache_key] = task
+        task.add_done_callback(functools.partial(finish_llm_rerank, cache_key))
+    return task
+
+def finish_llm_rerank(cache_key, task):
+    LLM_RERANK_TASKS.pop(cache_key, None)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error during LLM re-ranking: {task.exception()}.")
+
+async def rerank_results_async(query, candidates, budget_ms, mode):
+    """Async counterpart of search_api.rerank_results(); returns (results, reranked).
+
+    The cross-encoder runs on CPU_EXECUTOR. The LLM re-rank is awaited for at
+    most `budget_ms`; the task is shielded so a timed-out (or disconnected)
+    request leaves it running to warm RERANK_CACHE, until ASYNC_LLM_TIMEOUT_SECONDS
+    cancels it.
+    """
+    if mode == 'none' or not candidates:
+        return candidates, False
+    if mode == 'cross_encoder':
+        if await run_cpu(get_cross_encoder) is not None:
+            return await run_cpu(rerank_results, query, candidates, budget_ms=budget_ms, mode='cross_encoder')
+        print("Cross-encoder unavailable. Falling back to the LLM re-ranker.")
+
+    if not get_llm_reranker():
+        return candidates, False
+    cache_key = RerankCache.make_key(query, [item['id'] for item in candidates], LLM_RERANK_MODEL_NAME)
+    cached_ids = RERANK_CACHE.get(cache_key)
+    if cached_ids is not None:
+        return order_by_ids(candidates, cached_ids), True
+
+    task = start_llm_rerank(query, candidates, cache_key)
+    try:
+        ordered_ids = await asyncio.wait_for(asyncio.shield(task), budget_ms / 1000.0)
+    except asyncio.TimeoutError:
+        RERANK_STATS["budget_timeouts"] += 1
+        print(f"LLM re-ranking exceeded the {budget_ms} ms budget for query '{query}'. Using original FAISS order; the re-rank continues in the background.")
+        return candidates, False
+    except Exception as e:
+        print(f"Error during LLM re-ranking: {e}. Using original FAISS order.")
+        return candidates, False
+    if not ordered_ids:
+        print("LLM did not return valid IDs for re-ranking or output was empty. Using original FAISS order.")
+        return candidates, False
+    return order_by_ids(candidates, ordered_ids), True
+
+def search_error(message, status, stream):
+    """Async counterpart of search_api.search_error()."""
+    if stream:
+        return app.response_class(search_error_event(message), status=status, mimetype=NDJSON_MIMETYPE)
+    return jsonify({"error": message}), status
+
+async def stream_search_events(state, params, ranked, candidates):
+    """Async counterpart of search_api.stream_search_events() (same NDJSON events)."""
+    yield ndjson_event("results", search_response_body(state, params, ranked, candidates, False))
+    if params['rerank_mode'] != 'none' and candidates:
+        final_search_results, reranked = await rerank_results_async(params['query'], candidates, STREAM_RERANK_TIMEOUT_MS,
+                                                                    params['rerank_mode'])
+        if reranked:
+            yield ndjson_event("reranked", search_response_body(state, params, ranked, final_search_results, True))
+    yield ndjson_event("done")
+
+@app.route('/search', methods=['GET'])
+async def search():
+    params, error = parse_search_args(request.args)
+    if error:
+        return search_error(error, 400, is_stream_request(request.args))
+    query = params['query']
+
+    state = search_api.INDEX_STATE # One consistent index/catalog pair for the whole request
+
+    if state.index is None or state.index.ntotal == 0:
+        if params['stream']:
+            return search_error(EMPTY_INDEX_MESSAGE, 200, stream=True)
+        return jsonify({"results": [], "message": EMPTY_INDEX_MESSAGE}), 200
+
+    # 1. Get embedding for the query (cached; concurrent misses are encoded together)
+    try:
+        query_embedding_np = await encode_query(query)
+    except Exception as e:
+        print(f"Error encoding query '{query}': {e}")
+        return search_error("Could not generate query embedding.", 500, params['stream'])
+
+    # 2. Search the FAISS index (plus BM25 fusion) on the bounded CPU pool
+    ranked = await run_cpu(rank_candidates, state, params, query_embedding_np)
+    initial_search_results = ranked[params['offset']:params['offset'] + params['k']]
+    if params['stream']:
+        # Send the vector hits now and the re-ranked order when it is ready
+        return app.response_class(stream_search_events(state, params, ranked, initial_search_results), mimetype=NDJSON_MIMETYPE)
+
+    # 3. Re-ranking, awaited without holding a thread
+    final_search_results, reranked = await rerank_results_async(query, initial_search_results, params['rerank_budget_ms'],
+                                                                params['rerank_mode'])
+    return jsonify(search_response_body(state, params, ranked, final_search_results, reranked))
+
+@app.route('/admin/stats', methods=['GET'])
+async def admin_stats():
+    """Cache and batching statistics of the search path."""
+    return jsonify({
+        "query_embeddings": QUERY_ENCODER.stats(),
+        "rerank": dict(RERANK_STATS, cache=RERANK_CACHE.stats(), in_flight=len(LLM_RERANK_TASKS))
+    })
+
+if __name__ == '__main__':
+    # Development server; for production: hypercorn search_api_async:app --bind 127.0.0.1:5001
+    app.run(port=5001)
@@ -5,6 +5,9 @@ import json
 # API endpoint
 API_URL = "http://127.0.0.1:5001/search"
 INFERRED_REL_API_URL = "http://127.0.0.1:5001/inferred-relationships"
+SEARCH_STREAM_TIMEOUT_SECONDS = 60 # Longest wait between streamed search events
+SEARCH_STREAM_MIMETYPE = "application/x-ndjson" # Content type of a streamed (one JSON event per line) search answer
+RELATIONSHIPS_PAGE_SIZE = 50 # Relationships per "Load more" page
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -35,6 +38,79 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def render_search_results(results_data):
+    """Renders search result cards; called again with the re-ranked order to replace them in place."""
+    for item in results_data:
+        with st.container():
+            st.markdown("---")
+            object_type_icon = "📄" if item.get('object_type') == 'column' else "📦"
+            parent_info = f"(Table: {item.get('parent_table_name')})" if item.get('parent_table_name') else ""
+            st.markdown(f"#### {object_type_icon} **{item.get('object_type', '').capitalize()}: {item.get('object_name', 'N/A')}** {parent_info}")
+            
+            st.caption(f"Description:")
+            st.markdown(f"> {item.get('semantic_description', '_No description available._')}")
+            
+            tags = item.get('tags', [])
+            if isinstance(tags, str):
+                try:
+                    tags = json.loads(tags)
+                except json.JSONDecodeError:
+                    tags = []
+            
+            if tags:
+                st.caption("Tags:")
+                tags_html = "".join([f"<span style='background-color: #f0f2f6; color: #333; border-radius: 0.25rem; padding: 0.2rem 0.5rem; margin-right: 0.3rem; font-size: 0.85em;'>{tag}</span>" for tag in tags])
+                st.markdown(tags_html, unsafe_allow_html=True)
+            else:
+                st.caption("Tags: _None_")
+            st.markdown("<br>", unsafe_allow_html=True) # Add a bit of space
+
+def search_events(response):
+    """The events of a /search?stream=true response, one JSON object per NDJSON line.
+
+    An answer that is not NDJSON (an older API, a proxy error page, a
+    pretty-printed JSON body) is read whole as a single event, and an error
+    status without a JSON "error" to show raises requests.HTTPError.
+    """
+    if response.headers.get("Content-Type", "").startswith(SEARCH_STREAM_MIMETYPE):
+        for line in response.iter_lines():
+            if line:
+                event = json.loads(line)
+                if response.status_code != 200 and "error" not in event:
+                    response.raise_for_status()
+                yield event
+        return
+    try:
+        body = response.json()
+    except ValueError:
+        response.raise_for_status()
+        raise
+    if response.status_code != 200 and not (isinstance(body, dict) and "error" in body):
+        response.raise_for_status()
+    yield body
+
+def fetch_relationships_page(cursor):
+    """One page of /inferred-relationships, revalidated with its ETag from st.session_state.
+
+    Pages are kept across reruns; an unchanged page costs the API a 304 with no body.
+    """
+    cached_pages = st.session_state.setdefault("relationship_pages", {}) # cursor -> (etag, data)
+    params = {"limit": RELATIONSHIPS_PAGE_SIZE}
+    if cursor:
+        params["cursor"] = cursor
+    headers = {}
+    if cursor in cached_pages:
+        headers["If-None-Match"] = f'"{cached_pages[cursor][0]}"'
+    response = requests.get(INFERRED_REL_API_URL, params=params, headers=headers)
+    if response.status_code == 304:
+        return cached_pages[cursor][1]
+    response.raise_for_status()
+    data = response.json()
+    etag = response.headers.get("ETag", "").strip('"')
+    if etag:
+        cached_pages[cursor] = (etag, data)
+    return data
+
 # --- Header ---
 st.image("https://cdn-icons-png.flaticon.com/512/2920/2920349.png", width=75) # New URL
 st.title("✨ AuraDB Semantic Catalog ✨")
@@ -72,55 +148,48 @@ with col1:
         if not search_query:
             st.warning("Please enter a search query.")
         else:
-            with st.spinner(f'Searching for: "{search_query}"...'):
-                try:
-                    response = requests.get(API_URL, params={"query": search_query})
-                    response.raise_for_status()
-                    search_results = response.json()
-
-                    if search_results and "results" in search_results:
-                        results_data = search_results["results"]
-                        if results_data:
-                            st.success(f"Found {len(results_data)} results:")
-                            for item in results_data:
-                                with st.container():
-                                    st.markdown("---")
-                                    object_type_icon = "📄" if item.get('object_type') == 'column' else "📦"
-                                    parent_info = f"(Table: {item.get('parent_table_name')})" if item.get('parent_table_name') else ""
-                                    st.markdown(f"#### {object_type_icon} **{item.get('object_type', '').capitalize()}: {item.get('object_name', 'N/A')}** {parent_info}")
-                                    
-                                    st.caption(f"Description:")
-                                    st.markdown(f"> {item.get('semantic_description', '_No description available._')}")
-                                    
-                                    tags = item.get('tags', [])
-                                    if isinstance(tags, str):
-                                        try:
-                                            tags = json.loads(tags)
-                                        except json.JSONDecodeError:
-                                            tags = []
-                                    
-                                    if tags:
-                                        st.caption("Tags:")
-                                        tags_html = "".join([f"<span style='background-color: #f0f2f6; color: #333; border-radius: 0.25rem; padding: 0.2rem 0.5rem; margin-right: 0.3rem; font-size: 0.85em;'>{tag}</span>" for tag in tags])
-                                        st.markdown(tags_html, unsafe_allow_html=True)
-                                    else:
-                                        st.caption("Tags: _None_")
-                                    st.markdown("<br>", unsafe_allow_html=True) # Add a bit of space
-                        else:
-                            st.info("No results found for your query.")
-                    elif search_results and "message" in search_results:
-                        st.info(search_results["message"]) 
-                    elif search_results and "error" in search_results:
-                        st.error(f"API Error: {search_results['error']}")
-                    else:
-                        st.error("Received an unexpected response from the API.")
-
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Error connecting to the search API: {e}")
-                except json.JSONDecodeError:
-                    st.error("Error: Could not decode the response from the API. The API might be down or returning invalid JSON.")
-                except Exception as e:
-                    st.error(f"An unexpected error occurred: {e}")
+            # Streamed search: the vector hits render as soon as they arrive, then the
+            # re-ranked order replaces them in place when the LLM answers
+            status_placeholder = st.empty()
+            results_placeholder = st.empty()
+            status_placeholder.info(f'Searching for: "{search_query}"...')
+            try:
+                with requests.get(API_URL, params={"query": search_query, "stream": "true"}, stream=True,
+                                  timeout=SEARCH_STREAM_TIMEOUT_SECONDS) as response:
+                    results_data = None
+                    reranked = False
+                    failed = False
+                    for event in search_events(response):
+                        if "error" in event:
+                            status_placeholder.error(f"API Error: {event['error']}")
+                            failed = True
+                            break
+                        if event.get("event") == "done":
+                            break
+                        if "results" not in event:
+                            continue
+                        # "results" (vector order), "reranked", or a plain non-streamed answer (e.g. empty index)
+                        results_data = event["results"]
+                        reranked = event.get("event") == "reranked"
+                        if not results_data:
+                            status_placeholder.info(event.get("message", "No results found for your query."))
+                            continue
+                        if event.get("event") == "results":
+                            status_placeholder.success(f"Found {len(results_data)} results. Re-ranking...")
+                        with results_placeholder.container():
+                            render_search_results(results_data)
+                    if results_data and not failed:
+                        suffix = " (re-ranked by relevance)" if reranked else ""
+                        status_placeholder.success(f"Found {len(results_data)} results{suffix}:")
+                    elif results_data is None and not failed:
+                        status_placeholder.error("Received an unexpected response from the API.")
+
+            except json.JSONDecodeError: # Before RequestException: requests' own JSONDecodeError subclasses both
+                status_placeholder.error("Error: Could not decode the response from the API. The API might be down or returning invalid JSON.")
+            except requests.exceptions.RequestException as e:
+                status_placeholder.error(f"Error connecting to the search API: {e}")
+            except Exception as e:
+                status_placeholder.error(f"An unexpected error occurred: {e}")
 
 with col2:
     if show_relationships:
@@ -128,12 +197,18 @@ with col2:
         st.markdown("Potential relationships inferred by the LLM.")
         try:
             with st.spinner("Fetching inferred relationships..."):
-                response = requests.get(INFERRED_REL_API_URL)
-                response.raise_for_status()
-                data = response.json()
-                relationships = data.get("relationships", [])
+                # Follow next_cursor for as many pages as "Load more" has asked for
+                page_count = st.session_state.setdefault("relationship_page_count", 1)
+                relationships = []
+                data = fetch_relationships_page(None)
+                relationships.extend(data.get("relationships", []))
+                while data.get("next_cursor") and page_count > 1:
+                    data = fetch_relationships_page(data["next_cursor"])
+                    relationships.extend(data.get("relationships", []))
+                    page_count -= 1
 
                 if relationships:
+                    st.caption(f"Showing {len(relationships)} of {data.get('total', len(relationships))} relationships.")
                     for rel in relationships:
                         with st.container():
                             st.markdown("---")
@@ -146,6 +221,9 @@ with col2:
                     st.error(f"API Error fetching relationships: {data['error']}")
                 else:
                     st.info("No inferred relationships found or the API returned an empty list.")
+            if data.get("next_cursor") and st.button("Load more relationships"):
+                st.session_state["relationship_page_count"] += 1
+                st.rerun()
 
         except requests.exceptions.RequestException as e:
             st.error(f"Error connecting to the API for inferred relationships: {e}")
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+import vector_index
+from catalog_filters import CatalogFilterIndex, table_schema
+from catalog_store import CatalogStore
+
+DIMENSION = 8
+
+def make_catalog(count=2000):
+    """Item i is a column of h1/sales.orders (even i) or h2/crm.customers (odd i); every tenth is tagged pii."""
+    catalog = CatalogStore()
+    for item_id in range(1, count + 1):
+        table_name = 'h1/sales.orders' if item_id % 2 == 0 else 'h2/crm.customers'
+        catalog.append(item_id, 'column', f'col_{item_id}', table_name, None, ['PII'] if item_id % 10 == 0 else [])
+    catalog.append(count + 1, 'table', 'h1/sales.orders', None, None, [])
+    return catalog
+
+def test_table_schema():
+    assert table_schema('h1/sales.orders') == 'sales'
+    assert table_schema('orders', default_schema='shop') == 'shop'
+
+def test_matching_rows_intersects_filters_case_insensitively():
+    catalog = make_catalog(20)
+    catalog.remove_ids([10])
+    filters = CatalogFilterIndex(catalog)
+
+    rows = filters.matching_rows({'schema': 'SALES', 'tag': 'pii', 'object_type': None})
+    assert filters.item_ids[rows].tolist() == [20] # 10 was removed
+    assert filters.item_ids[filters.matching_rows({'object_type': 'table'})].tolist() == [21]
+    assert filters.item_ids[filters.matching_rows({'schema': 'sales'})].tolist() == [2, 4, 6, 8, 12, 14, 16, 18, 20, 21]
+    assert not len(filters.matching_rows({'parent_table_name': 'nowhere'}))
+    assert filters.matching_rows({'tag': ''}) is None
+    with pytest.raises(ValueError):
+        filters.matching_rows({'color': 'red'})
+
+@pytest.mark.parametrize("index_type, exact_search_max_items", [('flat', 1024), ('flat', 0), ('ivf_flat', 1024)])
+def test_filtered_search_returns_k_matching_items(index_type, exact_search_max_items, monkeypatch):
+    monkeypatch.setattr(vector_index, "FILTER_EXACT_SEARCH_MAX_ITEMS", exact_search_max_items) # 0: always the selector
+    catalog = make_catalog()
+    ids = catalog.live_ids()
+    embeddings = np.random.default_rng(1).random((len(ids), DIMENSION), dtype=np.float32)
+    index = vector_index.build_faiss_index(embeddings, index_type=index_type, ids=ids)
+    filters = CatalogFilterIndex(catalog)
+    wanted = {'parent_table_name': 'h1/sales.orders', 'tag': 'pii'}
+    rows = filters.matching_rows(wanted)
+
+    distances, labels = vector_index.search_with_filter(index, embeddings[:3], 10, filters.item_ids[rows],
+                                                        filters.id_selector(wanted), nprobe=1)
+
+    assert labels.shape == (3, 10)
+    assert all(label % 10 == 0 for label in labels.ravel()) # Every hit is an even, pii-tagged item
+    assert (np.diff(distances, axis=1) >= 0).all()
@@ -0,0 +1,82 @@
+import json
+import os
+import pytest
+
+from catalog_io import (CatalogWriter, find_existing_catalog, iter_catalog_records, iter_catalog_table_records,
+                        read_catalog_fingerprints)
+
+def write_catalog(path, tables):
+    writer = CatalogWriter(path, header={"targets": []})
+    for name, fingerprint in tables.items():
+        writer.write_table(name, {"columns": [{"name": "id"}], "source": path}, fingerprint)
+    writer.close()
+    return writer
+
+@pytest.mark.parametrize("file_name", ["catalog.jsonl", "catalog.jsonl.gz"])
+def test_writer_round_trip(tmp_path, file_name):
+    path = str(tmp_path / file_name)
+    write_catalog(path, {"orders": "fp1", "customers": "fp2"})
+
+    records = list(iter_catalog_records(path))
+    assert [record["record_type"] for record in records] == ["header", "table", "table", "footer"]
+    assert records[-1]["table_count"] == 2
+    assert [(name, fingerprint) for name, _, fingerprint in iter_catalog_table_records(path)] == [
+        ("orders", "fp1"), ("customers", "fp2")]
+    assert not os.path.exists(path + ".tmp")
+
+def test_copy_skips_tables_already_written(tmp_path):
+    previous = str(tmp_path / "previous.jsonl")
+    write_catalog(previous, {"orders": "old", "customers": "fp2", "items": "fp3"})
+    path = str(tmp_path / "catalog.jsonl")
+
+    writer = CatalogWriter(path)
+    writer.write_table("orders", {"columns": [], "source": "fresh"}, "new")
+    copied = writer.copy_tables_from(previous, ["orders", "customers", "items"])
+    writer.close()
+
+    assert copied == 2
+    records = list(iter_catalog_table_records(path))
+    assert sorted(name for name, _, _ in records) == ["customers", "items", "orders"]
+    assert dict((name, info["source"]) for name, info, _ in records)["orders"] == "fresh"
+
+def test_aborted_writer_keeps_the_previous_catalog(tmp_path):
+    path = str(tmp_path / "catalog.jsonl")
+    write_catalog(path, {"orders": "fp1"})
+
+    writer = CatalogWriter(path)
+    writer.write_table("customers", {}, "fp2")
+    writer.abort()
+
+    assert [name for name, _, _ in iter_catalog_table_records(path)] == ["orders"]
+    assert not os.path.exists(path + ".tmp")
+
+def test_find_existing_catalog_finds_the_compressed_variant(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # The legacy fallback is a relative path
+    plain = str(tmp_path / "extracted_metadata.jsonl")
+    assert find_existing_catalog(plain) is None
+
+    write_catalog(plain + ".gz", {"orders": "fp1"})
+    assert find_existing_catalog(plain) == plain + ".gz"
+
+    write_catalog(plain, {"orders": "fp1"})
+    os.utime(plain + ".gz", (1, 1)) # The plain file is now the newer one
+    assert find_existing_catalog(plain + ".gz") == plain
+
+def test_find_existing_catalog_falls_back_to_the_legacy_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "extracted_metadata.json").write_text('{"tables": {}}')
+
+    assert find_existing_catalog("extracted_metadata.jsonl") == "extracted_metadata.json"
+
+def test_legacy_json_document_is_read_as_records(tmp_path):
+    path = str(tmp_path / "extracted_metadata.json")
+    with open(path, "w") as f:
+        json.dump({"database_name": "shop", "tables": {"orders": {"columns": []}, "customers": {"columns": []}},
+                   "fingerprints": {"orders": "fp1"}}, f)
+
+    records = list(iter_catalog_records(path))
+
+    assert records[0]["record_type"] == "header" and records[0]["database_name"] == "shop"
+    assert [(name, fingerprint) for name, _, fingerprint in iter_catalog_table_records(path)] == [
+        ("orders", "fp1"), ("customers", None)]
+    assert read_catalog_fingerprints(path) == {"orders": "fp1"}
@@ -0,0 +1,47 @@
+import numpy as np
+
+from catalog_store import CatalogStore, TOMBSTONE_ID
+
+ITEMS = [
+    {'id': 30, 'object_type': 'table', 'object_name': 'orders', 'parent_table_name': None,
+     'semantic_description': "Customer orders.", 'tags': '["sales", "orders"]'},
+    {'id': 10, 'object_type': 'column', 'object_name': 'order_id', 'parent_table_name': 'orders',
+     'semantic_description': "Order key.", 'tags': ['key']},
+    {'id': 20, 'object_type': 'column', 'object_name': 'total', 'parent_table_name': 'orders',
+     'semantic_description': "Order total.", 'tags': None},
+]
+
+def test_rows_for_ids_maps_labels_back_to_rows():
+    catalog = CatalogStore.from_items(ITEMS)
+
+    assert catalog.rows_for_ids([10, 30, 99, -1]).tolist() == [1, 0, -1, -1]
+    assert catalog.result_row(0, similarity_score=0.5) == {
+        'id': 30, 'object_type': 'table', 'object_name': 'orders', 'parent_table_name': None,
+        'semantic_description': "Customer orders.", 'tags': ('sales', 'orders'), 'similarity_score': 0.5}
+    assert catalog.tags[2] == ()
+    assert catalog.parent_table_names[1] is catalog.parent_table_names[2] # Repeated strings are interned
+
+def test_copy_on_write_updates_leave_the_original_untouched():
+    catalog = CatalogStore.from_items(ITEMS)
+    updated = catalog.copy()
+
+    updated.remove_ids([10])
+    updated.extend(CatalogStore.from_items([dict(ITEMS[1], id=40)]))
+
+    assert len(updated) == 4 and updated.live_count == 3 and updated.tombstones == 1
+    assert updated.ids[1] == TOMBSTONE_ID
+    assert updated.live_ids().tolist() == [30, 20, 40]
+    assert updated.rows_for_ids([10, 40]).tolist() == [-1, 3]
+    assert catalog.live_count == 3 and catalog.rows_for_ids([10]).tolist() == [1]
+
+def test_column_round_trip_keeps_only_live_rows():
+    catalog = CatalogStore.from_items(ITEMS)
+    catalog.remove_ids([20])
+
+    restored = CatalogStore.from_columns(catalog.to_columns())
+
+    assert restored.live_ids().tolist() == [30, 10]
+    assert [restored.result_row(row) for row in range(2)] == [catalog.result_row(row) for row in range(2)]
+
+def test_empty_store_lookup():
+    assert CatalogStore().rows_for_ids(np.array([1, 2])).tolist() == [-1, -1]
@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+
+for module in ("faiss", "flask", "mysql.connector", "sentence_transformers", "langchain_openai", "langchain_core"):
+    pytest.importorskip(module)
+
+import search_api
+from catalog_store import CatalogStore
+from vector_index import build_faiss_index, index_file_lock, index_file_version, load_saved_index, save_index
+
+DIMENSION = 8
+
+def make_catalog(ids):
+    catalog = CatalogStore()
+    for item_id in ids:
+        catalog.append(int(item_id), 'column', f'col_{item_id}', 'Orders', f'column number {item_id}', [])
+    catalog.build_id_lookup()
+    return catalog
+
+def embeddings_for(ids):
+    return np.stack([np.random.default_rng(int(item_id)).random(DIMENSION, dtype=np.float32) for item_id in ids])
+
+def signature_for(ids, max_embedded_at):
+    return {"item_count": len(ids), "max_id": int(max(ids)), "max_embedded_at": max_embedded_at}
+
+class FakeCursor:
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return {"oldest_pending_age": 1.5}
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def cursor(self, dictionary=False):
+        return FakeCursor()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+class FakeDatabase:
+    """The catalog as the poller sees it: the current signature and the rows embedded after a watermark."""
+
+    def __init__(self, ids, max_embedded_at):
+        self.ids = list(ids)
+        self.embedded_at = dict.fromkeys(self.ids, max_embedded_at)
+        self.max_embedded_at = max_embedded_at
+        self.delta_loads = 0
+
+    def add(self, item_id, embedded_at):
+        self.ids.append(item_id)
+        self.embedded_at[item_id] = embedded_at
+        self.max_embedded_at = max(self.embedded_at.values())
+
+    def signature(self, cursor, model_name):
+        return signature_for(self.ids, self.max_embedded_at)
+
+    def load_items(self, cursor, model_name, embedding_dim, embedded_after=None, include_ids=()):
+        self.delta_loads += 1
+        changed = [item_id for item_id in self.ids if self.embedded_at[item_id] > embedded_after or item_id in include_ids]
+        return embeddings_for(changed), make_catalog(changed)
+
+    def live_ids(self, cursor, model_name):
+        return np.array(self.ids, dtype=np.int64)
+
+@pytest.fixture
+def shared_worker(tmp_path, monkeypatch):
+    """A server worker with SHARE_INDEX_UPDATES on, serving the saved index of items 1-100."""
+    monkeypatch.chdir(tmp_path) # INDEX_FILE_PATH and its lock files are relative paths
+    ids = list(range(1, 101))
+    save_index(build_faiss_index(embeddings_for(ids), index_type='flat', ids=ids), make_catalog(ids),
+               signature_for(ids, '2025-01-01 00:00:00'))
+    file_version = index_file_version()
+    index, catalog, signature = load_saved_index()
+    catalog.build_id_lookup()
+    database = FakeDatabase(ids, '2025-01-01 00:00:00')
+    monkeypatch.setattr(search_api, "INDEX_STATE", search_api.make_index_state(index, catalog, signature, file_version))
+    monkeypatch.setattr(search_api, "SHARE_INDEX_UPDATES", True)
+    monkeypatch.setattr(search_api, "rejected_index_file_version", None)
+    monkeypatch.setattr(search_api.mysql.connector, "connect", lambda **kwargs: FakeConnection(), raising=False)
+    monkeypatch.setattr(search_api, "fetch_catalog_signature", database.signature)
+    monkeypatch.setattr(search_api, "load_catalog_items_from_db", database.load_items)
+    monkeypatch.setattr(search_api, "fetch_indexable_ids", database.live_ids)
+    monkeypatch.setattr(search_api, "get_embedding_dimension", lambda: DIMENSION)
+    return database
+
+def saved_ids():
+    index, _, _ = load_saved_index()
+    return sorted(search_api.faiss.vector_to_array(index.id_map).tolist())
+
+def test_update_is_saved_and_served_from_the_saved_file(shared_worker):
+    shared_worker.add(101, '2025-01-02 00:00:00')
+
+    result = search_api.refresh_index()
+
+    assert result == {"status": "updated", "items": 101}
+    assert saved_ids() == list(range(1, 102))
+    state = search_api.INDEX_STATE
+    assert state.file_version == index_file_version()
+    assert state.signature['max_embedded_at'] == '2025-01-02 00:00:00'
+    _, labels = state.index.search(embeddings_for([101]), 1)
+    assert labels[0, 0] == 101
+
+def test_worker_maps_an_update_saved_by_another_worker_without_applying_it_again(shared_worker):
+    ids = list(range(1, 103))
+    shared_worker.add(101, '2025-01-03 00:00:00')
+    shared_worker.add(102, '2025-01-03 00:00:00')
+    # Another worker already applied the change and saved the result
+    save_index(build_faiss_index(embeddings_for(ids), index_type='flat', ids=ids), make_catalog(ids),
+               signature_for(ids, '2025-01-03 00:00:00'))
+
+    result = search_api.refresh_index()
+
+    assert result == {"status": "unchanged", "items": 102}
+    assert shared_worker.delta_loads == 0
+    assert search_api.INDEX_STATE.file_version == index_file_version()
+
+def test_late_committed_row_with_an_old_embedded_at_is_added(shared_worker):
+    shared_worker.add(102, '2025-01-03 00:00:00')
+    search_api.refresh_index()
+    shared_worker.add(101, '2025-01-02 00:00:00') # Committed after the 2025-01-03 watermark was read
+
+    result = search_api.refresh_index()
+
+    assert result == {"status": "updated", "items": 102}
+    assert saved_ids() == list(range(1, 103))
+
+def test_refresh_skips_while_another_worker_holds_the_refresh_lock(shared_worker):
+    shared_worker.add(101, '2025-01-02 00:00:00')
+
+    with index_file_lock(search_api.INDEX_REFRESH_LOCK_PATH):
+        result = search_api.refresh_index(wait=False)
+
+    assert result["status"] == "busy"
+    assert shared_worker.delta_loads == 0
+    assert saved_ids() == list(range(1, 101))
+
+def test_older_saved_index_is_not_mapped(shared_worker):
+    ids = list(range(1, 51))
+    save_index(build_faiss_index(embeddings_for(ids), index_type='flat', ids=ids), make_catalog(ids),
+               signature_for(ids, '2024-12-31 00:00:00'))
+
+    with search_api.INDEX_UPDATE_LOCK:
+        assert not search_api.reload_saved_index()
+    assert search_api.INDEX_STATE.index.ntotal == 100
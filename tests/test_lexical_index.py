@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from catalog_store import CatalogStore
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize_identifier, tokenize_text
+
+ITEMS = [
+    (1, 'table', 'order_items', None, "Line items of every customer order.", ['sales']),
+    (2, 'column', 'order_item_id', 'order_items', "Primary key of an order line.", ['key']),
+    (3, 'column', 'customerEmail', 'customers', "E-mail address of the customer, e.g. jane@example.com.", ['pii']),
+    (4, 'column', 'unit_price', 'order_items', "Price per unit in EUR (Größe 2).", []),
+    (5, 'table', 'customers', None, None, ['crm', 'pii']),
+]
+
+def make_catalog(items):
+    catalog = CatalogStore()
+    for item in items:
+        catalog.append(*item)
+    return catalog
+
+def postings(lexical):
+    """{term: {row: (tf, score)}} for comparing indexes independently of term numbering."""
+    terms = {term_id: term for term, term_id in lexical.vocabulary.items()}
+    result = {}
+    for term_id, term in terms.items():
+        start, end = lexical.term_offsets[term_id], lexical.term_offsets[term_id + 1]
+        if end > start:
+            result[term] = {int(row): (round(float(freq), 4), round(float(score), 4)) for row, freq, score in zip(
+                lexical.posting_rows[start:end], lexical.posting_freqs[start:end], lexical.posting_scores[start:end])}
+    return result
+
+def test_identifier_tokens():
+    assert tokenize_identifier("order_item_id") == ('order_item_id', 'order', 'item', 'id')
+    assert tokenize_identifier("OrderItems") == ('orderitems', 'order', 'items')
+    assert tokenize_identifier("HTTPServer") == ('httpserver', 'http', 'server')
+
+def test_descriptions_are_tokenized_like_tokenize_text():
+    lexical = LexicalIndex(make_catalog(ITEMS))
+    term_postings = postings(lexical)
+    for row, item in enumerate(ITEMS):
+        for token in tokenize_text(item[4]):
+            assert row in term_postings[token]
+    assert 'gr' in lexical.vocabulary and 'e' in lexical.vocabulary # Non-ASCII letters split words, as with the regex
+    assert 'x' not in lexical.vocabulary and 'X' not in lexical.vocabulary # The description separator is never a term
+
+def test_exact_name_ranks_first():
+    lexical = LexicalIndex(make_catalog(ITEMS))
+    rows, scores = lexical.search("order_item_id", k=3)
+    assert rows[0] == 1
+    assert list(scores) == sorted(scores, reverse=True)
+    rows, _ = lexical.search("customerEmail")
+    assert rows[0] == 2
+
+def test_allowed_rows_restrict_results():
+    lexical = LexicalIndex(make_catalog(ITEMS))
+    rows, _ = lexical.search("order price", k=10, allowed_rows=np.array([3, 4]))
+    assert list(rows) == [3]
+    rows, _ = lexical.search("order", k=10, allowed_rows=np.array([], dtype=np.int64))
+    assert not len(rows)
+
+def test_unknown_terms_return_nothing():
+    rows, scores = LexicalIndex(make_catalog(ITEMS)).search("nonexistent")
+    assert not len(rows) and not len(scores)
+
+def test_live_update_reuses_previous_postings():
+    catalog = make_catalog(ITEMS)
+    previous = LexicalIndex(catalog)
+    updated = catalog.copy()
+    updated.remove_ids([2, 3])
+    updated.extend(make_catalog([(3, 'column', 'customer_email', 'customers', "Contact e-mail.", ['pii']),
+                                 (6, 'column', 'shipping_zone', 'shipments', "Destination zone code.", [])]))
+
+    incremental = LexicalIndex(updated, previous=previous)
+    assert postings(incremental) == postings(LexicalIndex(updated))
+    assert incremental.doc_count == 5
+    rows, _ = incremental.search("order_item_id")
+    assert 1 not in rows
+    assert incremental.search("shipping")[0][0] == 6
+    assert postings(previous) == postings(LexicalIndex(catalog)) # The previous index is left untouched
+
+def test_live_update_needs_the_previous_rows():
+    catalog = make_catalog(ITEMS)
+    with pytest.raises(ValueError):
+        LexicalIndex(make_catalog(ITEMS[:2]), previous=LexicalIndex(catalog))
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['b', 'd']], k=60)
+    assert [key for key, _ in fused] == ['b', 'a', 'd', 'c']
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
@@ -0,0 +1,40 @@
+from llm_cache import LLMResponseCache
+
+def test_key_depends_on_model_template_and_inputs():
+    key = LLMResponseCache.make_key("model", "template {x}", {"x": 1, "y": 2})
+    assert key == LLMResponseCache.make_key("model", "template {x}", {"y": 2, "x": 1})
+    assert key != LLMResponseCache.make_key("other-model", "template {x}", {"x": 1, "y": 2})
+    assert key != LLMResponseCache.make_key("model", "template {y}", {"x": 1, "y": 2})
+    assert key != LLMResponseCache.make_key("model", "template {x}", {"x": 1, "y": 3})
+
+def test_responses_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = LLMResponseCache(path)
+    key = cache.make_key("model", "t", {"x": 1})
+    assert cache.get(key) is None
+    cache.put(key, "model", "Description: cached")
+    cache.close()
+
+    reopened = LLMResponseCache(path)
+    assert reopened.get(key) == "Description: cached"
+    assert reopened.stats()["entries"] == 1
+    reopened.invalidate(key)
+    assert reopened.get(key) is None
+    assert reopened.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "evictions": 0, "entries": 0}
+    reopened.close()
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("llm_cache.time.time", lambda: now[0])
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, "model", key.upper())
+        now[0] += 1
+    cache.get("a") # "b" is now the least recently used
+    now[0] += 1
+    cache.put("c", "model", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+    cache.close()
@@ -0,0 +1,263 @@
+import pytest
+
+pytest.importorskip("mysql.connector")
+pytest.importorskip("openai")
+pytest.importorskip("langchain_openai")
+pytest.importorskip("langchain_core")
+
+import llm_enrichment
+from catalog_io import CatalogWriter
+
+TABLES = {
+    "Customers": {"columns": [{"name": "customer_id", "column_type": "int"}, {"name": "email", "column_type": "varchar(255)"}],
+                  "sample_data": [{"customer_id": 1, "email": "a@example.com"}]},
+    "Orders": {"columns": [{"name": "order_id", "column_type": "int"}], "sample_data": []},
+}
+
+class RecordingCache:
+    """Stands in for LLMResponseCache: never hits, records whether it was closed."""
+    instances = []
+
+    def __init__(self):
+        self.closed = False
+        RecordingCache.instances.append(self)
+
+    def make_key(self, *args):
+        return None
+
+    def get(self, key):
+        return None
+
+    def put(self, *args):
+        pass
+
+    def print_stats(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+def fake_llm_output(chain, prompt_input, rate_limiter, label, cache=None, prompt_template=None):
+    if prompt_template == llm_enrichment.BATCH_COLUMN_PROMPT_TEMPLATE:
+        names = [line.split(":", 1)[1].strip() for line in prompt_input["columns_block"].splitlines()
+                 if line.startswith("- Column Name:")]
+        return "\n".join(f"Column: {name}\nDescription: about {name}\nTags: t" for name in names)
+    return "Description: a table\nTags: t1, t2"
+
+@pytest.fixture
+def enrichment_run(tmp_path, monkeypatch):
+    catalog_path = str(tmp_path / "extracted_metadata.jsonl")
+    writer = CatalogWriter(catalog_path)
+    for table_name, table_info in TABLES.items():
+        writer.write_table(table_name, table_info)
+    writer.close()
+
+    stored = []
+    RecordingCache.instances = []
+
+    def store(object_type, object_name, parent_table_name, **kwargs):
+        stored.append((object_type, object_name, parent_table_name))
+        return True
+
+    monkeypatch.setattr(llm_enrichment, "METADATA_FILE_PATH", catalog_path)
+    monkeypatch.setattr(llm_enrichment, "INCREMENTAL_ENRICHMENT", False)
+    monkeypatch.setattr(llm_enrichment, "LLMResponseCache", RecordingCache)
+    monkeypatch.setattr(llm_enrichment, "get_llm_instance", lambda: (lambda prompt: prompt))
+    monkeypatch.setattr(llm_enrichment, "invoke_with_backoff", fake_llm_output)
+    monkeypatch.setattr(llm_enrichment, "store_enriched_metadata", store)
+    return stored
+
+def test_main_enriches_every_table_and_column_and_reports_rate(enrichment_run, capsys):
+    llm_enrichment.main()
+
+    assert sorted(enrichment_run) == sorted([
+        ("table", "Customers", None), ("column", "customer_id", "Customers"), ("column", "email", "Customers"),
+        ("table", "Orders", None), ("column", "order_id", "Orders"),
+    ])
+    output = capsys.readouterr().out
+    assert "Enriched 5 items (0 skipped or failed)" in output
+    assert "items/sec" in output
+    assert RecordingCache.instances[0].closed
+
+@pytest.mark.parametrize("mode", ["per_column", "batch"])
+def test_embedding_column_is_skipped_without_counting_as_failed(enrichment_run, monkeypatch, capsys, mode):
+    monkeypatch.setattr(llm_enrichment, "COLUMN_ENRICHMENT_MODE", mode)
+    catalog_path = llm_enrichment.METADATA_FILE_PATH
+    writer = CatalogWriter(catalog_path)
+    writer.write_table("Orders", {"columns": [{"name": "order_id"}, {"name": "embedding_vector"}], "sample_data": []})
+    writer.close()
+
+    llm_enrichment.main()
+
+    assert sorted(enrichment_run) == [("column", "order_id", "Orders"), ("table", "Orders", None)]
+    assert "Enriched 2 items (0 skipped or failed)" in capsys.readouterr().out
+
+def test_rows_that_fail_to_store_are_counted_as_failed(enrichment_run, monkeypatch, capsys):
+    monkeypatch.setattr(llm_enrichment, "COLUMN_ENRICHMENT_MODE", "batch")
+    monkeypatch.setattr(llm_enrichment, "store_enriched_metadata",
+                        lambda object_type, object_name, parent_table_name, **kwargs: object_name != "email")
+
+    llm_enrichment.main()
+
+    assert "Enriched 4 items (1 skipped or failed)" in capsys.readouterr().out
+
+def test_main_closes_cache_when_enrichment_fails(enrichment_run, monkeypatch):
+    def failing_iter(path):
+        raise RuntimeError("catalog vanished")
+        yield
+    monkeypatch.setattr(llm_enrichment, "iter_catalog_tables", failing_iter)
+
+    with pytest.raises(RuntimeError):
+        llm_enrichment.main()
+    assert RecordingCache.instances[0].closed
+
+def test_changed_tables_keep_their_rows_until_the_new_ones_are_stored(enrichment_run, monkeypatch):
+    events = []
+    monkeypatch.setattr(llm_enrichment, "INCREMENTAL_ENRICHMENT", True)
+    monkeypatch.setattr(llm_enrichment, "load_changes",
+                        lambda: {"added": [], "changed": ["Customers"], "dropped": ["Legacy"]})
+    monkeypatch.setattr(llm_enrichment, "fetch_last_enriched_id", lambda: 41)
+    monkeypatch.setattr(llm_enrichment, "delete_enriched_metadata_for_tables",
+                        lambda table_names: events.append(("delete", list(table_names))))
+    monkeypatch.setattr(llm_enrichment, "delete_replaced_enriched_metadata",
+                        lambda table_name, column_names, last_old_id: events.append(
+                            ("replace", table_name, list(column_names), last_old_id, len(enrichment_run))))
+
+    llm_enrichment.main()
+
+    assert events[0] == ("delete", ["Legacy"]) # Dropped tables still go up front, changed ones do not
+    assert events[1:] == [("replace", "Customers", ["customer_id", "email"], 41, 3)] # After all 3 of its rows were stored
+    assert sorted(enrichment_run) == sorted([
+        ("table", "Customers", None), ("column", "customer_id", "Customers"), ("column", "email", "Customers"),
+    ])
+
+class RecordingConnection:
+    """Stands in for a mysql.connector connection, recording statements and commits."""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        self.statements.append((" ".join(sql.split()), tuple(params)))
+        self.rowcount = 1
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+def test_replacing_a_table_deletes_superseded_and_vanished_rows_in_one_transaction(monkeypatch):
+    conn = RecordingConnection()
+    monkeypatch.setattr(llm_enrichment.mysql.connector, "connect", lambda **config: conn)
+
+    llm_enrichment.delete_replaced_enriched_metadata("Customers", ["customer_id", "email"], 41)
+
+    assert conn.commits == 1
+    (superseded_sql, superseded_params), (vanished_sql, vanished_params) = conn.statements
+    assert "new.id > %s" in superseded_sql and "old.id <= %s" in superseded_sql
+    assert superseded_params == (41, 41, "Customers", "Customers")
+    assert "NOT IN (%s, %s)" in vanished_sql
+    assert vanished_params == (41, "Customers", "customer_id", "email")
+
+class ThrottledError(Exception):
+    status_code = 429
+
+class FlakyChain:
+    """A chain that fails with the given errors before answering."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke(self, prompt_input):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "Description: ok\nTags: t"
+
+def test_rate_limiter_backs_off_on_throttle_and_recovers_on_success():
+    limiter = llm_enrichment.AdaptiveRateLimiter(min_interval=0.0, max_interval=4.0, initial_backoff=1.0)
+
+    limiter.on_throttle()
+    assert limiter.interval == 1.0
+    limiter.on_throttle()
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.interval == 4.0 # Capped at max_interval
+    assert limiter.throttle_events == 4
+
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.interval == 0.0
+
+def test_invoke_retries_throttling_errors_only(monkeypatch):
+    monkeypatch.setattr(llm_enrichment, "LLM_MAX_RETRIES", 2)
+    limiter = llm_enrichment.AdaptiveRateLimiter(initial_backoff=0.001, max_interval=0.001)
+
+    chain = FlakyChain(ThrottledError(), ThrottledError())
+    assert llm_enrichment.invoke_with_backoff(chain, {}, limiter, "t") == "Description: ok\nTags: t"
+    assert chain.calls == 3 and limiter.throttle_events == 2
+
+    chain = FlakyChain(ThrottledError(), ThrottledError(), ThrottledError())
+    with pytest.raises(ThrottledError):
+        llm_enrichment.invoke_with_backoff(chain, {}, limiter, "t") # Out of retries
+    assert chain.calls == 3
+
+    chain = FlakyChain(ValueError("bad prompt"))
+    with pytest.raises(ValueError):
+        llm_enrichment.invoke_with_backoff(chain, {}, limiter, "t")
+    assert chain.calls == 1
+
+def test_parse_batch_output_tolerates_markdown_and_ignores_unknown_columns():
+    output = """**Column:** `customer_id`
+- **Description:** Unique id of a customer.
+- **Tags:** [key, customer]
+Column: surprise
+Description: not asked for
+Column: email
+Tags: pii
+"""
+    assert llm_enrichment.parse_batch_llm_output(output, {"customer_id", "email"}) == {
+        "customer_id": ("Unique id of a customer.", ["key", "customer"]),
+    } # email came back without a description, so it is left for the per-column fallback
+
+def test_column_batch_falls_back_to_single_prompts_for_missing_columns(enrichment_run, monkeypatch):
+    prompts = []
+
+    def partial_llm_output(chain, prompt_input, rate_limiter, label, cache=None, prompt_template=None):
+        prompts.append(prompt_template)
+        if prompt_template == llm_enrichment.BATCH_COLUMN_PROMPT_TEMPLATE:
+            return "Column: customer_id\nDescription: the id\nTags: key"
+        return "Description: one column\nTags: t"
+    monkeypatch.setattr(llm_enrichment, "invoke_with_backoff", partial_llm_output)
+
+    columns = TABLES["Customers"]["columns"]
+    stored_count = llm_enrichment.process_column_batch(None, "Customers", columns, ["customer_id", "email"], [])
+
+    assert stored_count == 2
+    assert prompts == [llm_enrichment.BATCH_COLUMN_PROMPT_TEMPLATE, llm_enrichment.COLUMN_PROMPT_TEMPLATE]
+    assert sorted(enrichment_run) == [("column", "customer_id", "Customers"), ("column", "email", "Customers")]
+
+def test_cached_response_skips_the_llm(tmp_path):
+    cache = llm_enrichment.LLMResponseCache(str(tmp_path / "cache.sqlite"))
+    chain = FlakyChain()
+    prompt_input = {"table_name": "Customers"}
+
+    first = llm_enrichment.invoke_with_backoff(chain, prompt_input, None, "t", cache=cache,
+                                               prompt_template=llm_enrichment.TABLE_PROMPT_TEMPLATE)
+    second = llm_enrichment.invoke_with_backoff(chain, prompt_input, None, "t", cache=cache,
+                                                prompt_template=llm_enrichment.TABLE_PROMPT_TEMPLATE)
+
+    assert first == second and chain.calls == 1
+    cache.close()
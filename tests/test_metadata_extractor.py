@@ -0,0 +1,230 @@
+import pytest
+
+pytest.importorskip("mysql.connector")
+
+import metadata_extractor
+from catalog_io import CatalogWriter, iter_catalog_table_records
+
+SCHEMA = {
+    "customers": {
+        "columns": [("customer_id", "int", "int", "NO", "PRI", "auto_increment"),
+                    ("email", "varchar", "varchar(255)", "YES", "", "")],
+        "foreign_keys": [],
+        "rows": [{"customer_id": 1, "email": "a@example.com"}],
+    },
+    "orders": {
+        "columns": [("order_id", "int", "int", "NO", "PRI", ""), ("customer_id", "int", "int", "NO", "MUL", "")],
+        "foreign_keys": [("fk_orders_customer", "customer_id", "customers", "customer_id")],
+        "rows": [{"order_id": 7, "customer_id": 1}],
+    },
+    "tmp_orders": {"columns": [("id", "int", "int", "NO", "PRI", "")], "foreign_keys": [], "rows": []},
+}
+
+class SchemaCursor:
+    """A dictionary cursor answering the extractor's queries from SCHEMA (database "shop")."""
+
+    def __init__(self, schema=SCHEMA):
+        self.schema = schema
+        self.queries = []
+        self.result = []
+
+    def execute(self, sql, params=()):
+        self.queries.append(" ".join(sql.split()))
+        if sql.startswith("SHOW TABLES"):
+            self.result = [{"Tables_in_shop": name} for name in self.schema]
+        elif "information_schema.columns" in sql:
+            tables = [params[1]] if len(params) > 1 else list(self.schema)
+            self.result = [dict(zip(("TABLE_NAME", "COLUMN_NAME", "DATA_TYPE", "COLUMN_TYPE", "IS_NULLABLE", "COLUMN_KEY", "EXTRA"),
+                                    (name,) + column)) for name in tables for column in self.schema[name]["columns"]]
+        elif "KEY_COLUMN_USAGE" in sql:
+            tables = [params[1]] if len(params) > 1 else list(self.schema)
+            self.result = [dict(zip(("TABLE_NAME", "CONSTRAINT_NAME", "COLUMN_NAME", "REFERENCED_TABLE_NAME", "REFERENCED_COLUMN_NAME"),
+                                    (name,) + fk)) for name in tables for fk in self.schema[name]["foreign_keys"]]
+        elif sql.startswith("SELECT * FROM"):
+            table_name = sql.split("`.`")[1].split("`")[0]
+            self.result = [dict(row) for row in self.schema[table_name]["rows"]]
+        else:
+            self.result = []
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+    def sample_queries(self):
+        return [query for query in self.queries if query.startswith("SELECT * FROM")]
+
+class FakeConnection:
+    def cursor(self, dictionary=False):
+        return self
+
+    def close(self):
+        pass
+
+class FakePool:
+    pool_size = 2
+
+    def get_connection(self):
+        return FakeConnection()
+
+def fake_extract_schema(cursor, db_name, previous_metadata=None, mode=None, include_patterns=None,
+                        exclude_patterns=None, include_sample_data=True, on_table=None):
+    """Host "a" has an unchanged table x; host "b" streams orders (changed) and customers (unchanged), then fails."""
+    if db_name == 'a':
+        return {"database_name": "a", "tables": {}, "fingerprints": {"x": "fx"},
+                "changes": {"added": [], "changed": [], "dropped": [], "unchanged": ["x"]}}
+    on_table("orders", {"columns": [], "source": "fresh"}, "new")
+    on_table("customers", {"columns": [], "source": "fresh"}, "fc")
+    raise RuntimeError("connection lost")
+
+@pytest.fixture
+def targets(monkeypatch):
+    monkeypatch.setattr(metadata_extractor, "create_connection_pools", lambda targets: {"a": FakePool(), "b": FakePool()})
+    monkeypatch.setattr(metadata_extractor, "extract_schema", fake_extract_schema)
+    return [("a", "a"), ("b", "b")]
+
+def test_failed_target_keeps_streamed_tables_once(tmp_path, targets):
+    previous_fingerprints = {"a/a.x": "fx", "b/b.orders": "old", "b/b.customers": "fc", "b/b.items": "fi"}
+    previous_path = str(tmp_path / "previous.jsonl")
+    previous_writer = CatalogWriter(previous_path)
+    for name, fingerprint in previous_fingerprints.items():
+        previous_writer.write_table(name, {"columns": [], "source": "previous"}, fingerprint)
+    previous_writer.close()
+    path = str(tmp_path / "catalog.jsonl")
+    writer = CatalogWriter(path)
+
+    catalog = metadata_extractor.extract_catalog(targets, {"path": previous_path, "fingerprints": previous_fingerprints},
+                                                 on_table=writer.write_table)
+    writer.copy_tables_from(previous_path, catalog["changes"]["unchanged"])
+    writer.close()
+
+    assert [report["status"] for report in catalog["target_reports"]] == ["ok", "error"]
+    assert catalog["changes"]["changed"] == ["b/b.orders"]
+    assert sorted(catalog["changes"]["unchanged"]) == ["a/a.x", "b/b.customers", "b/b.items"]
+    assert catalog["fingerprints"]["b/b.orders"] == "new"
+    sources = {}
+    for name, info, _ in iter_catalog_table_records(path):
+        assert name not in sources, f"{name} written twice"
+        sources[name] = info["source"]
+    assert sources == {"b/b.orders": "fresh", "b/b.customers": "fresh", "a/a.x": "previous", "b/b.items": "previous"}
+
+def test_fingerprint_covers_structure_but_not_sample_data():
+    table_info = metadata_extractor.fetch_table_structure(SchemaCursor(), "shop", "orders")
+    fingerprint = metadata_extractor.compute_table_fingerprint(table_info)
+
+    assert metadata_extractor.compute_table_fingerprint({**table_info, "sample_data": [{"order_id": 8}]}) == fingerprint
+    retyped = {**table_info, "columns": [{**table_info["columns"][0], "column_type": "bigint"}] + table_info["columns"][1:]}
+    assert metadata_extractor.compute_table_fingerprint(retyped) != fingerprint
+    assert metadata_extractor.compute_table_fingerprint({**table_info, "foreign_keys": []}) != fingerprint
+
+def test_diff_fingerprints():
+    changes = metadata_extractor.diff_fingerprints({"a": "1", "b": "2", "c": "3"}, {"a": "1", "b": "changed", "d": "4"})
+    assert changes == {"added": ["d"], "changed": ["b"], "dropped": ["c"], "unchanged": ["a"]}
+    assert metadata_extractor.diff_fingerprints(None, {"a": "1"})["added"] == ["a"]
+
+def test_unchanged_tables_reuse_their_previous_sample_data():
+    first = metadata_extractor.extract_schema(SchemaCursor(), "shop", mode="bulk")
+    previous = {"tables": {name: {**info, "sample_data": [{"kept": True}]} for name, info in first["tables"].items()},
+                "fingerprints": dict(first["fingerprints"], orders="outdated", gone="x")}
+    cursor = SchemaCursor()
+
+    second = metadata_extractor.extract_schema(cursor, "shop", previous_metadata=previous, mode="bulk")
+
+    assert second["changes"] == {"added": [], "changed": ["orders"], "dropped": ["gone"], "unchanged": ["customers", "tmp_orders"]}
+    assert second["tables"]["customers"]["sample_data"] == [{"kept": True}]
+    assert second["tables"]["orders"]["sample_data"] == [{"order_id": 7, "customer_id": 1}]
+    assert cursor.sample_queries() == ["SELECT * FROM `shop`.`orders` LIMIT 5"]
+
+def test_bulk_extraction_matches_per_table_with_a_fixed_number_of_queries():
+    bulk_cursor, per_table_cursor = SchemaCursor(), SchemaCursor()
+
+    bulk = metadata_extractor.extract_schema(bulk_cursor, "shop", mode="bulk", include_sample_data=False)
+    per_table = metadata_extractor.extract_schema(per_table_cursor, "shop", mode="per_table", include_sample_data=False)
+
+    assert bulk["tables"] == per_table["tables"]
+    assert bulk["fingerprints"] == per_table["fingerprints"]
+    assert bulk["tables"]["orders"]["primary_keys"] == ["order_id"]
+    assert bulk["tables"]["orders"]["foreign_keys"] == [{"constraint_name": "fk_orders_customer", "column_name": "customer_id",
+                                                         "references_table": "customers", "references_column": "customer_id"}]
+    assert len(bulk_cursor.queries) == 3 # SHOW TABLES, all columns, all foreign keys
+    assert len(per_table_cursor.queries) == 1 + 2 * len(SCHEMA)
+
+def test_table_patterns_limit_extraction():
+    metadata = metadata_extractor.extract_schema(SchemaCursor(), "shop", mode="bulk", include_sample_data=False,
+                                                 include_patterns=["*orders"], exclude_patterns=["tmp_*"])
+    assert list(metadata["tables"]) == ["orders"]
+
+class SchemaConnection:
+    def cursor(self, dictionary=False):
+        return SchemaCursor()
+
+    def close(self):
+        pass
+
+class SchemaPool:
+    pool_size = 2
+
+    def get_connection(self):
+        return SchemaConnection()
+
+def test_targets_are_extracted_into_one_namespaced_catalog(monkeypatch):
+    monkeypatch.setattr(metadata_extractor, "create_connection_pools", lambda targets: {"h1": SchemaPool(), "h2": SchemaPool()})
+    previous = {"fingerprints": {"old-host/shop.customers": "x"}}
+
+    catalog = metadata_extractor.extract_catalog([("h1", "shop"), ("h2", "shop")], previous, mode="bulk",
+                                                 include_patterns=[], exclude_patterns=[], include_sample_data=False)
+
+    assert sorted(catalog["tables"]) == sorted(f"{host}/shop.{name}" for host in ("h1", "h2") for name in SCHEMA)
+    assert [report["target"] for report in catalog["target_reports"]] == ["h1/shop", "h2/shop"]
+    assert all(report["status"] == "ok" and report["table_count"] == len(SCHEMA) for report in catalog["target_reports"])
+    assert catalog["changes"]["dropped"] == ["old-host/shop.customers"] # Its target is no longer listed
+    assert len(catalog["changes"]["added"]) == 2 * len(SCHEMA)
+
+class ProfileCursor:
+    """Answers profile_table()'s aggregate and top-k queries with canned rows."""
+
+    def __init__(self, stats, top_rows):
+        self.stats = stats
+        self.top_rows = top_rows
+        self.queries = []
+
+    def execute(self, sql, params=()):
+        self.queries.append(" ".join(sql.split()))
+
+    def fetchone(self):
+        return self.stats
+
+    def fetchall(self):
+        return self.top_rows
+
+def test_profile_table_fills_column_profiles_from_aggregates():
+    table_info = {"columns": [{"name": "id", "data_type": "int"}, {"name": "name", "data_type": "varchar"},
+                              {"name": "photo", "data_type": "blob"}]}
+    cursor = ProfileCursor(
+        {"row_count": 4, "c0_nulls": 0, "c0_distinct": 4, "c0_min": 1, "c0_max": 4,
+         "c1_nulls": 1, "c1_distinct": 2, "c1_min": "Ann", "c1_max": "Bob",
+         "c1_avg_len": 3.0, "c1_min_len": 3, "c1_max_len": 3, "c2_nulls": 2},
+        [{"col_idx": 1, "value": "Ann", "freq": 2}, {"col_idx": 1, "value": "Bob", "freq": 1}])
+
+    metadata_extractor.profile_table(cursor, "shop", "people", table_info, estimated_rows=4)
+
+    id_profile, name_profile, photo_profile = (col["profile"] for col in table_info["columns"])
+    assert id_profile == {"profiled_rows": 4, "is_sampled": False, "null_fraction": 0.0,
+                          "approx_distinct": 4, "min": 1, "max": 4}
+    assert name_profile["null_fraction"] == 0.25 and name_profile["avg_length"] == 3.0
+    assert name_profile["top_values"] == [{"value": "Ann", "count": 2}, {"value": "Bob", "count": 1}]
+    assert photo_profile == {"profiled_rows": 4, "is_sampled": False, "null_fraction": 0.5} # No value stats for blobs
+    aggregate_query = next(query for query in cursor.queries if "COUNT(*) AS row_count" in query)
+    assert "RAND()" not in aggregate_query and "`photo`" in aggregate_query and "MIN(`photo`)" not in aggregate_query
+    assert cursor.queries[-1] == "SET SESSION MAX_EXECUTION_TIME = 0"
+
+def test_large_tables_are_profiled_on_a_sample(monkeypatch):
+    monkeypatch.setattr(metadata_extractor, "PROFILE_SAMPLE_ROWS", 1000)
+    table_info = {"columns": [{"name": "id", "data_type": "int"}]}
+    cursor = ProfileCursor({"row_count": 1000, "c0_nulls": 0, "c0_distinct": 1000, "c0_min": 1, "c0_max": 10 ** 6}, [])
+
+    metadata_extractor.profile_table(cursor, "shop", "events", table_info, estimated_rows=10 ** 6)
+
+    assert table_info["columns"][0]["profile"]["is_sampled"] is True
+    assert any("RAND() <" in query and "LIMIT 1000" in query for query in cursor.queries)
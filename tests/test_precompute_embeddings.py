@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+for module in ("faiss", "mysql.connector", "sentence_transformers"):
+    pytest.importorskip(module)
+
+import precompute_embeddings
+from vector_index import decode_embeddings
+
+DIMENSION = 4
+
+class RecordingConnection:
+    """Stands in for a mysql.connector connection, recording statements and commits."""
+
+    def __init__(self, fail_updates=False):
+        self.fail_updates = fail_updates
+        self.inserted = []
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sql, rows):
+        self.inserted.append(list(rows))
+
+    def execute(self, sql, params=()):
+        if self.fail_updates and sql.lstrip().startswith("UPDATE"):
+            raise precompute_embeddings.mysql.connector.Error("lock wait timeout")
+        self.statements.append(" ".join(sql.split()))
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+def open_writer(monkeypatch, conn, **kwargs):
+    monkeypatch.setattr(precompute_embeddings.mysql.connector, "connect", lambda **config: conn)
+    return precompute_embeddings.EmbeddingBatchWriter("model", **kwargs)
+
+def test_writer_sends_one_multi_row_insert_and_update_per_batch(monkeypatch):
+    conn = RecordingConnection()
+    writer = open_writer(monkeypatch, conn, embedding_format='float16')
+    embeddings = np.arange(3 * DIMENSION, dtype=np.float32).reshape(3, DIMENSION)
+
+    writer.write_batch([11, 12], embeddings[:2])
+    assert [len(rows) for rows in conn.inserted] == [2] and conn.commits == 1
+    writer.write_batch([13], embeddings[2:])
+    writer.close() # Nothing left to flush
+
+    assert [[item_id for item_id, _ in rows] for rows in conn.inserted] == [[11, 12], [13]]
+    assert conn.commits == 2 and writer.rows_written == 3
+    assert sum(statement.startswith("UPDATE enriched_metadata e JOIN tmp_embedding_updates") for statement in conn.statements) == 2
+    blobs = [blob for rows in conn.inserted for _, blob in rows]
+    assert np.array_equal(decode_embeddings(blobs, 'float16', DIMENSION), embeddings)
+
+def test_failed_batch_is_rolled_back_and_not_counted(monkeypatch, capsys):
+    conn = RecordingConnection(fail_updates=True)
+    writer = open_writer(monkeypatch, conn)
+
+    writer.write_batch([1, 2], np.ones((2, DIMENSION), dtype=np.float32))
+
+    assert conn.rollbacks == 1 and conn.commits == 0
+    assert writer.rows_written == 0 and writer.pending == []
+    assert "Database error while writing a batch of 2 embeddings" in capsys.readouterr().out
+
+class RecordingWriter:
+    """Stands in for EmbeddingBatchWriter, recording each written batch."""
+
+    def __init__(self, model_name):
+        self.batches = []
+        self.rows_written = 0
+        self.rows_per_second = 0.0
+        self.closed = False
+
+    def write_batch(self, item_ids, embeddings):
+        self.batches.append((list(item_ids), len(embeddings)))
+        self.rows_written += len(item_ids)
+
+    def close(self):
+        self.closed = True
+
+def test_main_streams_pages_through_encode_in_batches(monkeypatch):
+    pages = [[{"id": i, "semantic_description": f"item {i}"} for i in range(1, 6)],
+             [{"id": 6, "semantic_description": "item 6"}]]
+    writers = []
+    encoded = []
+
+    def make_writer(model_name):
+        writers.append(RecordingWriter(model_name))
+        return writers[-1]
+
+    def encode(descriptions, **kwargs):
+        encoded.append(len(descriptions))
+        return np.zeros((len(descriptions), DIMENSION), dtype=np.float32)
+
+    monkeypatch.setattr(precompute_embeddings, "ensure_embedding_tracking_columns", lambda: True)
+    monkeypatch.setattr(precompute_embeddings, "count_items_to_embed", lambda: 6)
+    monkeypatch.setattr(precompute_embeddings, "iter_items_to_embed", lambda: iter(pages))
+    monkeypatch.setattr(precompute_embeddings, "EmbeddingBatchWriter", make_writer)
+    monkeypatch.setattr(precompute_embeddings, "EMBEDDING_ENCODE_BATCH_SIZE", 2)
+    monkeypatch.setattr(precompute_embeddings, "EXPORT_SEARCH_INDEX", False)
+    monkeypatch.setattr(precompute_embeddings.model, "encode", encode)
+
+    precompute_embeddings.main()
+
+    assert encoded == [2, 2, 1, 1] # Batches never span pages, so only one page is held at a time
+    assert writers[0].batches == [([1, 2], 2), ([3, 4], 2), ([5], 1), ([6], 1)]
+    assert writers[0].closed
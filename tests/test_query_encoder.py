@@ -0,0 +1,80 @@
+import threading
+import numpy as np
+import pytest
+
+from query_encoder import QueryEncoder, normalize_query
+
+class RecordingModel:
+    """encode_batch stand-in: a query embeds as [len(query), call number]; records every batch."""
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def __call__(self, texts):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append(list(texts))
+        return np.array([[len(text), len(self.batches)] for text in texts], dtype=np.float32)
+
+def test_normalized_queries_share_one_cache_entry_but_keep_their_case():
+    model = RecordingModel()
+    encoder = QueryEncoder(model, batch_window_ms=1)
+
+    first = encoder.encode("Customer  Email ")
+    second = encoder.encode("customer email")
+
+    assert normalize_query("  Customer  Email ") == "customer email"
+    assert first.shape == (1, 2) and second is first
+    assert model.batches == [["Customer Email"]] # The lowercased form is only the cache key
+    assert not first.flags.writeable
+    assert encoder.stats()["hits"] == 1 and encoder.stats()["misses"] == 1
+
+def test_concurrent_misses_are_encoded_in_one_batch():
+    gate = threading.Event()
+    model = RecordingModel(gate)
+    encoder = QueryEncoder(model, batch_window_ms=50)
+
+    futures = [encoder.submit(query) for query in ["orders", "customers", "orders", "items"]]
+    gate.set()
+    vectors = [future.result(timeout=5) for future in futures]
+
+    assert model.batches == [["orders", "customers", "items"]] # The duplicate shares the first request's encoding
+    assert vectors[0] is vectors[2]
+    assert encoder.stats()["max_batch_size"] == 3
+
+def test_least_recently_used_and_expired_vectors_are_dropped(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("query_encoder.time.monotonic", lambda: now[0])
+    model = RecordingModel()
+    encoder = QueryEncoder(model, max_entries=2, ttl_seconds=10)
+
+    encoder.encode_many(["a", "b"])
+    encoder.encode_many(["a"]) # "b" is now the least recently used
+    encoder.encode_many(["c"])
+    assert encoder.stats()["evictions"] == 1
+    encoder.encode_many(["a", "b"])
+    assert model.batches[-1] == ["b"]
+
+    now[0] += 11
+    encoder.encode_many(["a"])
+    assert model.batches[-1] == ["a"] and encoder.stats()["expirations"] == 1
+
+def test_encode_many_keeps_query_order_and_encodes_duplicates_once():
+    model = RecordingModel()
+    encoder = QueryEncoder(model)
+
+    matrix = encoder.encode_many(["Abc ", "a", "ABC"])
+
+    assert matrix[:, 0].tolist() == [3, 1, 3]
+    assert model.batches == [["Abc", "a"]]
+
+def test_encoding_errors_reach_every_waiting_request():
+    def failing_model(texts):
+        raise RuntimeError("model unavailable")
+    encoder = QueryEncoder(failing_model, batch_window_ms=1)
+
+    with pytest.raises(RuntimeError):
+        encoder.encode("orders")
+    with pytest.raises(RuntimeError): # Not cached: the next request tries again
+        encoder.encode("orders")
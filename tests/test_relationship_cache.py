@@ -0,0 +1,65 @@
+import json
+import pytest
+
+from relationship_cache import RelationshipCache, RelationshipSnapshot, parse_cursor
+
+def relationship(row_id, created_at, source_table='orders', relationship_type='one-to-many'):
+    return {"id": row_id, "source_table": source_table, "source_column": "customer_id", "target_table": "customers",
+            "target_column": "id", "relationship_type": relationship_type, "created_at": created_at}
+
+ROWS = [relationship(1, "2026-01-01T00:00:00"), relationship(2, "2026-01-02T00:00:00", source_table='Invoices'),
+        relationship(3, "2026-01-02T00:00:00"), relationship(4, None, relationship_type='one-to-one')]
+
+def test_pages_follow_cursors_newest_first():
+    snapshot = RelationshipSnapshot("v1", ROWS)
+
+    first = json.loads(snapshot.page({}, 2)[0])
+    second = json.loads(snapshot.page({}, 2, first["next_cursor"])[0])
+
+    assert [row["id"] for row in first["relationships"]] == [3, 2]
+    assert [row["id"] for row in second["relationships"]] == [1, 4]
+    assert first["total"] == 4 and second["next_cursor"] is None
+
+def test_rows_added_later_do_not_shift_the_next_page():
+    cursor = json.loads(RelationshipSnapshot("v1", ROWS).page({}, 2)[0])["next_cursor"]
+    newer = RelationshipSnapshot("v2", ROWS + [relationship(5, "2026-02-01T00:00:00")])
+
+    assert [row["id"] for row in json.loads(newer.page({}, 2, cursor)[0])["relationships"]] == [1, 4]
+
+def test_filters_match_case_insensitively_and_etags_follow_content():
+    snapshot = RelationshipSnapshot("v1", ROWS)
+
+    body, etag = snapshot.page({"source_table": "INVOICES", "target_table": ""}, 10)
+
+    assert [row["id"] for row in json.loads(body)["relationships"]] == [2]
+    assert snapshot.page({"source_table": "invoices"}, 10) == (body, etag)
+    assert RelationshipSnapshot("v2", ROWS).page({"source_table": "invoices"}, 10)[1] == etag # Same content, same ETag
+    assert snapshot.page({"source_table": "orders"}, 10)[1] != etag
+
+def test_malformed_cursor_raises_value_error():
+    with pytest.raises(ValueError):
+        parse_cursor("yesterday,abc")
+
+def test_snapshot_reloads_only_when_the_version_changes(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("relationship_cache.time.monotonic", lambda: now[0])
+    versions = ["v1"]
+    loads = []
+
+    def load(known_version):
+        loads.append(known_version)
+        return versions[0], (None if versions[0] == known_version else list(ROWS))
+
+    cache = RelationshipCache(check_interval_seconds=2, max_age_seconds=300)
+    first = cache.snapshot(load)
+    assert cache.snapshot(load) is first and loads == [None] # Within the check interval: no DB access
+
+    now[0] += 3
+    assert cache.snapshot(load) is first and loads == [None, "v1"]
+    versions[0] = "v2"
+    now[0] += 3
+    assert cache.snapshot(load) is not first
+    now[0] += 301
+    cache.snapshot(load)
+    assert loads[-1] is None # Too old: reloaded whatever the version
+    assert cache.stats() == {"version_checks": 4, "reloads": 3, "rows": len(ROWS)}
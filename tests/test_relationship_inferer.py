@@ -0,0 +1,75 @@
+import re
+import pytest
+
+for module in ("mysql.connector", "langchain_openai", "langchain_core"):
+    pytest.importorskip(module)
+
+import relationship_inferer
+
+MODEL = relationship_inferer.LLM_MODEL_NAME
+
+class RelationshipTableConnection:
+    """Stands in for a mysql.connector connection over inferred_relationships, keyed like unique_relationship."""
+
+    def __init__(self, keys):
+        self.rows = set(keys)
+        self.pending = None
+        self.commits = 0
+
+    def cursor(self):
+        self.pending = set(self.rows)
+        return self
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        if sql.startswith("INSERT"):
+            self.pending.add(params[:4] + (params[6],))
+            self.rowcount = 1
+            return
+        table_count = len(re.search(r"source_table IN \(([^)]*)\)", sql).group(1).split(","))
+        tables = set(params[:table_count])
+        kept = {tuple(params[i:i + 5]) for i in range(2 * table_count, len(params), 5)}
+        stale = {key for key in self.pending if (key[0] in tables or key[2] in tables) and key not in kept}
+        self.pending -= stale
+        self.rowcount = len(stale)
+
+    def commit(self):
+        self.rows = self.pending
+        self.commits += 1
+
+    def rollback(self):
+        self.pending = set(self.rows)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+def relationship(source_table, source_column, target_table, target_column):
+    return {"source_table": source_table, "source_column": source_column, "target_table": target_table,
+            "target_column": target_column, "relationship_type": "one-to-many", "justification": "name match"}
+
+def test_changed_table_that_lost_a_column_loses_its_relationships(monkeypatch):
+    conn = RelationshipTableConnection([
+        ("Orders", "customer_id", "Customers", "customer_id", MODEL),
+        ("Orders", "legacy_customer_ref", "Customers", "customer_id", MODEL), # Column dropped from Orders
+        ("Order_Items", "product_id", "Products", "product_id", MODEL), # Table not changed
+    ])
+    monkeypatch.setattr(relationship_inferer.mysql.connector, "connect", lambda **config: conn)
+
+    relationship_inferer.store_inferred_relationships(
+        [relationship("Orders", "customer_id", "Customers", "customer_id")], replace_tables=["Orders"])
+
+    assert conn.commits == 1
+    assert conn.rows == {("Orders", "customer_id", "Customers", "customer_id", MODEL),
+                         ("Order_Items", "product_id", "Products", "product_id", MODEL)}
+
+def test_no_inferred_relationships_clears_those_of_the_changed_tables(monkeypatch):
+    conn = RelationshipTableConnection([("Orders", "customer_id", "Customers", "customer_id", MODEL),
+                                        ("Invoices", "order_id", "Orders", "order_id", MODEL)])
+    monkeypatch.setattr(relationship_inferer.mysql.connector, "connect", lambda **config: conn)
+
+    relationship_inferer.store_inferred_relationships([], replace_tables=["Orders"])
+
+    assert conn.rows == set()
@@ -0,0 +1,22 @@
+from rerank_cache import RerankCache
+
+def test_key_depends_on_query_candidates_and_model():
+    key = RerankCache.make_key("Customer  Email", [3, 1, 2], "llm")
+    assert key == RerankCache.make_key("customer email", (3, 1, 2), "llm")
+    assert key != RerankCache.make_key("customer email", [1, 2, 3], "llm") # Different retrieval order
+    assert key != RerankCache.make_key("customer email", [3, 1, 2], "cross-encoder")
+
+def test_orderings_expire_and_least_recently_used_are_evicted(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("rerank_cache.time.monotonic", lambda: now[0])
+    cache = RerankCache(max_entries=2, ttl_seconds=10)
+
+    cache.put("a", [1, 2])
+    cache.put("b", [2, 1])
+    assert cache.get("a") == [1, 2] # "b" is now the least recently used
+    cache.put("c", [3])
+    assert cache.get("b") is None and cache.stats()["evictions"] == 1
+
+    now[0] += 11
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.stats() == {"hits": 1, "misses": 3, "hit_rate": 0.25, "entries": 0, "evictions": 1}
@@ -0,0 +1,249 @@
+import concurrent.futures
+import json
+import threading
+import time
+import numpy as np
+import pytest
+
+for module in ("faiss", "flask", "mysql.connector", "sentence_transformers", "langchain_openai", "langchain_core"):
+    pytest.importorskip(module)
+
+import search_api
+from catalog_store import CatalogStore
+from relationship_cache import RelationshipCache
+from rerank_cache import RerankCache
+from vector_index import build_faiss_index
+
+DIMENSION = 8
+
+def embeddings_for(ids):
+    return np.stack([np.random.default_rng(int(item_id)).random(DIMENSION, dtype=np.float32) for item_id in ids])
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(search_api.app, "debug", True) # Debug mode pretty-prints jsonify() bodies
+    return search_api.app.test_client()
+
+@pytest.fixture
+def indexed(monkeypatch):
+    """INDEX_STATE over items 1-20; a query embeds like the item whose id it names."""
+    ids = list(range(1, 21))
+    catalog = CatalogStore()
+    for item_id in ids:
+        catalog.append(item_id, 'column', f'col_{item_id}', 'orders', f'column number {item_id}', [])
+    catalog.build_id_lookup()
+    index = build_faiss_index(embeddings_for(ids), index_type='flat', ids=ids)
+    monkeypatch.setattr(search_api, "INDEX_STATE", search_api.make_index_state(index, catalog, {"item_count": len(ids)}))
+    monkeypatch.setattr(search_api.QUERY_ENCODER, "encode", lambda query: embeddings_for([int(query.split('_')[-1])]))
+    monkeypatch.setattr(search_api.QUERY_ENCODER, "encode_many",
+                        lambda queries: embeddings_for([int(query.split('_')[-1]) for query in queries]))
+
+def ndjson_events(response):
+    assert response.mimetype == search_api.NDJSON_MIMETYPE
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_stream_with_empty_index_is_one_ndjson_error_event(client, monkeypatch):
+    monkeypatch.setattr(search_api, "INDEX_STATE", search_api.IndexState(None, CatalogStore(), None))
+
+    response = client.get("/search?query=orders&stream=true")
+
+    assert response.status_code == 200
+    assert ndjson_events(response) == [{"event": "error", "error": search_api.EMPTY_INDEX_MESSAGE, "results": []}]
+
+def test_empty_index_without_stream_is_plain_json(client, monkeypatch):
+    monkeypatch.setattr(search_api, "INDEX_STATE", search_api.IndexState(None, CatalogStore(), None))
+
+    response = client.get("/search?query=orders")
+
+    assert response.is_json
+    assert response.get_json() == {"results": [], "message": search_api.EMPTY_INDEX_MESSAGE}
+
+def test_stream_rejects_bad_parameters_with_an_ndjson_error(client):
+    response = client.get("/search?query=orders&stream=true&k=0")
+
+    assert response.status_code == 400
+    events = ndjson_events(response)
+    assert len(events) == 1 and events[0]["event"] == "error"
+
+def test_stream_sends_results_then_reranked_then_done(client, indexed, monkeypatch):
+    monkeypatch.setattr(search_api, "rerank_results",
+                        lambda query, candidates, budget_ms=None, mode=None: (list(reversed(candidates)), True))
+
+    response = client.get("/search?query=col_7&stream=true&k=3&hybrid=false")
+
+    assert response.status_code == 200
+    events = ndjson_events(response)
+    assert [event["event"] for event in events] == ["results", "reranked", "done"]
+    first_ids = [item["id"] for item in events[0]["results"]]
+    assert first_ids[0] == 7 and len(first_ids) == 3
+    assert [item["id"] for item in events[1]["results"]] == list(reversed(first_ids))
+
+@pytest.mark.parametrize("payload", [
+    {"queries": ["col_1"], "nprobe": "many"},
+    {"queries": ["col_1"], "nprobe": 0},
+    {"queries": ["col_1"], "ef_search": 10 ** 9},
+    {"queries": ["col_1"], "ef_search": True},
+    {"queries": ["col_1"], "hybrid": "sometimes"},
+    ["col_1"],
+])
+def test_batch_rejects_invalid_options(client, indexed, payload):
+    response = client.post("/search/batch", json=payload)
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+def test_batch_hybrid_false_string_turns_hybrid_off(client, indexed):
+    response = client.post("/search/batch", json={"queries": ["col_3"], "hybrid": "false", "nprobe": "8"})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["hybrid"] is False
+    assert body["results"][0]["results"][0]["id"] == 3
+
+@pytest.mark.parametrize("query_string", ["nprobe=abc", "ef_search=-1", "hybrid=maybe", "k=ten", "k=0", "offset=-1", "offset=1.5",
+                                          "rerank_budget_ms=-5", "rerank_budget_ms=soon"])
+def test_search_rejects_invalid_options(client, indexed, query_string):
+    response = client.get(f"/search?query=col_1&rerank_mode=none&{query_string}")
+
+    assert response.status_code == 400
+
+def test_search_pages_from_offset_zero(client, indexed):
+    first = client.get("/search?query=col_7&rerank_mode=none&k=2&offset=0").get_json()
+    second = client.get("/search?query=col_7&rerank_mode=none&k=2&offset=2").get_json()
+
+    assert first["results"][0]["id"] == 7
+    assert not {item["id"] for item in first["results"]} & {item["id"] for item in second["results"]}
+
+def test_rerank_budget_is_capped_at_the_server_budget():
+    def budget(value):
+        return search_api.parse_search_args({"query": "orders", "rerank_budget_ms": value})[0]["rerank_budget_ms"]
+
+    assert budget("0") == 0
+    assert budget(str(search_api.RERANK_LATENCY_BUDGET_MS + 1)) == search_api.RERANK_LATENCY_BUDGET_MS
+
+def test_search_and_batch_parse_options_alike():
+    assert search_api.parse_search_options({"hybrid": "no", "nprobe": "16", "ef_search": 64}) == (
+        {"hybrid": False, "nprobe": 16, "ef_search": 64}, None)
+    assert search_api.parse_search_options({}) == ({"hybrid": True, "nprobe": None, "ef_search": None}, None)
+
+class GatedChain:
+    """LLM re-rank chain that answers `ordering` once `release` is set."""
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+        self.release = threading.Event()
+        self.calls = 0
+
+    def invoke(self, prompt_input):
+        self.calls += 1
+        self.release.wait(5)
+        return self.ordering
+
+@pytest.fixture
+def llm_reranker(monkeypatch):
+    chain = GatedChain("3, 1")
+    monkeypatch.setattr(search_api, "RERANK_CACHE", RerankCache())
+    monkeypatch.setattr(search_api, "get_llm_reranker", lambda: object())
+    monkeypatch.setattr(search_api, "build_rerank_chain", lambda: chain)
+    yield chain
+    chain.release.set()
+
+CANDIDATES = [{"id": item_id, "semantic_description": f"item {item_id}"} for item_id in (1, 2, 3)]
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+def test_slow_llm_rerank_returns_vector_order_within_budget_then_serves_from_cache(llm_reranker):
+    results, reranked = search_api.rerank_results("orders", CANDIDATES, budget_ms=20, mode='llm')
+    assert (results, reranked) == (CANDIDATES, False)
+
+    llm_reranker.release.set() # The LLM call kept running in the background and caches its answer
+    wait_until(lambda: search_api.RERANK_CACHE.stats()["entries"] == 1)
+
+    results, reranked = search_api.rerank_results("Orders", CANDIDATES, budget_ms=20, mode='llm')
+    assert reranked and [item["id"] for item in results] == [3, 1, 2]
+    assert llm_reranker.calls == 1
+
+def test_identical_concurrent_reranks_share_one_llm_call(llm_reranker):
+    rerank = lambda _: search_api.rerank_results("orders", CANDIDATES, budget_ms=5000, mode='llm')
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(rerank, None)
+        wait_until(lambda: llm_reranker.calls == 1)
+        others = [executor.submit(rerank, None) for _ in range(3)]
+        llm_reranker.release.set()
+        answers = [first.result()] + [future.result() for future in others]
+
+    assert all(reranked and [item["id"] for item in results] == [3, 1, 2] for results, reranked in answers)
+    assert llm_reranker.calls == 1
+
+class ScoringCrossEncoder:
+    """CrossEncoder stand-in scoring a pair by how often the query's words occur in the passage."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, pairs, batch_size=None, show_progress_bar=None):
+        self.batches.append(list(pairs))
+        return [sum(passage.split().count(word) for word in query.split()) for query, passage in pairs]
+
+def test_cross_encoder_scores_all_candidates_in_one_batch(monkeypatch):
+    encoder = ScoringCrossEncoder()
+    monkeypatch.setattr(search_api, "RERANK_CACHE", RerankCache())
+    monkeypatch.setattr(search_api, "get_cross_encoder", lambda: encoder)
+    candidates = [{"id": 1, "semantic_description": "shipping address"},
+                  {"id": 2, "semantic_description": None, "parent_table_name": "orders", "object_name": "order_total"},
+                  {"id": 3, "semantic_description": "orders of a customer orders"}]
+
+    results, reranked = search_api.rerank_results("orders", candidates, mode='cross_encoder')
+    assert reranked and [item["id"] for item in results] == [3, 2, 1]
+    assert encoder.batches == [[("orders", "shipping address"), ("orders", "orders order_total"),
+                                ("orders", "orders of a customer orders")]]
+
+    search_api.rerank_results("orders", candidates, mode='cross_encoder')
+    assert len(encoder.batches) == 1 # Served from the re-rank cache
+
+def test_unavailable_cross_encoder_falls_back_to_the_llm(llm_reranker, monkeypatch):
+    monkeypatch.setattr(search_api, "get_cross_encoder", lambda: None)
+    llm_reranker.release.set()
+
+    results, reranked = search_api.rerank_results("orders", CANDIDATES, budget_ms=5000, mode='cross_encoder')
+
+    assert reranked and [item["id"] for item in results] == [3, 1, 2]
+    assert llm_reranker.calls == 1
+
+def test_hybrid_search_finds_an_exact_name_the_embedding_misses(client, indexed, monkeypatch):
+    monkeypatch.setattr(search_api.QUERY_ENCODER, "encode_many", lambda queries: embeddings_for([5] * len(queries)))
+
+    vector_only = client.post("/search/batch", json={"queries": ["col_12"], "k": 3, "hybrid": False}).get_json()
+    hybrid = client.post("/search/batch", json={"queries": ["col_12"], "k": 3}).get_json()
+
+    vector_ids = [item["id"] for item in vector_only["results"][0]["results"]]
+    hybrid_results = {item["id"]: item for item in hybrid["results"][0]["results"]}
+    assert 12 not in vector_ids
+    assert "similarity_score" not in hybrid_results[12] and hybrid_results[12]["lexical_score"] > 0
+    assert all("fusion_score" in item for item in hybrid_results.values())
+    assert vector_ids[0] in hybrid_results
+
+def test_inferred_relationships_pages_revalidate_with_etags(client, monkeypatch):
+    rows = [{"id": row_id, "source_table": "orders", "source_column": "customer_id", "target_table": "customers",
+             "target_column": "id", "relationship_type": "one-to-many", "created_at": f"2026-01-0{row_id}T00:00:00"}
+            for row_id in (1, 2, 3)]
+    loads = []
+    monkeypatch.setattr(search_api, "RELATIONSHIP_CACHE", RelationshipCache(check_interval_seconds=0))
+    monkeypatch.setattr(search_api, "load_relationships",
+                        lambda known_version: loads.append(known_version) or ("v1", None if known_version == "v1" else rows))
+
+    first = client.get("/inferred-relationships?limit=2")
+    body = first.get_json()
+    assert [row["id"] for row in body["relationships"]] == [3, 2] and body["total"] == 3
+    revalidated = client.get("/inferred-relationships?limit=2", headers={"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304 and not revalidated.get_data()
+    assert loads == [None, "v1"] # The second request only checked the version
+
+    second = client.get(f"/inferred-relationships?limit=2&cursor={body['next_cursor']}")
+    assert [row["id"] for row in second.get_json()["relationships"]] == [1]
+    assert client.get("/inferred-relationships?cursor=garbage").status_code == 400
+    assert client.get("/inferred-relationships?limit=0").status_code == 400
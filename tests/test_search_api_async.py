@@ -0,0 +1,106 @@
+import asyncio
+import json
+from concurrent.futures import Future
+import numpy as np
+import pytest
+
+for module in ("faiss", "flask", "quart", "mysql.connector", "sentence_transformers", "langchain_openai", "langchain_core"):
+    pytest.importorskip(module)
+
+import search_api
+import search_api_async
+from catalog_store import CatalogStore
+from rerank_cache import RerankCache
+from vector_index import build_faiss_index
+
+DIMENSION = 8
+
+def embeddings_for(ids):
+    return np.stack([np.random.default_rng(int(item_id)).random(DIMENSION, dtype=np.float32) for item_id in ids])
+
+def resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+class AsyncGatedChain:
+    """LLM re-rank chain whose ainvoke answers `ordering` once `release` is set."""
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+        self.release = None
+        self.calls = 0
+
+    async def ainvoke(self, prompt_input):
+        self.calls += 1
+        await self.release.wait()
+        return self.ordering
+
+@pytest.fixture
+def indexed(monkeypatch):
+    """INDEX_STATE over items 1-20; a query embeds like the item whose id it names."""
+    ids = list(range(1, 21))
+    catalog = CatalogStore()
+    for item_id in ids:
+        catalog.append(item_id, 'column', f'col_{item_id}', 'orders', f'column number {item_id}', [])
+    catalog.build_id_lookup()
+    index = build_faiss_index(embeddings_for(ids), index_type='flat', ids=ids)
+    monkeypatch.setattr(search_api, "INDEX_STATE", search_api.make_index_state(index, catalog, {"item_count": len(ids)}))
+    monkeypatch.setattr(search_api.QUERY_ENCODER, "submit", lambda query: resolved(embeddings_for([int(query.split('_')[-1])])))
+    monkeypatch.setattr(search_api.QUERY_ENCODER, "encode", lambda query: embeddings_for([int(query.split('_')[-1])]))
+
+@pytest.fixture
+def llm_reranker(monkeypatch):
+    chain = AsyncGatedChain("3, 7")
+    monkeypatch.setattr(search_api_async, "get_llm_reranker", lambda: object())
+    monkeypatch.setattr(search_api_async, "build_rerank_chain", lambda: chain)
+    monkeypatch.setattr(search_api_async, "llm_rerank_slots", None)
+    return chain
+
+def test_async_search_answers_like_the_flask_endpoint(indexed):
+    query_string = "query=col_7&k=3&rerank_mode=none"
+
+    async def get_async():
+        response = await search_api_async.app.test_client().get(f"/search?{query_string}")
+        return response.status_code, await response.get_json()
+
+    status, body = asyncio.run(get_async())
+    flask_response = search_api.app.test_client().get(f"/search?{query_string}")
+
+    assert status == 200
+    assert body == flask_response.get_json()
+    assert body["results"][0]["id"] == 7
+
+def test_async_search_rejects_bad_parameters_in_stream_mode(indexed):
+    async def get_async():
+        response = await search_api_async.app.test_client().get("/search?query=col_7&stream=true&k=0")
+        return response.status_code, response.mimetype, await response.get_data(as_text=True)
+
+    status, mimetype, body = asyncio.run(get_async())
+
+    assert status == 400 and mimetype == search_api.NDJSON_MIMETYPE
+    assert json.loads(body)["event"] == "error"
+
+def test_slow_llm_rerank_is_bounded_by_the_budget_and_keeps_warming_the_cache(indexed, llm_reranker, monkeypatch):
+    cache = RerankCache()
+    monkeypatch.setattr(search_api, "RERANK_CACHE", cache) # Where store_llm_rerank() puts the ordering
+    monkeypatch.setattr(search_api_async, "RERANK_CACHE", cache)
+    candidates = [{"id": item_id, "semantic_description": f"item {item_id}"} for item_id in (7, 3, 5)]
+
+    async def scenario():
+        search_api_async.llm_rerank_slots = asyncio.Semaphore(1)
+        llm_reranker.release = asyncio.Event()
+        first = await search_api_async.rerank_results_async("col_7", candidates, 20, 'llm')
+        second_task = asyncio.create_task(search_api_async.rerank_results_async("col_7", candidates, 5000, 'llm'))
+        await asyncio.sleep(0.01)
+        llm_reranker.release.set()
+        second = await second_task
+        third = await search_api_async.rerank_results_async("col_7", candidates, 20, 'llm')
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert first == (candidates, False)
+    assert second[1] and [item["id"] for item in second[0]] == [3, 7, 5] # Joined the still-running call
+    assert third[1] and [item["id"] for item in third[0]] == [3, 7, 5] # From the cache
+    assert llm_reranker.calls == 1
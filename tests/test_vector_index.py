@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+import vector_index
+from catalog_store import CatalogStore
+
+DIMENSION = 16
+
+def make_catalog(ids):
+    catalog = CatalogStore()
+    for item_id in ids:
+        catalog.append(int(item_id), 'column', f'col_{item_id}', 'Orders', f'column number {item_id}', [])
+    catalog.build_id_lookup()
+    return catalog
+
+def random_embeddings(count, seed):
+    return np.random.default_rng(seed).random((count, DIMENSION), dtype=np.float32)
+
+@pytest.fixture
+def saved_index_paths(tmp_path):
+    return str(tmp_path / "index.faiss"), str(tmp_path / "index.meta.json")
+
+@pytest.mark.parametrize("index_type", ['flat', 'ivf_flat', 'ivf_pq'])
+def test_live_update_of_memory_mapped_index(index_type, saved_index_paths, monkeypatch):
+    monkeypatch.setattr(vector_index, "IVF_PQ_NBITS", 4) # 16-entry PQ codebooks train on 2000 vectors
+    ids = np.arange(1, 2001)
+    embeddings = random_embeddings(len(ids), seed=1)
+    signature = {"item_count": len(ids)}
+    index_path, sidecar_path = saved_index_paths
+    vector_index.save_index(vector_index.build_faiss_index(embeddings, index_type=index_type, ids=ids),
+                            make_catalog(ids), signature, index_path=index_path, sidecar_path=sidecar_path)
+    index, catalog = vector_index.load_index(signature, index_path=index_path, sidecar_path=sidecar_path, mmap=True)
+    assert vector_index.get_index_type(index) == index_type
+
+    # Remove items 1-10, re-embed item 11 and add item 5000
+    live_ids = np.concatenate([np.arange(11, 2001), [5000]])
+    changed_ids = [11, 5000]
+    changed_embeddings = random_embeddings(2, seed=2)
+    new_index, new_catalog, added, removed = vector_index.apply_catalog_changes(
+        index, catalog, changed_embeddings, make_catalog(changed_ids), live_ids)
+
+    assert (added, removed) == (2, 10)
+    assert new_index.ntotal == new_catalog.live_count == len(live_ids)
+    params = vector_index.make_search_params(new_index, nprobe=10000)
+    _, labels = new_index.search(changed_embeddings, 1, params=params)
+    assert labels[:, 0].tolist() == changed_ids
+    _, labels = new_index.search(embeddings[:10], 5, params=params)
+    assert not np.isin(labels, np.arange(1, 11)).any()
+    # The memory-mapped index the live searches use is untouched
+    assert index.ntotal == len(ids)
+
+def test_writable_copy_of_memory_mapped_ivf_index_matches_original(saved_index_paths):
+    ids = np.arange(1, 2001)
+    embeddings = random_embeddings(len(ids), seed=3)
+    index_path, _ = saved_index_paths
+    faiss.write_index(vector_index.build_faiss_index(embeddings, index_type='ivf_flat', ids=ids), index_path)
+    mapped = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+    copy = vector_index.writable_copy(mapped)
+
+    params = vector_index.make_search_params(mapped, nprobe=8)
+    assert np.array_equal(mapped.search(embeddings[:20], 5, params=params)[1], copy.search(embeddings[:20], 5, params=params)[1])
+
+def test_saved_index_is_loaded_only_when_current(saved_index_paths):
+    ids = np.arange(1, 101)
+    embeddings = random_embeddings(len(ids), seed=4)
+    signature = {"item_count": len(ids), "max_embedded_at": "2026-01-01 00:00:00"}
+    index_path, sidecar_path = saved_index_paths
+    vector_index.save_index(vector_index.build_faiss_index(embeddings, index_type='flat', ids=ids),
+                            make_catalog(ids), signature, index_path=index_path, sidecar_path=sidecar_path)
+
+    index, catalog = vector_index.load_index(signature, index_path=index_path, sidecar_path=sidecar_path)
+    assert index.ntotal == len(ids) and catalog.live_count == len(ids)
+    _, labels = index.search(embeddings[41:42], 1)
+    assert labels[0, 0] == 42
+    assert catalog.result_row(catalog.rows_for_ids([42])[0])["object_name"] == "col_42"
+
+    stale = dict(signature, item_count=101)
+    assert vector_index.load_index(stale, index_path=index_path, sidecar_path=sidecar_path) == (None, None)
+    assert vector_index.load_index(signature, index_path=index_path, sidecar_path=sidecar_path,
+                                   expected_index_type='hnsw') == (None, None)
+    assert vector_index.load_index(signature, index_path=index_path + ".missing", sidecar_path=sidecar_path) == (None, None)
+
+def test_auto_index_type_follows_catalog_size(monkeypatch):
+    monkeypatch.setattr(vector_index, "INDEX_TYPE", 'auto')
+    assert vector_index.resolve_index_type(1000) == 'flat'
+    assert vector_index.resolve_index_type(vector_index.AUTO_FLAT_MAX_ITEMS + 1) == 'hnsw'
+    assert vector_index.resolve_index_type(vector_index.AUTO_HNSW_MAX_ITEMS + 1) == 'ivf_pq'
+    assert vector_index.resolve_index_type(100, 'ivf_pq') == 'ivf_flat' # Too few vectors to train PQ
+    with pytest.raises(ValueError):
+        vector_index.resolve_index_type(100, 'lsh')
+
+@pytest.mark.parametrize("index_type", ['flat', 'ivf_flat', 'hnsw'])
+def test_each_index_type_finds_stored_vectors(index_type):
+    ids = np.arange(1, 2001)
+    embeddings = random_embeddings(len(ids), seed=5)
+
+    index = vector_index.build_faiss_index(embeddings, index_type=index_type, ids=ids)
+
+    assert vector_index.get_index_type(index) == index_type
+    params = vector_index.make_search_params(index, nprobe=10000, ef_search=256)
+    _, labels = index.search(embeddings[:20], 1, params=params)
+    assert labels[:, 0].tolist() == ids[:20].tolist()
+
+def test_search_params_are_per_request_and_clamped():
+    ids = np.arange(1, 2001)
+    embeddings = random_embeddings(len(ids), seed=6)
+    ivf = vector_index.build_faiss_index(embeddings, index_type='ivf_flat', ids=ids)
+    nlist = faiss.try_extract_index_ivf(vector_index.unwrap_index(ivf)).nlist
+
+    assert vector_index.make_search_params(ivf).nprobe == min(vector_index.DEFAULT_NPROBE, nlist)
+    assert vector_index.make_search_params(ivf, nprobe=10 ** 6).nprobe == nlist
+    hnsw = vector_index.build_faiss_index(embeddings[:200], index_type='hnsw', ids=ids[:200])
+    assert vector_index.make_search_params(hnsw, ef_search=32).efSearch == 32
+    assert vector_index.make_search_params(vector_index.build_faiss_index(embeddings[:10], index_type='flat')) is None
+
+@pytest.mark.parametrize("embedding_format, tolerance", [('float32', 0), ('float16', 1e-3), ('int8', 1e-2)])
+def test_embedding_formats_round_trip(embedding_format, tolerance):
+    embeddings = random_embeddings(5, seed=7) * 2 - 1
+
+    blobs = [vector_index.encode_embedding(embedding, embedding_format) for embedding in embeddings]
+
+    assert all(len(blob) == vector_index.embedding_blob_size(DIMENSION, embedding_format) for blob in blobs)
+    decoded = vector_index.decode_embeddings(blobs, embedding_format, DIMENSION)
+    assert decoded.dtype == np.float32
+    assert np.abs(decoded - embeddings).max() <= tolerance
+    with pytest.raises(ValueError):
+        vector_index.encode_embedding(embeddings[0], 'bfloat16')
+
+@pytest.mark.parametrize("embedding_format", ['float16', 'int8'])
+def test_quantized_index_still_finds_stored_vectors(embedding_format):
+    ids = np.arange(1, 501)
+    embeddings = random_embeddings(len(ids), seed=8)
+
+    index = vector_index.build_faiss_index(embeddings, index_type='flat', embedding_format=embedding_format, ids=ids)
+
+    assert index.sa_code_size() < DIMENSION * 4
+    _, labels = index.search(embeddings[:20], 1)
+    assert labels[:, 0].tolist() == ids[:20].tolist()
@@ -0,0 +1,479 @@
+import json
+import os
+from contextlib import contextmanager
+import numpy as np
+import faiss
+from catalog_store import CatalogStore
+
+try:
+    import fcntl # POSIX only; without it processes do not coordinate index file access
+except ImportError:
+    fcntl = None
+
+# --- Persistent Index Files (written by precompute_embeddings.py, loaded by search_api.py) ---
+INDEX_FORMAT_VERSION = 2 # 2: vectors are labelled with their enriched_metadata id (IndexIDMap2)
+INDEX_FILE_PATH = "catalog_index.faiss"
+INDEX_SIDECAR_PATH = "catalog_index.meta.json" # ids + display metadata of the indexed items
+INDEX_LOCK_SUFFIX = ".lock" # <index path>.lock: writers of the index/sidecar pair lock it exclusively, readers shared
+
+# Catalog items that belong in the search index: embedded with the current model,
+# excluding the catalog's own bookkeeping tables and their columns.
+CATALOG_ITEMS_FILTER = """
+    embedding_vector IS NOT NULL
+    AND embedding_model_version = %s
+    AND NOT (object_type = 'table' AND object_name IN ('enriched_metadata', 'inferred_relationships'))
+    AND NOT (object_type = 'column' AND parent_table_name IN ('enriched_metadata', 'inferred_relationships'))
+"""
+
+# --- Index Type Configuration ---
+# 'flat' (exact), 'ivf_flat', 'ivf_pq', 'hnsw', or 'auto' to pick one from the item count.
+# Run benchmark_index.py to compare recall@10 and latency before changing these.
+INDEX_TYPE = 'auto'
+AUTO_FLAT_MAX_ITEMS = 50000 # 'auto' keeps exact search up to this many items...
+AUTO_HNSW_MAX_ITEMS = 1000000 # ...then HNSW up to this many, then IVF-PQ (vectors no longer fit comfortably in RAM)
+IVF_NLIST = None # Number of IVF lists; None = 4 * sqrt(N)
+IVF_PQ_M = 48 # PQ sub-quantizers (reduced to a divisor of the dimension); 384-d -> 8 dims per 1-byte code
+IVF_PQ_NBITS = 8
+HNSW_M = 32 # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 200
+TRAINING_SAMPLE_SIZE = 100000 # Vectors sampled to train IVF / PQ quantizers
+MIN_TRAINING_POINTS_PER_CENTROID = 39 # FAISS k-means warns below this
+DEFAULT_NPROBE = 16 # IVF lists scanned per query, unless overridden per request
+DEFAULT_EF_SEARCH = 64 # HNSW candidate list size per query, unless overridden per request
+FILTER_EXACT_SEARCH_MAX_ITEMS = 1024 # Filtered Flat/HNSW searches matching at most this many items compare those vectors directly
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw')
+
+# --- Vector Storage Format ---
+# How embeddings are stored in enriched_metadata.embedding_vector (tagged per row in
+# embedding_format) and encoded inside Flat / IVF-Flat / HNSW indexes.
+#   'float32': 4 bytes per dimension, exact
+#   'float16': 2 bytes per dimension (IndexScalarQuantizer fp16)
+#   'int8':    1 byte per dimension + a 4-byte per-vector scale (IndexScalarQuantizer 8-bit)
+# IVF-PQ indexes always use their own PQ codes. Run `benchmark_index.py --formats` for a memory/recall comparison.
+EMBEDDING_FORMAT = 'float32'
+EMBEDDING_FORMATS = ('float32', 'float16', 'int8')
+INDEX_VECTOR_CODES = {'float32': 'Flat', 'float16': 'SQfp16', 'int8': 'SQ8'} # index_factory suffix per format
+INT8_MAX = 127
+
+def get_embedding_format(embedding_format=None):
+    embedding_format = embedding_format or EMBEDDING_FORMAT
+    if embedding_format not in EMBEDDING_FORMATS:
+        raise ValueError(f"Unknown embedding format '{embedding_format}'. Expected one of {EMBEDDING_FORMATS}.")
+    return embedding_format
+
+def embedding_blob_size(dimension, embedding_format):
+    """Bytes one stored embedding of `dimension` takes in `embedding_format`."""
+    if embedding_format == 'int8':
+        return 4 + dimension
+    return dimension * np.dtype(np.float16 if embedding_format == 'float16' else np.float32).itemsize
+
+def encode_embedding(embedding, embedding_format=None):
+    """Serializes one embedding to BLOB bytes in `embedding_format` (default: EMBEDDING_FORMAT)."""
+    embedding_format = get_embedding_format(embedding_format)
+    vector = np.asarray(embedding, dtype=np.float32)
+    if embedding_format == 'float32':
+        return vector.tobytes()
+    if embedding_format == 'float16':
+        return vector.astype(np.float16).tobytes()
+    # Symmetric int8 with a per-vector scale, so it works for unnormalized models too
+    scale = float(np.abs(vector).max()) / INT8_MAX or 1.0
+    codes = np.clip(np.rint(vector / scale), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return np.float32(scale).tobytes() + codes.tobytes()
+
+def decode_embeddings(blobs, embedding_format, dimension):
+    """Decodes a list of same-format BLOBs into one float32 (len(blobs), dimension) matrix."""
+    buffer = b"".join(blobs)
+    if embedding_format == 'float32':
+        return np.frombuffer(buffer, dtype=np.float32).reshape(len(blobs), dimension)
+    if embedding_format == 'float16':
+        return np.frombuffer(buffer, dtype=np.float16).reshape(len(blobs), dimension).astype(np.float32)
+    raw = np.frombuffer(buffer, dtype=np.uint8).reshape(len(blobs), 4 + dimension)
+    scales = raw[:, :4].copy().view(np.float32)
+    return raw[:, 4:].view(np.int8).astype(np.float32) * scales
+
+def resolve_index_type(n_items, index_type=None):
+    """Returns the concrete index type to build for `n_items` vectors."""
+    index_type = index_type or INDEX_TYPE
+    if index_type == 'auto':
+        if n_items <= AUTO_FLAT_MAX_ITEMS:
+            index_type = 'flat'
+        elif n_items <= AUTO_HNSW_MAX_ITEMS:
+            index_type = 'hnsw'
+        else:
+            index_type = 'ivf_pq'
+    elif index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Expected 'auto' or one of {INDEX_TYPES}.")
+    if index_type == 'ivf_pq' and n_items < (2 ** IVF_PQ_NBITS) * MIN_TRAINING_POINTS_PER_CENTROID:
+        index_type = 'ivf_flat' # Too few vectors to train the PQ codebooks
+    return index_type
+
+def get_ivf_nlist(n_items):
+    """Number of IVF lists: IVF_NLIST, or 4*sqrt(N), capped so every list gets enough training points."""
+    nlist = IVF_NLIST or int(4 * np.sqrt(n_items))
+    max_nlist = max(1, min(n_items, TRAINING_SAMPLE_SIZE) // MIN_TRAINING_POINTS_PER_CENTROID)
+    return max(1, min(nlist, max_nlist))
+
+def get_pq_m(dimension):
+    """Largest sub-quantizer count <= IVF_PQ_M that divides the dimension."""
+    return next(m for m in range(min(IVF_PQ_M, dimension), 0, -1) if dimension % m == 0)
+
+def get_index_factory_string(index_type, n_items, dimension, embedding_format='float32'):
+    vector_codes = INDEX_VECTOR_CODES[embedding_format]
+    if index_type == 'flat':
+        return vector_codes
+    if index_type == 'hnsw':
+        return f"HNSW{HNSW_M}" if vector_codes == 'Flat' else f"HNSW{HNSW_M},{vector_codes}"
+    nlist = get_ivf_nlist(n_items)
+    if index_type == 'ivf_flat':
+        return f"IVF{nlist},{vector_codes}"
+    return f"IVF{nlist},PQ{get_pq_m(dimension)}x{IVF_PQ_NBITS}"
+
+def sample_training_vectors(embeddings, sample_size=TRAINING_SAMPLE_SIZE, seed=1234):
+    """Random sample of rows used to train the quantizers (all rows if there are fewer)."""
+    if len(embeddings) <= sample_size:
+        return embeddings
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), size=sample_size, replace=False))
+    return embeddings[rows]
+
+def build_faiss_index(embeddings: np.ndarray, index_type=None, embedding_format=None, ids=None):
+    """Builds a FAISS index from a list of embeddings.
+
+    `index_type` is one of INDEX_TYPES or 'auto' (default: INDEX_TYPE), and
+    `embedding_format` selects float32 / float16 / int8 vector codes (default:
+    EMBEDDING_FORMAT). IVF and int8 indexes are trained on a random sample of
+    the embeddings first. With `ids`, the index is wrapped in an IndexIDMap2 so
+    searches return those ids and vectors can later be added/removed by id.
+    """
+    if embeddings is None or len(embeddings) == 0:
+        return None
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n_items, dimension = embeddings.shape
+    index_type = resolve_index_type(n_items, index_type)
+
+    factory_string = get_index_factory_string(index_type, n_items, dimension, get_embedding_format(embedding_format))
+    index = faiss.index_factory(dimension, factory_string, faiss.METRIC_L2)  # Using L2 distance
+    if index_type == 'hnsw':
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        training_vectors = sample_training_vectors(embeddings)
+        print(f"Training {factory_string} index on {len(training_vectors)} vectors...")
+        index.train(training_vectors)
+    if ids is None:
+        index.add(embeddings)
+        return index
+    id_map = faiss.IndexIDMap2(index)
+    id_map.add_with_ids(embeddings, np.asarray(ids, dtype=np.int64))
+    return id_map
+
+def unwrap_index(index):
+    """The underlying index of an IndexIDMap/IndexIDMap2, or `index` itself."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+def get_index_type(index):
+    """Reports which of INDEX_TYPES a built or loaded index is."""
+    index = unwrap_index(index)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return 'ivf_pq' if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else 'ivf_flat'
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    return 'flat'
+
+def make_search_params(index, nprobe=None, ef_search=None, id_selector=None):
+    """Per-query search parameters for `index`, or None for unfiltered exact search.
+
+    Passed to index.search() instead of setting nprobe/efSearch on the shared
+    index, so concurrent requests can use different values. `id_selector`
+    (see catalog_filters.py) restricts the search to a subset of DB ids.
+    """
+    index_type = get_index_type(index)
+    if index_type in ('ivf_flat', 'ivf_pq'):
+        nlist = faiss.try_extract_index_ivf(unwrap_index(index)).nlist
+        params = faiss.SearchParametersIVF(nprobe=max(1, min(int(nprobe or DEFAULT_NPROBE), nlist)))
+    elif index_type == 'hnsw':
+        params = faiss.SearchParametersHNSW(efSearch=max(1, int(ef_search or DEFAULT_EF_SEARCH)))
+    elif id_selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if id_selector is not None:
+        params.sel = id_selector
+        params.referenced_selector = id_selector # The params only hold a raw pointer
+    return params
+
+def search_with_filter(index, query_embeddings, k, filter_ids, id_selector, nprobe=None, ef_search=None):
+    """Top-k search of a (n_queries, d) matrix restricted to `filter_ids` (DB ids; `id_selector` accepts exactly these).
+
+    Subsets of at most FILTER_EXACT_SEARCH_MAX_ITEMS are answered by exact
+    distances over their own vectors, which is cheaper than any index scan
+    and avoids HNSW missing items the graph walk never reaches. Larger subsets
+    go through the index with the selector, which skips the distance
+    computation for everything else. An IVF search whose probed lists hold
+    fewer than k matches for some query is retried over all lists. Returns
+    (distances, labels) like index.search(), with -1 labels for empty slots.
+    """
+    index_type = get_index_type(index)
+    if len(filter_ids) <= FILTER_EXACT_SEARCH_MAX_ITEMS and index_type in ('flat', 'hnsw'):
+        filter_ids = np.ascontiguousarray(filter_ids, dtype=np.int64)
+        vectors = index.reconstruct_batch(filter_ids)
+        distances = ((query_embeddings ** 2).sum(axis=1, keepdims=True) - 2 * query_embeddings @ vectors.T
+                     + (vectors ** 2).sum(axis=1)).astype(np.float32)
+        if len(filter_ids) > k:
+            nearest = np.argpartition(distances, k, axis=1)[:, :k]
+        else:
+            nearest = np.tile(np.arange(len(filter_ids)), (len(distances), 1))
+        nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1, kind='stable')
+        return np.take_along_axis(nearest_distances, order, axis=1), filter_ids[np.take_along_axis(nearest, order, axis=1)]
+
+    params = make_search_params(index, nprobe=nprobe, ef_search=ef_search, id_selector=id_selector)
+    distances, labels = index.search(query_embeddings, k, params=params)
+    if index_type in ('ivf_flat', 'ivf_pq') and ((labels >= 0).sum(axis=1) < min(k, len(filter_ids))).any():
+        params = make_search_params(index, nprobe=index.ntotal, id_selector=id_selector) # Clamped to nlist
+        distances, labels = index.search(query_embeddings, k, params=params)
+    return distances, labels
+
+def fetch_catalog_signature(cursor, model_name, embedding_format=None):
+    """Cheap aggregate that changes whenever the set of indexable items changes.
+
+    Embeddings are only (re)written for rows that have none for the current
+    model and format, so for a fixed model the id set (count, max and XOR of
+    ids), the number of rows already in `embedding_format` and the newest
+    embedded_at identify the index contents without reading any BLOBs.
+    max_embedded_at doubles as the watermark for live index updates.
+    """
+    embedding_format = get_embedding_format(embedding_format)
+    cursor.execute(f"""
+        SELECT COUNT(*) AS item_count, COALESCE(MAX(id), 0) AS max_id, COALESCE(BIT_XOR(id), 0) AS id_xor,
+               COALESCE(SUM(COALESCE(embedding_format, 'float32') = %s), 0) AS formatted_count,
+               MAX(embedded_at) AS max_embedded_at
+        FROM enriched_metadata
+        WHERE {CATALOG_ITEMS_FILTER}
+    """, (embedding_format, model_name))
+    row = cursor.fetchone()
+    if not isinstance(row, dict):
+        row = dict(zip(['item_count', 'max_id', 'id_xor', 'formatted_count', 'max_embedded_at'], row))
+    return {
+        "embedding_model_version": model_name,
+        "embedding_format": embedding_format,
+        "item_count": int(row['item_count']),
+        "max_id": int(row['max_id']),
+        "id_xor": int(row['id_xor']),
+        "formatted_count": int(row['formatted_count']),
+        "max_embedded_at": str(row['max_embedded_at']) if row['max_embedded_at'] is not None else None
+    }
+
+def load_catalog_items_from_db(cursor, model_name, embedding_dim, embedded_after=None, include_ids=()):
+    """Reads every indexable item with its embedding from enriched_metadata.
+
+    With `embedded_after` (a max_embedded_at watermark), only items embedded
+    after it are read, plus those in `include_ids` (e.g. rows committed late
+    with an embedded_at below the watermark).
+    Returns (embeddings_matrix, catalog) where catalog is a CatalogStore whose
+    row i describes row i of the matrix (no embedding bytes are kept). Embeddings are decoded to float32
+    according to each row's embedding_format (NULL = float32). Items whose
+    embedding has the wrong size for its format are skipped.
+    """
+    delta_filter = ""
+    params = (model_name,)
+    if embedded_after:
+        include_ids = [int(item_id) for item_id in include_ids]
+        id_filter = f" OR id IN ({', '.join(['%s'] * len(include_ids))})" if include_ids else ""
+        delta_filter = f"AND (embedded_at > %s{id_filter})"
+        params += (embedded_after, *include_ids)
+    cursor.execute(f"""
+        SELECT id, object_type, object_name, parent_table_name, semantic_description, tags,
+               embedding_vector, embedding_format
+        FROM enriched_metadata
+        WHERE {CATALOG_ITEMS_FILTER} {delta_filter}
+        ORDER BY id
+    """, params)
+
+    blobs_by_format = {}
+    rows_by_format = {}
+    catalog = CatalogStore()
+    for item in cursor:
+        blob = item.pop('embedding_vector')
+        embedding_format = item.pop('embedding_format') or 'float32'
+        if embedding_format not in EMBEDDING_FORMATS:
+            print(f"Warning: Item ID {item['id']}: unknown embedding format '{embedding_format}'. Skipping.")
+            continue
+        if not blob or len(blob) != embedding_blob_size(embedding_dim, embedding_format):
+            print(f"Warning: Item ID {item['id']}: {embedding_format} embedding of {len(blob) if blob else 0} bytes does not match dimension {embedding_dim}. Skipping.")
+            continue
+        blobs_by_format.setdefault(embedding_format, []).append(blob)
+        rows_by_format.setdefault(embedding_format, []).append(len(catalog))
+        catalog.append_item(item) # Deserializes tags
+
+    if not len(catalog):
+        return None, catalog
+    # One vectorized decode per format instead of one frombuffer per row
+    if len(blobs_by_format) == 1:
+        embedding_format, blobs = next(iter(blobs_by_format.items()))
+        return decode_embeddings(blobs, embedding_format, embedding_dim), catalog
+    embeddings_matrix = np.empty((len(catalog), embedding_dim), dtype=np.float32)
+    for embedding_format, blobs in blobs_by_format.items():
+        embeddings_matrix[rows_by_format[embedding_format]] = decode_embeddings(blobs, embedding_format, embedding_dim)
+    return embeddings_matrix, catalog
+
+def fetch_indexable_ids(cursor, model_name):
+    """Ids of all items that currently belong in the index (no BLOBs are read)."""
+    cursor.execute(f"SELECT id FROM enriched_metadata WHERE {CATALOG_ITEMS_FILTER}", (model_name,))
+    rows = cursor.fetchall()
+    return np.fromiter((row['id'] if isinstance(row, dict) else row[0] for row in rows), dtype=np.int64, count=len(rows))
+
+def writable_copy(index):
+    """An in-memory copy of `index` that vectors can be added to and removed from.
+
+    faiss.clone_index() cannot copy an IVF index loaded with IO_FLAG_MMAP:
+    its lists are OnDiskInvertedLists backed by the mapped file. Such an index
+    is copied without its list data, and the lists are then copied into
+    ArrayInvertedLists.
+    """
+    ivf = faiss.try_extract_index_ivf(unwrap_index(index))
+    if ivf is None or not isinstance(faiss.downcast_InvertedLists(ivf.invlists), faiss.OnDiskInvertedLists):
+        return faiss.clone_index(index)
+    new_index = faiss.deserialize_index(faiss.serialize_index(index), faiss.IO_FLAG_SKIP_IVF_DATA)
+    invlists = faiss.ArrayInvertedLists(ivf.nlist, ivf.code_size)
+    for list_no in range(ivf.nlist):
+        list_size = ivf.invlists.list_size(list_no)
+        if list_size:
+            invlists.add_entries(list_no, list_size, ivf.invlists.get_ids(list_no), ivf.invlists.get_codes(list_no))
+    faiss.try_extract_index_ivf(unwrap_index(new_index)).replace_invlists(invlists, True)
+    invlists.this.disown() # Now owned by the index
+    return new_index
+
+def apply_catalog_changes(index, catalog, changed_embeddings, changed_catalog, live_ids):
+    """Copy-on-write update of an id-mapped index and its CatalogStore.
+
+    Items no longer in `live_ids`, and previous versions of the changed items,
+    are removed; the changed items are (re-)added under their ids. The inputs
+    are left untouched so searches can keep using them until the caller swaps
+    in the new pair. Returns (index, catalog, added_count, removed_count).
+    Raises RuntimeError if the index type cannot remove vectors (HNSW), in
+    which case it has to be rebuilt.
+    """
+    if not isinstance(index, faiss.IndexIDMap):
+        raise RuntimeError("Index has no id map; live updates need an index built with ids.")
+    indexed_ids = catalog.live_ids()
+    changed_ids = changed_catalog.live_ids()
+    stale_ids = np.union1d(np.setdiff1d(indexed_ids, live_ids), np.intersect1d(indexed_ids, changed_ids))
+
+    new_index = writable_copy(index) # The index may be a read-only memory-mapped one
+    new_catalog = catalog.copy()
+    if len(stale_ids):
+        new_index.remove_ids(stale_ids)
+        new_catalog.remove_ids(stale_ids)
+    if len(changed_ids):
+        new_index.add_with_ids(np.ascontiguousarray(changed_embeddings, dtype=np.float32), changed_ids)
+        new_catalog.extend(changed_catalog)
+    new_catalog.build_id_lookup()
+    return new_index, new_catalog, len(changed_ids), len(np.setdiff1d(stale_ids, changed_ids))
+
+@contextmanager
+def index_file_lock(lock_path, exclusive=True, blocking=True):
+    """flock()-based lock on `lock_path` shared by all processes; yields whether it was acquired.
+
+    With blocking=False it yields False instead of waiting for another holder.
+    Without fcntl (e.g. on Windows) it always yields True.
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(lock_path, "a") as lock_file:
+        flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def index_file_version(index_path=INDEX_FILE_PATH):
+    """Identity of the current index file (changes whenever save_index() replaces it), or None if missing."""
+    try:
+        stat = os.stat(index_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def save_index(index, catalog, signature, index_path=INDEX_FILE_PATH, sidecar_path=INDEX_SIDECAR_PATH):
+    """Writes the FAISS index and its id/metadata sidecar, replacing any previous version atomically."""
+    sidecar = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "signature": signature,
+        "dimension": index.d,
+        "ntotal": index.ntotal,
+        "index_type": get_index_type(index),
+        # Column-oriented so the file stays compact and loads straight into a CatalogStore
+        "items": catalog.to_columns()
+    }
+    faiss.write_index(index, index_path + ".tmp")
+    with open(sidecar_path + ".tmp", "w") as f:
+        json.dump(sidecar, f, default=str)
+    # Readers never see a new index with an old sidecar or vice versa
+    with index_file_lock(index_path + INDEX_LOCK_SUFFIX):
+        os.replace(index_path + ".tmp", index_path)
+        os.replace(sidecar_path + ".tmp", sidecar_path)
+    print(f"Saved search index ({index.ntotal} items) to {index_path} and {sidecar_path}.")
+
+def read_index_file(index_path=INDEX_FILE_PATH, mmap=True):
+    """Reads a FAISS index file, memory-mapped and read-only where FAISS supports it for the index type."""
+    if mmap:
+        try:
+            return faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            print(f"Memory-mapped load not supported for this index ({e}). Reading it into memory instead.")
+    return faiss.read_index(index_path)
+
+def load_index(expected_signature, index_path=INDEX_FILE_PATH, sidecar_path=INDEX_SIDECAR_PATH, mmap=True,
+               expected_index_type=None):
+    """Loads a saved index if it matches `expected_signature` (and `expected_index_type`, if given).
+
+    The index file is opened memory-mapped and read-only where FAISS supports
+    it for the index type, so several processes share the same pages.
+    Returns (index, catalog) with a CatalogStore describing the index rows,
+    or (None, None) if the files are missing or stale.
+    """
+    index, catalog, _ = load_saved_index(index_path, sidecar_path, mmap, expected_index_type, expected_signature)
+    return index, catalog
+
+def load_saved_index(index_path=INDEX_FILE_PATH, sidecar_path=INDEX_SIDECAR_PATH, mmap=True,
+                     expected_index_type=None, expected_signature=None):
+    """Like load_index(), but accepts any signature unless one is given; returns (index, catalog, signature)."""
+    with index_file_lock(index_path + INDEX_LOCK_SUFFIX, exclusive=False):
+        if not (os.path.exists(index_path) and os.path.exists(sidecar_path)):
+            print(f"No saved search index at {index_path}.")
+            return None, None, None
+        try:
+            with open(sidecar_path, "r") as f:
+                sidecar = json.load(f)
+        except (IOError, json.JSONDecodeError) as e:
+            print(f"Could not read index sidecar {sidecar_path}: {e}")
+            return None, None, None
+
+        if sidecar.get("format_version") != INDEX_FORMAT_VERSION:
+            print(f"Saved search index has format version {sidecar.get('format_version')}, expected {INDEX_FORMAT_VERSION}. Ignoring it.")
+            return None, None, None
+        if expected_signature is not None and sidecar.get("signature") != expected_signature:
+            print(f"Saved search index is stale (saved {sidecar.get('signature')}, database has {expected_signature}).")
+            return None, None, None
+        if expected_index_type and sidecar.get("index_type", "flat") != expected_index_type:
+            print(f"Saved search index is a '{sidecar.get('index_type', 'flat')}' index, configured type is '{expected_index_type}'. Ignoring it.")
+            return None, None, None
+        index = read_index_file(index_path, mmap)
+
+    signature = sidecar.get("signature")
+    catalog = CatalogStore.from_columns(sidecar["items"])
+    del sidecar
+    if index.ntotal != catalog.live_count:
+        print(f"Saved search index has {index.ntotal} vectors but {catalog.live_count} sidecar items. Ignoring it.")
+        return None, None, None
+    return index, catalog, signature
@@ -0,0 +1,15 @@
+import gc
+import search_api
+
+# WSGI entry point for production serving: gunicorn -c gunicorn.conf.py wsgi:app
+# With preload_app (gunicorn.conf.py) this module is imported once in the gunicorn
+# master, so the index and catalog are loaded once and shared with every forked
+# worker copy-on-write. The FAISS index itself is memory-mapped from INDEX_FILE_PATH
+# when it is current, so its pages live in the OS page cache and are shared too.
+print("Loading the search index in the server master process...")
+search_api.load_and_index_data()
+# Move everything loaded so far out of the garbage collector's reach, so collections in
+# the workers don't touch (and copy) the shared pages
+gc.freeze()
+
+app = search_api.app